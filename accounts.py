@@ -0,0 +1,70 @@
+"""
+Account roster for NY Times Library Automation.
+Each account pairs a library card with the NY Times login that redeems its
+code. Without a roster file the single account from .env is used.
+"""
+
+import re
+import json
+import logging
+from collections import namedtuple
+from config import (
+    ACCOUNTS_FILE,
+    ACCOUNT_NAME,
+    LIBRARY_CARD_BARCODE,
+    NYT_USERNAME,
+    NYT_PASSWORD
+)
+
+Account = namedtuple("Account", ["name", "barcode", "nyt_username", "nyt_password"])
+
+DEFAULT_ACCOUNT = Account(
+    name=ACCOUNT_NAME,
+    barcode=LIBRARY_CARD_BARCODE,
+    nyt_username=NYT_USERNAME,
+    nyt_password=NYT_PASSWORD
+)
+
+
+def load_accounts():
+    """
+    Load the account roster from ACCOUNTS_FILE, a JSON list of objects with
+    "library_card_barcode", "nyt_username", "nyt_password" and optional "name".
+    Falls back to the single account configured in .env.
+    """
+    if not ACCOUNTS_FILE:
+        return [DEFAULT_ACCOUNT]
+
+    with open(ACCOUNTS_FILE, 'r') as f:
+        entries = json.load(f)
+
+    accounts = []
+    for index, entry in enumerate(entries):
+        barcode = entry.get("library_card_barcode", "")
+        if not barcode:
+            raise ValueError(f"Account #{index + 1} in {ACCOUNTS_FILE} has no library_card_barcode")
+        username = entry.get("nyt_username", "")
+        accounts.append(Account(
+            name=entry.get("name") or username or f"account-{index + 1}",
+            barcode=barcode,
+            nyt_username=username,
+            nyt_password=entry.get("nyt_password", "")
+        ))
+
+    names = [account.name for account in accounts]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate account names in {ACCOUNTS_FILE}: {', '.join(sorted(duplicates))}")
+    return accounts
+
+
+def account_slug(account_name):
+    """File-name-safe version of an account name"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', account_name).strip('_') or "default"
+
+
+class AccountLogger(logging.LoggerAdapter):
+    """Prefix log messages with the account name so pooled runs can be told apart"""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['account']}] {msg}", kwargs
@@ -0,0 +1,95 @@
+"""
+Activation-completion detector.
+Replaces the fixed post-redemption sleeps: returns as soon as the page
+shows activation finished (the activated/welcome message, or navigation
+away from activate-access once the page's network has gone quiet), or a
+clear TIMED_OUT state with the last page seen. Leaving a page only counts
+once the activate-access page was actually reached, and a bot challenge
+never counts.
+"""
+
+from enum import Enum
+from selenium.common.exceptions import TimeoutException
+from page_state import PageState, take_snapshot, classify
+from waits import wait_until
+from rate_limit import is_challenge
+from dom_corpus import record_page
+
+# Reports whether the document is loaded and no resource finished within arguments[0] ms
+NETWORK_IDLE_SCRIPT = """
+var entries = performance.getEntriesByType('resource');
+var last = 0;
+for (var i = 0; i < entries.length; i++) {
+    last = Math.max(last, entries[i].responseEnd || entries[i].startTime);
+}
+return document.readyState === 'complete' && performance.now() - last >= arguments[0];
+"""
+
+NETWORK_IDLE_MS = 500
+
+
+class ActivationState(Enum):
+    CONFIRMED = "confirmed"
+    ALREADY_REDEEMED = "already_redeemed"
+    TIMED_OUT = "timed_out"
+
+
+def _on_activation_page(url):
+    return "activate" in url.lower()
+
+
+def _on_login_page(url):
+    url = url.lower()
+    return "login" in url or "signin" in url
+
+
+def activation_signal(activation_page_seen=False):
+    """
+    Condition returning the name of the completion signal seen, or False while
+    activation is pending. activation_page_seen says whether the caller already
+    passed the activate-access page; otherwise the condition has to see it itself.
+    """
+    seen = activation_page_seen
+
+    def _predicate(driver):
+        nonlocal seen
+        snapshot = take_snapshot(driver)
+        if is_challenge(None, f"{snapshot.title} {snapshot.text}"):
+            return False
+        state = classify(snapshot)
+        if state == PageState.REDEEMED:
+            return "already_redeemed"
+        if state == PageState.ACTIVATED:
+            return "entitlement_shown"
+        if state in (PageState.LOGIN_EMAIL, PageState.LOGIN_PASSWORD) or _on_login_page(snapshot.url):
+            return False
+
+        if _on_activation_page(snapshot.url) or state == PageState.VALID_NEEDS_CONTINUE:
+            seen = True
+            return False
+        # Any other page only means success if it is where activate-access led
+        if seen and driver.execute_script(NETWORK_IDLE_SCRIPT, NETWORK_IDLE_MS):
+            return "navigated_away"
+        return False
+    return _predicate
+
+
+def wait_for_activation(driver, logger, activation_page_seen=False):
+    """
+    Wait until activation is confirmed. Returns (ActivationState, signal),
+    where signal names what confirmed it (or the page state on timeout).
+    """
+    try:
+        signal = wait_until(driver, activation_signal(activation_page_seen), "activation_confirm")
+    except TimeoutException:
+        record_page(driver, "activation_timeout", logger)
+        snapshot = take_snapshot(driver)
+        state = classify(snapshot)
+        logger.warning(f"Activation not confirmed in time - last page state {state.name} at {snapshot.url}")
+        return ActivationState.TIMED_OUT, state.name.lower()
+
+    if signal == "already_redeemed":
+        logger.info("Activation check: code was already redeemed")
+        return ActivationState.ALREADY_REDEEMED, signal
+    logger.info(f"Activation confirmed ({signal.replace('_', ' ')})")
+    return ActivationState.CONFIRMED, signal
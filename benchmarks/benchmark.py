@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark against the local fixture server.
+Starts benchmarks/fixture_server.py in-process, points the automation at
+it, runs main() N times and reports p50/p95 wall time per stage from the
+recorded metrics spans. Needs Chrome and chromedriver, but no network.
+
+    python3 benchmarks/benchmark.py --runs 10 --latency 0.15
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from fixture_server import FixtureServer, VARIANTS
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of a list of numbers"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def configure_environment(server, data_dir, headless):
+    """Point the automation's configuration at the fixture server (before it is imported)"""
+    os.environ.update({
+        "LIBRARY_URL": server.library_url,
+        "NYT_REDEEM_BASE_URL": server.redeem_url,
+        "LIBRARY_CARD_BARCODE": "21000000000000",
+        "NYT_USERNAME": "benchmark@example.com",
+        "NYT_PASSWORD": "benchmark-password",
+        "ACCOUNT_NAME": "benchmark",
+        "ACCOUNTS_FILE": "",
+        "ACCOUNT_RETRIES": "0",
+        "FORCE_RUN": "true",
+        "HEADLESS": "true" if headless else "false",
+        "LOG_DIR": data_dir,
+        "DATA_DIR": data_dir,
+        # Back-to-back benchmark runs would otherwise be throttled by the per-host limiter
+        "RATE_LIMIT_PER_MINUTE": "0",
+    })
+
+
+def isolate_run(data_dir, run):
+    """
+    Give a run its own checkpoint and session directories, so it neither
+    resumes from nor signs in with an earlier run's state and every run
+    measures the same path. Caches (driver, locators) stay shared.
+    """
+    import checkpoints
+    import session_store
+    run_dir = os.path.join(data_dir, "runs", str(run))
+    checkpoints.CHECKPOINT_DIR = os.path.join(run_dir, "checkpoints")
+    session_store.SESSION_DIR = run_dir
+
+
+def load_spans(data_dir):
+    """Read the per-run span records written by the metrics module"""
+    spans_file = os.path.join(data_dir, "metrics", "spans.jsonl")
+    if not os.path.exists(spans_file):
+        return []
+    with open(spans_file, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    """Return {stage: {"p50", "p95", "runs"}} across run records, including "total" wall time"""
+    per_stage = {}
+    for record in records:
+        durations = {}
+        for span in record["spans"]:
+            durations[span["name"]] = durations.get(span["name"], 0) + span["duration"]
+        durations["total"] = record["total"]
+        for stage, seconds in durations.items():
+            per_stage.setdefault(stage, []).append(seconds)
+    return {
+        stage: {
+            "p50": round(percentile(values, 0.50), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "mean": round(statistics.mean(values), 3),
+            "runs": len(values)
+        }
+        for stage, values in per_stage.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the automation end-to-end against local stand-ins")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every fixture response")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-path", default="")
+    parser.add_argument("--variant", choices=VARIANTS, default="normal")
+    parser.add_argument("--headed", action="store_true", help="show the browser")
+    parser.add_argument("--json", dest="json_output", help="also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    server = FixtureServer(latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate,
+                           fail_path=args.fail_path, variant=args.variant).start()
+    data_dir = tempfile.mkdtemp(prefix="nyt-benchmark-")
+    configure_environment(server, data_dir, not args.headed)
+
+    # Imported only now so config picks up the fixture URLs
+    import nyt_library_automation
+
+    outcomes = []
+    try:
+        for run in range(1, args.runs + 1):
+            print(f"Run {run}/{args.runs}...", flush=True)
+            isolate_run(data_dir, run)
+            try:
+                nyt_library_automation.main()
+                outcomes.append("ok")
+            except SystemExit as e:
+                outcomes.append("ok" if not e.code else "failed")
+    finally:
+        server.stop()
+
+    records = load_spans(data_dir)
+    summary = summarize(records)
+
+    print()
+    print(f"{'stage':<40} {'p50 (s)':>9} {'p95 (s)':>9} {'mean (s)':>9} {'runs':>5}")
+    for stage, stats in sorted(summary.items(), key=lambda item: (item[0] == "total", item[0])):
+        print(f"{stage:<40} {stats['p50']:>9.3f} {stats['p95']:>9.3f} {stats['mean']:>9.3f} {stats['runs']:>5}")
+    print()
+    print(f"Runs: {len(outcomes)}, failed: {outcomes.count('failed')}, "
+          f"fixture requests: {server.request_count}, data: {data_dir}")
+
+    if args.json_output:
+        with open(args.json_output, 'w') as f:
+            json.dump({"runs": len(outcomes), "failed": outcomes.count("failed"), "stages": summary}, f, indent=2)
+
+    return 1 if "failed" in outcomes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
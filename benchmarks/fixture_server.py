@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the IndyPL portal and the NY Times redeem, login and
+activate-access pages, so the whole flow can be run and timed offline.
+
+Run on its own:
+    python3 benchmarks/fixture_server.py --port 8765 --latency 0.2
+
+then point the automation at it with
+    LIBRARY_URL=http://127.0.0.1:8765/nyt/nytTokenSignIn.php?section=digital
+    NYT_REDEEM_BASE_URL=http://127.0.0.1:8765/subscription/redeem
+"""
+
+import time
+import random
+import argparse
+import itertools
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+SESSION_COOKIE = "NYT-S"
+
+VARIANTS = ["normal", "already-redeemed", "login-required", "no-library-code"]
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>{body}</body></html>
+"""
+
+LIBRARY_FORM = """
+<h1>New York Times Digital Access</h1>
+<form method="post" action="/nyt/nytTokenSignIn.php?section=digital">
+  <label>Library card number <input type="text" name="cNum"></label>
+  <input type="hidden" name="section" value="digital">
+  <input type="submit" name="submit" value="Get Code">
+</form>
+"""
+
+REDEEM_FORM = """
+<h1>Redeem your access code</h1>
+<form method="post" action="/subscription/redeem">
+  <input type="hidden" name="gift_code" value="{code}">
+  <button type="submit">REDEEM</button>
+</form>
+"""
+
+EMAIL_FORM = """
+<h1>Log in or create an account</h1>
+<form method="post" action="/auth/login">
+  <label for="email">Email address</label>
+  <input type="email" id="email" name="email" required>
+  <input type="hidden" name="state" value="{state}">
+  <button type="submit" id="continue" disabled>Continue</button>
+</form>
+<script>
+  var email = document.getElementById('email');
+  var button = document.getElementById('continue');
+  email.addEventListener('input', function() {{
+    setTimeout(function() {{ button.disabled = !(email.value && email.checkValidity()); }}, {validation_ms});
+  }});
+</script>
+"""
+
+PASSWORD_FORM = """
+<h1>Enter your password</h1>
+<form method="post" action="/auth/login/password">
+  <input type="hidden" name="email" value="{email}">
+  <input type="hidden" name="state" value="{state}">
+  <label>Password <input type="password" name="password" required></label>
+  <button type="submit">Log in</button>
+</form>
+"""
+
+ACTIVATE_FORM = """
+<h1>Your access code is valid</h1>
+<form method="post" action="/activate-access">
+  <input type="hidden" name="access_code" value="{code}">
+  <button type="submit">Continue</button>
+</form>
+"""
+
+
+class FixtureServer:
+    """Threaded HTTP server imitating the library portal and NY Times pages"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 fail_rate=0.0, fail_path="", variant="normal", validation_ms=200):
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.fail_path = fail_path
+        self.variant = variant
+        self.validation_ms = validation_ms
+        self.redeemed_codes = set()
+        self.sessions = set()
+        # Login "state" tokens -> where to go after login (kept server-side like NYT's auth flow)
+        self.pending_redirects = {}
+        self.request_count = 0
+        self._code_counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.fixture = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def library_url(self):
+        return f"{self.base_url}/nyt/nytTokenSignIn.php?section=digital"
+
+    @property
+    def redeem_url(self):
+        return f"{self.base_url}/subscription/redeem"
+
+    def login_url(self, redirect_to):
+        state = f"{random.getrandbits(64):016x}"
+        with self._lock:
+            self.pending_redirects[state] = redirect_to
+        return "/auth/login?" + urlencode({"state": state})
+
+    def next_code(self):
+        return f"fixture{next(self._code_counter):012d}code"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def fixture(self):
+        return self.server.fixture
+
+    def log_message(self, format, *args):
+        pass
+
+    def _delay_or_fail(self):
+        """Apply configured latency and failure injection. Returns True if the request was failed"""
+        fixture = self.fixture
+        with fixture._lock:
+            fixture.request_count += 1
+        delay = fixture.latency + random.uniform(0, fixture.jitter)
+        if delay:
+            time.sleep(delay)
+        if fixture.fail_rate and self.path.startswith(fixture.fail_path) and random.random() < fixture.fail_rate:
+            self._send(503, "Service Unavailable", "<h1>Service temporarily unavailable</h1>")
+            return True
+        return False
+
+    def _send(self, status, title, body, headers=None):
+        payload = PAGE.format(title=escape(title), body=body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = parse_qs(self.rfile.read(length).decode("utf-8"))
+        return {key: values[0] for key, values in data.items()}
+
+    def _signed_in(self):
+        cookies = self.headers.get("Cookie", "")
+        for part in cookies.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == SESSION_COOKIE and value in self.fixture.sessions:
+                return True
+        return False
+
+    def do_GET(self):
+        if self._delay_or_fail():
+            return
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/nyt/nytTokenSignIn.php":
+            self._send(200, "NYT Digital Access", LIBRARY_FORM)
+        elif url.path == "/subscription/redeem":
+            code = escape(query.get("gift_code", ""))
+            self._send(200, "Redeem Access Code", REDEEM_FORM.format(code=code))
+        elif url.path == "/auth/login":
+            self._send(200, "Log In", EMAIL_FORM.format(
+                state=escape(query.get("state", "")),
+                validation_ms=self.fixture.validation_ms))
+        elif url.path == "/auth/login/password":
+            self._send(200, "Log In", PASSWORD_FORM.format(
+                email=escape(query.get("email", "")),
+                state=escape(query.get("state", ""))))
+        elif url.path == "/activate-access":
+            if not self._signed_in():
+                self._redirect(self.fixture.login_url(self.path))
+                return
+            self._send(200, "Activate Access", ACTIVATE_FORM.format(code=escape(query.get("access_code", ""))))
+        elif url.path == "/account":
+            self._send(200, "Your Account", "<h1>Welcome</h1><p>Your access has been activated.</p>")
+        elif url.path == "/robots.txt":
+            self._send(200, "robots", "")
+        else:
+            self._send(404, "Not Found", "<h1>Not found</h1>")
+
+    def do_POST(self):
+        if self._delay_or_fail():
+            return
+        url = urlparse(self.path)
+        form = self._form()
+        fixture = self.fixture
+
+        if url.path == "/nyt/nytTokenSignIn.php":
+            if fixture.variant == "no-library-code" or not form.get("cNum"):
+                self._send(200, "NYT Digital Access", "<p>Sorry, we could not issue a code right now.</p>")
+                return
+            self._redirect(f"/subscription/redeem?gift_code={fixture.next_code()}")
+        elif url.path == "/subscription/redeem":
+            code = form.get("gift_code", "")
+            with fixture._lock:
+                already = fixture.variant == "already-redeemed" or code in fixture.redeemed_codes
+            if already:
+                self._send(200, "Code Already Redeemed",
+                           "<h1>Code already redeemed</h1><p>This code has already been redeemed.</p>")
+                return
+            activate = "/activate-access?" + urlencode({"access_code": code})
+            if self._signed_in() and fixture.variant != "login-required":
+                self._redirect(activate)
+            else:
+                self._redirect(fixture.login_url(activate))
+        elif url.path == "/auth/login":
+            self._redirect("/auth/login/password?" + urlencode({
+                "email": form.get("email", ""), "state": form.get("state", "")}))
+        elif url.path == "/auth/login/password":
+            if not form.get("password"):
+                self._send(200, "Log In", "<p>Please enter your password.</p>")
+                return
+            token = f"session-{random.getrandbits(64):016x}"
+            with fixture._lock:
+                fixture.sessions.add(token)
+                redirect_to = fixture.pending_redirects.pop(form.get("state", ""), "/account")
+            self._redirect(redirect_to, headers={
+                "Set-Cookie": f"{SESSION_COOKIE}={token}; Path=/; Max-Age=2592000; HttpOnly"})
+        elif url.path == "/activate-access":
+            with fixture._lock:
+                fixture.redeemed_codes.add(form.get("access_code", ""))
+            self._redirect("/account")
+        else:
+            self._send(404, "Not Found", "<h1>Not found</h1>")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for the library portal and NY Times")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds (0..jitter) per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="probability of answering 503")
+    parser.add_argument("--fail-path", default="", help="only inject failures on paths starting with this")
+    parser.add_argument("--variant", choices=VARIANTS, default="normal")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.host, args.port, args.latency, args.jitter,
+                           args.fail_rate, args.fail_path, args.variant)
+    print(f"Library URL:     {server.library_url}")
+    print(f"NYT redeem URL:  {server.redeem_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
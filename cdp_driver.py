@@ -0,0 +1,458 @@
+"""
+DevTools-protocol driver backend (DRIVER_BACKEND=cdp).
+Launches Chrome itself and talks to it over the DevTools websocket, without
+chromedriver in between. CDPDriver implements the subset of the Selenium
+WebDriver API this project uses (get, find_element, execute_script,
+execute_cdp_cmd, cookies, the performance log), so the flow, the waits and
+the expected conditions work unchanged. Navigation, DOM mutations and
+network activity arrive as events, which wait_for_activity exposes so
+waits.wait_until wakes up as soon as the page changes instead of polling.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import itertools
+import threading
+import subprocess
+from selenium.common.exceptions import (
+    WebDriverException,
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException
+)
+from lazy_import import LazyModule
+from driver_cache import find_browser_binary
+
+websocket = LazyModule("websocket")
+
+# Seconds to wait for Chrome to open its DevTools port
+LAUNCH_TIMEOUT = 30
+
+# Seconds to wait for a reply to a single DevTools command
+COMMAND_TIMEOUT = 30
+
+# Seconds driver.get waits for the page's load event
+PAGE_LOAD_TIMEOUT = 60
+
+# Binding the page calls (once per animation frame at most) when its DOM changes
+DOM_BINDING = "__nytDomChanged"
+
+DOM_OBSERVER_SCRIPT = """
+(function() {
+    var pending = false;
+    new MutationObserver(function() {
+        if (pending || typeof window.%s !== 'function') { return; }
+        pending = true;
+        requestAnimationFrame(function() { pending = false; window.%s('dom'); });
+    }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+})();
+""" % (DOM_BINDING, DOM_BINDING)
+
+# Events that mean the page may have changed and waiting conditions should be re-checked
+ACTIVITY_EVENTS = {
+    "Page.frameNavigated",
+    "Page.navigatedWithinDocument",
+    "Page.domContentEventFired",
+    "Page.loadEventFired",
+    "Runtime.bindingCalled",
+    "Network.responseReceived",
+    "Network.loadingFinished",
+    "Network.loadingFailed",
+}
+
+# Selenium locator strategies translated to a JavaScript lookup
+FIND_ONE = {
+    "css selector": "document.querySelector({0})",
+    "xpath": "document.evaluate({0}, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue",
+}
+FIND_ALL = {
+    "css selector": "Array.from(document.querySelectorAll({0}))",
+    "xpath": """(function(xpath) {
+        var result = document.evaluate(xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        var nodes = [];
+        for (var i = 0; i < result.snapshotLength; i++) { nodes.push(result.snapshotItem(i)); }
+        return nodes;
+    })({0})""",
+}
+
+# Errors DevTools returns for objects from a document that has since gone away
+STALE_ERRORS = ("Could not find object with given id", "Cannot find context with specified id",
+                "Execution context was destroyed", "Inspected target navigated or closed")
+
+
+def _css_locator(by, value):
+    """Express the name/id/class/tag strategies as CSS"""
+    if by == "name":
+        return "css selector", f'[name="{value}"]'
+    if by == "id":
+        return "css selector", f'[id="{value}"]'
+    if by == "class name":
+        return "css selector", f".{value}"
+    if by == "tag name":
+        return "css selector", value
+    return by, value
+
+
+class _Connection:
+    """One DevTools websocket: numbered commands, replies matched by id, events handed to listeners"""
+
+    def __init__(self, url):
+        self._socket = websocket.create_connection(url, timeout=COMMAND_TIMEOUT, suppress_origin=True)
+        self._socket.settimeout(None)
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._listeners = {}
+        self._closed = False
+        self._reader = threading.Thread(target=self._read, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while not self._closed:
+            try:
+                message = json.loads(self._socket.recv())
+            except Exception:
+                break
+            if "id" in message:
+                waiter = self._pending.pop(message["id"], None)
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+            else:
+                listener = self._listeners.get(message.get("sessionId"))
+                if listener is not None:
+                    listener(message.get("method"), message.get("params", {}))
+        self._closed = True
+        for event, _ in list(self._pending.values()):
+            event.set()
+
+    def listen(self, session_id, callback):
+        self._listeners[session_id] = callback
+
+    def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        """Send a command and return its result, raising WebDriverException on a DevTools error"""
+        if self._closed:
+            raise WebDriverException(f"DevTools connection closed ({method})")
+        command_id = next(self._ids)
+        waiter = [threading.Event(), None]
+        self._pending[command_id] = waiter
+        message = {"id": command_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        with self._send_lock:
+            self._socket.send(json.dumps(message))
+        if not waiter[0].wait(timeout):
+            self._pending.pop(command_id, None)
+            raise WebDriverException(f"DevTools command {method} timed out after {timeout}s")
+        response = waiter[1]
+        if response is None:
+            raise WebDriverException(f"DevTools connection closed ({method})")
+        if "error" in response:
+            error = response["error"].get("message", "")
+            if any(stale in error for stale in STALE_ERRORS):
+                raise StaleElementReferenceException(error)
+            raise WebDriverException(f"{method}: {error}")
+        return response.get("result", {})
+
+    def close(self):
+        self._closed = True
+        try:
+            self._socket.close()
+        except Exception:
+            pass
+
+
+class CDPElement:
+    """A DOM node held as a DevTools remote object"""
+
+    def __init__(self, driver, object_id, generation):
+        self._driver = driver
+        self.object_id = object_id
+        self._generation = generation
+
+    def _call(self, function, *args):
+        if self._generation != self._driver.document_generation:
+            raise StaleElementReferenceException("Element belongs to a previous document")
+        result = self._driver._send("Runtime.callFunctionOn", {
+            "objectId": self.object_id,
+            "functionDeclaration": function,
+            "arguments": [{"value": arg} for arg in args],
+            "returnByValue": True,
+        })
+        _raise_for_exception(result)
+        value = result.get("result", {}).get("value")
+        if value == "__stale__":
+            raise StaleElementReferenceException("Element is no longer attached to the DOM")
+        return value
+
+    def click(self):
+        point = self._call("""function() {
+            if (!this.isConnected) { return '__stale__'; }
+            this.scrollIntoView({block: 'center', inline: 'center'});
+            var rect = this.getBoundingClientRect();
+            return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2};
+        }""")
+        for event_type in ("mouseMoved", "mousePressed", "mouseReleased"):
+            self._driver._send("Input.dispatchMouseEvent", {
+                "type": event_type, "x": point["x"], "y": point["y"], "button": "left", "clickCount": 1})
+
+    def clear(self):
+        self._call("""function() {
+            if (!this.isConnected) { return '__stale__'; }
+            this.value = '';
+            this.dispatchEvent(new Event('input', {bubbles: true}));
+            this.dispatchEvent(new Event('change', {bubbles: true}));
+        }""")
+
+    def send_keys(self, text):
+        self._call("function() { if (!this.isConnected) { return '__stale__'; } this.focus(); }")
+        self._driver._send("Input.insertText", {"text": str(text)})
+
+    def get_attribute(self, name):
+        """Property value if the element has one (like Selenium), else the attribute"""
+        return self._call("""function(name) {
+            if (!this.isConnected) { return '__stale__'; }
+            var value = this[name];
+            if (value !== undefined && value !== null && typeof value !== 'object' && typeof value !== 'function') {
+                return value === false ? null : String(value);
+            }
+            return this.getAttribute(name);
+        }""", name)
+
+    def is_displayed(self):
+        return bool(self._call("""function() {
+            if (!this.isConnected) { return '__stale__'; }
+            var style = getComputedStyle(this);
+            return style.display !== 'none' && style.visibility !== 'hidden' &&
+                (this.offsetWidth > 0 || this.offsetHeight > 0 || this.getClientRects().length > 0);
+        }"""))
+
+    def is_enabled(self):
+        return bool(self._call("function() { if (!this.isConnected) { return '__stale__'; } return !this.disabled; }"))
+
+    @property
+    def text(self):
+        return self._call("function() { if (!this.isConnected) { return '__stale__'; } return this.innerText; }")
+
+
+def _raise_for_exception(result):
+    details = result.get("exceptionDetails")
+    if details:
+        exception = details.get("exception", {})
+        raise JavascriptException(exception.get("description") or details.get("text") or "Script error")
+
+
+class CDPDriver:
+    """One Chrome tab driven over DevTools, with the WebDriver methods the flow uses"""
+
+    def __init__(self, connection, session_id, target_id, process=None, user_data_dir=None,
+                 capture_network=False):
+        self._connection = connection
+        self._session_id = session_id
+        self.target_id = target_id
+        self._owns_browser = process is not None
+        self._user_data_dir = user_data_dir
+        self._capture_network = capture_network
+        self._performance_log = []
+        self._activity = threading.Condition()
+        self.activity_count = 0
+        self.document_generation = 0
+        self._loaded = threading.Event()
+        self._closed = False
+        # ResourceWatchdog reads driver.service.process like for chromedriver
+        self.service = type("Service", (), {"process": process})()
+
+        connection.listen(session_id, self._on_event)
+        self._send("Page.enable")
+        self._send("Runtime.enable")
+        self._send("Runtime.addBinding", {"name": DOM_BINDING})
+        self._send("Page.addScriptToEvaluateOnNewDocument", {"source": DOM_OBSERVER_SCRIPT})
+        if capture_network:
+            self._send("Network.enable")
+
+    @classmethod
+    def launch(cls, arguments, capture_network=False):
+        """Start Chrome with the given command-line flags and attach to the about:blank tab it opens"""
+        binary = find_browser_binary()
+        if binary is None:
+            raise WebDriverException("Chrome/Chromium not found for the DevTools backend")
+        user_data_dir = tempfile.mkdtemp(prefix="nyt-cdp-")
+        process = subprocess.Popen(
+            [binary, "--remote-debugging-port=0", f"--user-data-dir={user_data_dir}", *arguments, "about:blank"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            connection = _Connection(cls._browser_url(process, user_data_dir))
+            targets = connection.send("Target.getTargets")["targetInfos"]
+            # Only the tab opened for about:blank, not one a stray argument may have opened
+            blank = [target["targetId"] for target in targets
+                     if target.get("type") == "page" and target.get("url") == "about:blank"]
+            target_id = blank[0] if blank else connection.send("Target.createTarget", {"url": "about:blank"})["targetId"]
+            session_id = connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})["sessionId"]
+            return cls(connection, session_id, target_id, process, user_data_dir, capture_network)
+        except Exception:
+            process.kill()
+            shutil.rmtree(user_data_dir, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _browser_url(process, user_data_dir):
+        """Read the browser websocket URL Chrome writes to DevToolsActivePort once it is listening"""
+        port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + LAUNCH_TIMEOUT
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise WebDriverException(f"Chrome exited during startup (code {process.returncode})")
+            try:
+                with open(port_file, 'r') as f:
+                    lines = f.read().split()
+                if len(lines) >= 2:
+                    return f"ws://127.0.0.1:{lines[0]}{lines[1]}"
+            except OSError:
+                pass
+            time.sleep(0.05)
+        raise WebDriverException(f"Chrome did not open its DevTools port within {LAUNCH_TIMEOUT}s")
+
+    def open_tab(self, url="about:blank"):
+        """Open another tab in the same browser, driven independently (quit closes only the tab)"""
+        target_id = self._connection.send("Target.createTarget", {"url": url})["targetId"]
+        session_id = self._connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})["sessionId"]
+        return CDPDriver(self._connection, session_id, target_id, capture_network=self._capture_network)
+
+    def _send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return self._connection.send(method, params, self._session_id, timeout)
+
+    def _on_event(self, method, params):
+        if method == "Page.frameNavigated" and not params.get("frame", {}).get("parentId"):
+            self.document_generation += 1
+        elif method == "Page.loadEventFired":
+            self._loaded.set()
+        if self._capture_network and method.startswith("Network."):
+            self._performance_log.append({
+                "level": "INFO", "timestamp": int(time.time() * 1000),
+                "message": json.dumps({"message": {"method": method, "params": params}})
+            })
+        if method in ACTIVITY_EVENTS:
+            with self._activity:
+                self.activity_count += 1
+                self._activity.notify_all()
+
+    def wait_for_activity(self, since, timeout):
+        """Block until an activity event arrives after activity_count was since, or timeout"""
+        with self._activity:
+            return self._activity.wait_for(lambda: self.activity_count != since, timeout)
+
+    def get(self, url):
+        self._loaded.clear()
+        result = self._send("Page.navigate", {"url": url})
+        if result.get("errorText"):
+            raise WebDriverException(f"unknown error: {result['errorText']} ({url})")
+        # Same-document navigations and downloads have no loader and never fire a load event
+        if result.get("loaderId") and not self._loaded.wait(PAGE_LOAD_TIMEOUT):
+            raise WebDriverException(f"Page load did not finish within {PAGE_LOAD_TIMEOUT}s ({url})")
+
+    def _evaluate(self, expression, by_value=True):
+        result = self._send("Runtime.evaluate", {"expression": expression, "returnByValue": by_value})
+        _raise_for_exception(result)
+        return result.get("result", {})
+
+    @property
+    def current_url(self):
+        return self._evaluate("location.href").get("value", "")
+
+    @property
+    def title(self):
+        return self._evaluate("document.title").get("value", "")
+
+    @property
+    def page_source(self):
+        return self._evaluate("document.documentElement.outerHTML").get("value", "")
+
+    def execute_script(self, script, *args):
+        """Run script as a function body with arguments, like WebDriver (elements may be passed, not returned)"""
+        elements = [arg for arg in args if isinstance(arg, CDPElement)]
+        if not elements:
+            return self._evaluate(f"(function() {{\n{script}\n}}).apply(window, {json.dumps(list(args))})").get("value")
+        if any(element._generation != self.document_generation for element in elements):
+            raise StaleElementReferenceException("Element belongs to a previous document")
+        result = self._send("Runtime.callFunctionOn", {
+            "objectId": elements[0].object_id,
+            "functionDeclaration": f"function() {{\n{script}\n}}",
+            "arguments": [{"objectId": arg.object_id} if isinstance(arg, CDPElement) else {"value": arg}
+                          for arg in args],
+            "returnByValue": True,
+        })
+        _raise_for_exception(result)
+        return result.get("result", {}).get("value")
+
+    def find_element(self, by="css selector", value=None):
+        by, value = _css_locator(by, value)
+        if by not in FIND_ONE:
+            raise WebDriverException(f"Locator strategy not supported by the DevTools backend: {by}")
+        generation = self.document_generation
+        remote = self._evaluate(FIND_ONE[by].format(json.dumps(value)), by_value=False)
+        if remote.get("subtype") != "node" or not remote.get("objectId"):
+            raise NoSuchElementException(f"No element matches {by}={value}")
+        return CDPElement(self, remote["objectId"], generation)
+
+    def find_elements(self, by="css selector", value=None):
+        by, value = _css_locator(by, value)
+        if by not in FIND_ALL:
+            raise WebDriverException(f"Locator strategy not supported by the DevTools backend: {by}")
+        generation = self.document_generation
+        remote = self._evaluate(FIND_ALL[by].format(json.dumps(value)), by_value=False)
+        if not remote.get("objectId"):
+            return []
+        properties = self._send("Runtime.getProperties", {"objectId": remote["objectId"], "ownProperties": True})
+        items = sorted((int(prop["name"]), prop["value"]["objectId"]) for prop in properties.get("result", [])
+                       if prop["name"].isdigit() and prop.get("value", {}).get("objectId"))
+        return [CDPElement(self, object_id, generation) for _, object_id in items]
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self._send(cmd, cmd_args)
+
+    def get_cookies(self):
+        return self._send("Network.getCookies").get("cookies", [])
+
+    def add_cookie(self, cookie):
+        cookie = dict(cookie)
+        if "expiry" in cookie:
+            cookie["expires"] = cookie.pop("expiry")
+        if not cookie.get("domain"):
+            cookie["url"] = self.current_url
+        self._send("Network.setCookie", cookie)
+
+    def delete_all_cookies(self):
+        self._send("Network.clearBrowserCookies")
+
+    def get_log(self, log_type):
+        """Network events since the last call, in chromedriver's performance-log format"""
+        if log_type != "performance":
+            return []
+        entries, self._performance_log = self._performance_log, []
+        return entries
+
+    def quit(self):
+        if self._closed:
+            return
+        self._closed = True
+        process = self.service.process
+        try:
+            if self._owns_browser:
+                self._connection.send("Browser.close", timeout=5)
+            else:
+                self._connection.send("Target.closeTarget", {"targetId": self.target_id}, timeout=5)
+        except Exception:
+            pass
+        if not self._owns_browser:
+            return
+        self._connection.close()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait(timeout=5)
+        shutil.rmtree(self._user_data_dir, ignore_errors=True)
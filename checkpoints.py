@@ -0,0 +1,104 @@
+"""
+Per-day stage checkpoints.
+Each stage of a run (driver up, code obtained, redeemed, activated)
+records its output in a small JSON file per account and day,
+so a retry - in the same process or a later one - resumes from the last
+good stage and reuses today's gift code instead of asking the library
+portal for a new one. A retry after the redeem click goes straight to the
+page the click led to instead of redeeming the code again.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+from config import CHECKPOINT_DIR
+from accounts import account_slug
+
+STAGE_DRIVER_UP = "driver_up"
+STAGE_CODE_OBTAINED = "code_obtained"
+STAGE_REDEEMED = "redeemed"
+STAGE_ACTIVATED = "activated"
+
+# Stages in pipeline order
+STAGES = [STAGE_DRIVER_UP, STAGE_CODE_OBTAINED, STAGE_REDEEMED, STAGE_ACTIVATED]
+
+
+def checkpoint_file(account_name, day=None):
+    """Path of an account's checkpoint file for a day (default today)"""
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    return os.path.join(CHECKPOINT_DIR, f"{day}_{account_slug(account_name)}.json")
+
+
+class Checkpoint:
+    """Stages an account has completed today and what each produced"""
+
+    def __init__(self, account_name, stages=None):
+        self.account_name = account_name
+        self.path = checkpoint_file(account_name)
+        self.stages = stages or {}
+
+    def reached(self, stage):
+        return stage in self.stages
+
+    def get(self, stage, key, default=None):
+        return self.stages.get(stage, {}).get(key, default)
+
+    def last_stage(self):
+        """The furthest stage completed today, or None"""
+        return next((stage for stage in reversed(STAGES) if stage in self.stages), None)
+
+    def mark(self, stage, logger=None, **outputs):
+        """Record a completed stage and its outputs, persisting the checkpoint"""
+        self.stages[stage] = dict(outputs, completed_at=time.time())
+        try:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({"account": self.account_name, "stages": self.stages}, f)
+            os.chmod(tmp_file, 0o600)
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            if logger:
+                logger.warning(f"Could not save checkpoint for stage '{stage}': {e}")
+
+
+def _prune(logger):
+    """Remove checkpoint files from previous days"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return
+    for name in os.listdir(CHECKPOINT_DIR):
+        if name.endswith(".json") and not name.startswith(today):
+            try:
+                os.remove(os.path.join(CHECKPOINT_DIR, name))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Could not remove old checkpoint {name}: {e}")
+
+
+def load_checkpoint(logger, account_name):
+    """Load today's checkpoint for an account (empty if none)"""
+    _prune(logger)
+    path = checkpoint_file(account_name)
+    if not os.path.exists(path):
+        return Checkpoint(account_name)
+    try:
+        with open(path, 'r') as f:
+            return Checkpoint(account_name, json.load(f).get("stages", {}))
+    except Exception as e:
+        logger.warning(f"Could not read checkpoint - starting from scratch: {e}")
+        return Checkpoint(account_name)
+
+
+def resume_checkpoint(logger, account_name, force=False):
+    """
+    The checkpoint a run resumes from: today's, unless the run is forced or
+    today's run already got as far as activation, which start from scratch
+    """
+    checkpoint = load_checkpoint(logger, account_name)
+    if checkpoint.stages and (force or checkpoint.reached(STAGE_ACTIVATED)):
+        logger.info(f"Ignoring today's checkpoint (last completed stage: {checkpoint.last_stage()}) - starting over")
+        return Checkpoint(account_name)
+    return checkpoint
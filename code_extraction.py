@@ -0,0 +1,133 @@
+"""
+Gift code extraction from the library portal's result page.
+One injected script collects the candidate strings (text of elements that
+mention a code, link hrefs, form values and meta refresh targets) in a
+single WebDriver call; ranked patterns are then applied in Python. The same
+candidates can be built from saved HTML, so extraction can be tested offline.
+"""
+
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+Candidates = namedtuple("Candidates", ["texts", "hrefs", "values"])
+
+# Ranked code patterns: (name, regex, candidate kinds it applies to).
+# Earlier patterns win; the first group of the regex is the code.
+CODE_PATTERNS = [
+    ("gift_code_param", re.compile(r'gift_code=([A-Za-z0-9_-]+)'), ("hrefs", "values", "texts")),
+    ("labelled_code", re.compile(r'code\W{0,10}([A-Za-z0-9]{16,})', re.IGNORECASE), ("texts", "values")),
+    ("long_token", re.compile(r'\b([A-Za-z0-9]{16,})\b'), ("texts",)),
+]
+
+# Element text is only collected when its own text mentions a code
+CODE_KEYWORD = re.compile(r'code', re.IGNORECASE)
+
+MAX_CANDIDATES = 200
+
+# Returns {"texts", "hrefs", "values"} for the current document in one call
+COLLECT_SCRIPT = """
+var limit = arguments[0];
+var texts = [], hrefs = [], values = [], seen = new Set();
+var walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+var node;
+while ((node = walker.nextNode()) && texts.length < limit) {
+    var parent = node.parentElement;
+    if (!parent || seen.has(parent) || /^(SCRIPT|STYLE|NOSCRIPT)$/.test(parent.tagName)) { continue; }
+    if (/code/i.test(node.nodeValue)) {
+        seen.add(parent);
+        texts.push(parent.innerText || parent.textContent || '');
+    }
+}
+document.querySelectorAll('a[href]').forEach(function(a) {
+    if (hrefs.length < limit) { hrefs.push(a.href); }
+});
+document.querySelectorAll('input, textarea').forEach(function(el) {
+    if (values.length < limit && el.value) { values.push(el.value); }
+});
+document.querySelectorAll('meta[http-equiv]').forEach(function(meta) {
+    if (/refresh/i.test(meta.httpEquiv) && meta.content) { values.push(meta.content); }
+});
+return {texts: texts, hrefs: hrefs, values: values};
+"""
+
+
+def find_code(candidates):
+    """Apply the ranked patterns to candidates. Returns (code, pattern name) or None"""
+    for name, pattern, kinds in CODE_PATTERNS:
+        for kind in kinds:
+            for value in getattr(candidates, kind):
+                match = pattern.search(value or "")
+                if match:
+                    return match.group(1), name
+    return None
+
+
+def collect_candidates(driver):
+    """Collect candidate strings from the page in the browser with one script call"""
+    payload = driver.execute_script(COLLECT_SCRIPT, MAX_CANDIDATES) or {}
+    return Candidates(payload.get("texts", []), payload.get("hrefs", []), payload.get("values", []))
+
+
+def extract_code(driver):
+    """Find the gift code on the current page. Returns (code, pattern name) or None"""
+    return find_code(collect_candidates(driver))
+
+
+class _CandidateParser(HTMLParser):
+    """Build the same candidates as COLLECT_SCRIPT from raw HTML"""
+
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+    SKIP_TAGS = {"script", "style", "noscript"}
+
+    def __init__(self):
+        super().__init__()
+        self.candidates = Candidates([], [], [])
+        self._stack = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self.candidates.hrefs.append(attrs["href"])
+        elif tag in ("input", "textarea") and attrs.get("value"):
+            self.candidates.values.append(attrs["value"])
+        elif tag == "meta" and (attrs.get("http-equiv") or "").lower() == "refresh" and attrs.get("content"):
+            self.candidates.values.append(attrs["content"])
+        if tag not in self.VOID_TAGS:
+            self._stack.append({"tag": tag, "parts": [], "mentions_code": False})
+
+    def handle_endtag(self, tag):
+        # Pop up to the matching tag, tolerating unclosed elements
+        if not any(element["tag"] == tag for element in self._stack):
+            return
+        while self._stack:
+            element = self._stack.pop()
+            if element["mentions_code"] and len(self.candidates.texts) < MAX_CANDIDATES:
+                self.candidates.texts.append(" ".join(" ".join(element["parts"]).split()))
+            if element["tag"] == tag:
+                break
+
+    def handle_data(self, data):
+        if not self._stack or any(element["tag"] in self.SKIP_TAGS for element in self._stack):
+            return
+        for element in self._stack:
+            element["parts"].append(data)
+        if CODE_KEYWORD.search(data):
+            self._stack[-1]["mentions_code"] = True
+
+    def close(self):
+        super().close()
+        self.handle_endtag(self._stack[0]["tag"] if self._stack else "")
+
+
+def candidates_from_html(html):
+    """Build extraction candidates from saved or fetched HTML"""
+    parser = _CandidateParser()
+    parser.feed(html)
+    parser.close()
+    return parser.candidates
+
+
+def extract_code_from_html(html):
+    """Find the gift code in raw HTML. Returns (code, pattern name) or None"""
+    return find_code(candidates_from_html(html))
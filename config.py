@@ -9,22 +9,135 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Library configuration
-LIBRARY_URL = "https://pr.indypl.org/nyt/nytTokenSignIn.php?section=digital"
+LIBRARY_URL = os.getenv("LIBRARY_URL", "https://pr.indypl.org/nyt/nytTokenSignIn.php?section=digital")
 LIBRARY_CARD_BARCODE = os.getenv("LIBRARY_CARD_BARCODE", "")
 
+# Submit the library form over plain HTTP before falling back to the browser
+LIBRARY_HTTP_FAST_PATH = os.getenv("LIBRARY_HTTP_FAST_PATH", "true").lower() == "true"
+LIBRARY_HTTP_TIMEOUT = float(os.getenv("LIBRARY_HTTP_TIMEOUT", "15"))
+
 # NY Times configuration
-NYT_REDEEM_BASE_URL = "https://www.nytimes.com/subscription/redeem"
+NYT_REDEEM_BASE_URL = os.getenv("NYT_REDEEM_BASE_URL", "https://www.nytimes.com/subscription/redeem")
 NYT_USERNAME = os.getenv("NYT_USERNAME", "")
 NYT_PASSWORD = os.getenv("NYT_PASSWORD", "")
 
+# Name recorded for this account in the run ledger
+ACCOUNT_NAME = os.getenv("ACCOUNT_NAME", NYT_USERNAME or "default")
+
+# Optional JSON roster of several library card / NY Times account pairs
+ACCOUNTS_FILE = os.getenv("ACCOUNTS_FILE", "")
+
+# Number of accounts processed at once (each uses its own browser)
+WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "1"))
+
+# Extra attempts per account after a failed run
+ACCOUNT_RETRIES = int(os.getenv("ACCOUNT_RETRIES", "1"))
+
+# Delay before the first retry, doubled for each further retry up to the maximum (seconds)
+RETRY_BACKOFF_SECONDS = float(os.getenv("RETRY_BACKOFF_SECONDS", "5"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "120"))
+
 # Browser configuration
 HEADLESS = os.getenv("HEADLESS", "true").lower() == "true"
 BROWSER = os.getenv("BROWSER", "chrome")  # chrome or firefox
+# How Chrome is driven: "selenium" (through chromedriver) or "cdp" (directly over the DevTools protocol)
+DRIVER_BACKEND = os.getenv("DRIVER_BACKEND", "selenium").lower()
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Chrome flags for small hosts (one renderer, no cache, extensions or background networking)
+LOW_MEMORY_MODE = os.getenv("LOW_MEMORY_MODE", "false").lower() == "true"
+# Quit the browser and fail the run before Chrome's process tree reaches this many MB (0 = no limit)
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "0"))
+
+# Block images, fonts, media and ad/analytics hosts during page loads
+BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "false").lower() == "true"
+BLOCKED_RESOURCE_TYPES = [t.strip() for t in os.getenv("BLOCKED_RESOURCE_TYPES", "image,font,media").split(",") if t.strip()]
+# Extra hosts to block, and hosts that must never be blocked (comma-separated)
+BLOCKED_HOSTS = [h.strip() for h in os.getenv("BLOCKED_HOSTS", "").split(",") if h.strip()]
+ALLOWED_HOSTS = [h.strip() for h in os.getenv("ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+# Record per-request network timings for each run (and optionally a HAR file)
+NETWORK_CAPTURE = os.getenv("NETWORK_CAPTURE", "false").lower() == "true"
+NETWORK_HAR = os.getenv("NETWORK_HAR", "false").lower() == "true"
+
+# Save a sanitized copy of every page at the flow's decision points (for offline replay)
+RECORD_DOM_CORPUS = os.getenv("RECORD_DOM_CORPUS", "false").lower() == "true"
 
 # Force run (bypass duplicate run check)
 FORCE_RUN = os.getenv("FORCE_RUN", "false").lower() == "true"
 
 # Logging configuration
-LOG_DIR = os.path.join(os.path.dirname(__file__), "logs")
+LOG_DIR = os.getenv("LOG_DIR", os.path.join(os.path.dirname(__file__), "logs"))
 LOG_FILE = os.path.join(LOG_DIR, "automation.log")
 
+# Persistent data (saved session, run history) lives on the mounted logs volume by default
+DATA_DIR = os.getenv("DATA_DIR", LOG_DIR)
+
+# Saved NY Times session (skips the email/password login while it is valid)
+SESSION_PERSISTENCE = os.getenv("SESSION_PERSISTENCE", "true").lower() == "true"
+SESSION_DIR = DATA_DIR
+SESSION_MAX_AGE_DAYS = int(os.getenv("SESSION_MAX_AGE_DAYS", "30"))
+# With a saved session, redeem over plain HTTP first and start Chrome only if that fails
+NYT_HTTP_REDEEM = os.getenv("NYT_HTTP_REDEEM", "true").lower() == "true"
+
+# Cached chromedriver location and the browser version it matches
+DRIVER_CACHE_FILE = os.path.join(DATA_DIR, "driver_cache.json")
+
+# Hosts outside the allowlist that served images/fonts/media, with their sizes (type blocking and its savings estimate)
+RESOURCE_SIZES_FILE = os.path.join(DATA_DIR, "resource_sizes.json")
+
+# Recorded pages replayed by dom_corpus.py
+DOM_CORPUS_DIR = os.getenv("DOM_CORPUS_DIR", os.path.join(DATA_DIR, "dom_corpus"))
+
+# Per-run network summaries and HAR files
+NETWORK_DIR = os.path.join(DATA_DIR, "network")
+
+# Per-run spans (spans.jsonl) and Prometheus textfile metrics (nyt_automation.prom)
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+
+# Run ledger (one row per run; answers "already done today?")
+LEDGER_FILE = os.path.join(DATA_DIR, "runs.db")
+
+# Locators learned per page version for the NY Times form elements
+LOCATOR_CACHE_FILE = os.path.join(DATA_DIR, "locators.json")
+
+# Per-day stage checkpoints (lets retries reuse today's gift code and resume)
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+
+# Per-host rate limiter and circuit breaker state (kept across runs)
+RATE_LIMIT_FILE = os.path.join(DATA_DIR, "rate_limit.json")
+# Navigations/HTTP calls per host per minute (0 = no limit), and how many may go out back to back
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "12"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "6"))
+# Failures in a row (timeouts, challenge pages, 403/429/5xx) before a host is backed off
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+# First back-off period, doubled each time the host fails again right after it (seconds)
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "300"))
+CIRCUIT_OPEN_MAX_SECONDS = float(os.getenv("CIRCUIT_OPEN_MAX_SECONDS", "3600"))
+# Page loads slower than this count as a failure (seconds)
+SLOW_RESPONSE_SECONDS = float(os.getenv("SLOW_RESPONSE_SECONDS", "20"))
+
+
+# Daemon mode (python3 daemon.py): daily run time in HH:MM, local time
+DAEMON_RUN_TIME = os.getenv("DAEMON_RUN_TIME", "06:00")
+DAEMON_JITTER_MINUTES = int(os.getenv("DAEMON_JITTER_MINUTES", "10"))
+# "fixed" runs at DAEMON_RUN_TIME; "rollover" starts when the library portal issues the new code
+SCHEDULE_MODE = os.getenv("SCHEDULE_MODE", "fixed").lower()
+# Start probing this long before the learned rollover time, using this many days of history
+ROLLOVER_LEAD_MINUTES = int(os.getenv("ROLLOVER_LEAD_MINUTES", "10"))
+ROLLOVER_HISTORY_DAYS = int(os.getenv("ROLLOVER_HISTORY_DAYS", "14"))
+# Delay after the first probe, doubled after each further one up to the maximum (seconds)
+ROLLOVER_PROBE_SECONDS = float(os.getenv("ROLLOVER_PROBE_SECONDS", "60"))
+ROLLOVER_PROBE_MAX_SECONDS = float(os.getenv("ROLLOVER_PROBE_MAX_SECONDS", "600"))
+# Most probes per day before falling back to DAEMON_RUN_TIME
+ROLLOVER_MAX_PROBES = int(os.getenv("ROLLOVER_MAX_PROBES", "24"))
+# Pre-launch the browser this many seconds before each run
+DAEMON_WARM_BROWSER = os.getenv("DAEMON_WARM_BROWSER", "true").lower() == "true"
+DAEMON_WARM_LEAD_SECONDS = int(os.getenv("DAEMON_WARM_LEAD_SECONDS", "60"))
+
+# Serve /status and /health as JSON from the daemon (bound to localhost unless STATUS_HOST says otherwise)
+STATUS_SERVER = os.getenv("STATUS_SERVER", "false").lower() == "true"
+STATUS_HOST = os.getenv("STATUS_HOST", "127.0.0.1")
+STATUS_PORT = int(os.getenv("STATUS_PORT", "8787"))
+# Recent runs per account the per-stage p50/p95 are computed over
+STATUS_HISTORY_RUNS = int(os.getenv("STATUS_HISTORY_RUNS", "30"))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Long-running daemon mode for NY Times Library Automation.
+Stays resident instead of being cold-started by cron or launchd: Python,
+Selenium and the chromedriver path are loaded once, the daily run is
+scheduled in-process (with jitter and catch-up after downtime), and a
+browser is pre-launched shortly before each run. With SCHEDULE_MODE=rollover
+the run starts as soon as the library portal issues the day's new code
+(see rollover.py), falling back to the fixed run time.
+"""
+
+import sys
+import signal
+import random
+import threading
+from datetime import datetime, timedelta
+import run_ledger
+import rollover
+import status_server
+from accounts import load_accounts
+from nyt_library_automation import setup_logging, create_driver, resolve_chromedriver, preload_modules, run_all
+from config import (
+    DAEMON_RUN_TIME,
+    DAEMON_JITTER_MINUTES,
+    DAEMON_WARM_BROWSER,
+    DAEMON_WARM_LEAD_SECONDS,
+    DRIVER_BACKEND,
+    SCHEDULE_MODE,
+    STATUS_SERVER
+)
+
+# Longest single sleep, so wall-clock jumps (NAS suspend, DST) are noticed
+MAX_SLEEP_SECONDS = 60
+
+stop_event = threading.Event()
+
+
+class WarmDriver:
+    """Hands out a pre-launched browser to the first caller, then creates new ones"""
+
+    def __init__(self):
+        self._driver = None
+        self._lock = threading.Lock()
+
+    def launch(self, logger):
+        with self._lock:
+            if self._driver is None:
+                logger.info("Pre-launching browser for the next run...")
+                try:
+                    self._driver = create_driver()
+                except Exception as e:
+                    logger.warning(f"Could not pre-launch browser: {e}")
+
+    def discard(self):
+        with self._lock:
+            if self._driver is not None:
+                self._driver.quit()
+                self._driver = None
+
+    def __call__(self):
+        with self._lock:
+            driver, self._driver = self._driver, None
+        return driver if driver is not None else create_driver()
+
+
+def scheduled_time(day):
+    """Return the run time for a given date, including that day's jitter"""
+    hour, minute = (int(part) for part in DAEMON_RUN_TIME.split(":"))
+    # Seed by date so the jitter is stable across daemon restarts on the same day
+    jitter = random.Random(day.toordinal()).uniform(0, DAEMON_JITTER_MINUTES * 60)
+    return datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute) + timedelta(seconds=jitter)
+
+
+def run_time(day, logger):
+    """Return when to start on a given date: the learned rollover wake time if earlier, else the fixed time"""
+    fixed = scheduled_time(day)
+    if SCHEDULE_MODE == "rollover":
+        wake = rollover.earliest_wake_time(day, load_accounts(), logger)
+        if wake is not None and wake < fixed:
+            return wake
+    return fixed
+
+
+def all_done_today():
+    """Return True if every account already has a successful run today"""
+    return all(run_ledger.succeeded_today(account.name) for account in load_accounts())
+
+
+def next_run_time(now, last_attempt_date, logger):
+    """
+    Return when the next run should start. If today's run time has passed
+    and no attempt has been made today (e.g. after downtime), run now.
+    """
+    today_run = run_time(now.date(), logger)
+    if now < today_run:
+        return today_run
+    if last_attempt_date != now.date():
+        try:
+            if not all_done_today():
+                logger.info("Missed today's scheduled run - catching up now")
+                return now
+        except Exception as e:
+            logger.warning(f"Could not check today's runs: {e}")
+    return run_time(now.date() + timedelta(days=1), logger)
+
+
+def sleep_until(when, warm_driver, logger):
+    """Sleep until the given time, pre-launching the browser shortly before it"""
+    while not stop_event.is_set():
+        remaining = (when - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return True
+        if DAEMON_WARM_BROWSER:
+            if remaining <= DAEMON_WARM_LEAD_SECONDS:
+                warm_driver.launch(logger)
+            else:
+                # Wake up in time to pre-launch the browser
+                remaining -= DAEMON_WARM_LEAD_SECONDS
+        stop_event.wait(min(remaining, MAX_SLEEP_SECONDS))
+    return False
+
+
+def handle_signal(signum, frame):
+    stop_event.set()
+
+
+def main():
+    """Daemon entry point"""
+    logger = setup_logging()
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    logger.info("Starting NY Times Library Automation daemon")
+    logger.info(f"Daily run time: {DAEMON_RUN_TIME} (+ up to {DAEMON_JITTER_MINUTES} min jitter)")
+
+    # Import and resolve the driver stack up front so each run skips it
+    try:
+        preload_modules()
+        if DRIVER_BACKEND == "selenium":
+            resolve_chromedriver()
+    except Exception as e:
+        logger.warning(f"Could not resolve chromedriver at startup: {e}")
+
+    server = status_server.start_status_server(logger) if STATUS_SERVER else None
+    warm_driver = WarmDriver()
+    last_attempt_date = None
+
+    try:
+        while not stop_event.is_set():
+            when = next_run_time(datetime.now(), last_attempt_date, logger)
+            logger.info(f"Next run scheduled for {when.strftime('%Y-%m-%d %H:%M:%S')}")
+            status_server.set_next_run(when)
+            if not sleep_until(when, warm_driver, logger):
+                break
+
+            last_attempt_date = datetime.now().date()
+            fixed = scheduled_time(last_attempt_date)
+            if SCHEDULE_MODE == "rollover" and datetime.now() < fixed:
+                # Woke early for the rollover: wait for the new code, or the fixed time if it doesn't show
+                if not rollover.wait_for_fresh_code(load_accounts(), logger, stop_event, fixed):
+                    status_server.set_next_run(fixed)
+                    if not sleep_until(fixed, warm_driver, logger):
+                        break
+            try:
+                run_all(logger, driver_factory=warm_driver)
+            except Exception as e:
+                logger.error(f"Scheduled run failed: {e}", exc_info=True)
+            finally:
+                warm_driver.discard()
+    finally:
+        warm_driver.discard()
+        if server:
+            server.shutdown()
+        logger.info("Daemon stopped")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
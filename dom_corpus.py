@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Record-and-replay corpus of pages seen at the flow's decision points.
+With RECORD_DOM_CORPUS=true every decision point saves the URL, title,
+the browser's page snapshot and a sanitized copy of the DOM (no scripts,
+styles, typed credentials, email addresses or card numbers). Each capture
+is labelled per detector with what that detector finds in the sanitized
+copy; the labels detected live on the original page are kept alongside.
+The replay command re-runs the page-state classifier (on the snapshot and
+on the HTML) and the code extraction over the whole corpus offline,
+reporting disagreements with the labels and the time each detector takes:
+
+    python3 dom_corpus.py replay --repeat 20
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+import metrics
+from accounts import account_slug
+from page_state import PageSnapshot, take_snapshot, classify, snapshot_from_html
+from code_extraction import extract_code_from_html
+from config import RECORD_DOM_CORPUS, DOM_CORPUS_DIR
+
+# Bumped when the capture format changes; replay skips captures newer than it understands
+CORPUS_VERSION = 3
+
+# Returns the document with scripts, styles and typed credentials removed
+SANITIZED_DOM_SCRIPT = """
+var clone = document.documentElement.cloneNode(true);
+clone.querySelectorAll('script, style, noscript, iframe, link, svg, template').forEach(function(node) {
+    node.remove();
+});
+clone.querySelectorAll('input, textarea').forEach(function(el) {
+    var type = (el.getAttribute('type') || '').toLowerCase();
+    var name = (el.getAttribute('name') || '').toLowerCase();
+    if (type === 'password' || type === 'email' || name === 'email' || name === 'username' || name === 'cnum') {
+        el.setAttribute('value', '');
+    } else if (el.value) {
+        el.setAttribute('value', el.value);
+    }
+});
+return '<!DOCTYPE html>\\n' + clone.outerHTML;
+"""
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+CARD_NUMBER_PATTERN = re.compile(r'\b\d{14}\b')
+
+
+def sanitize(text):
+    """Replace email addresses and library card numbers"""
+    return CARD_NUMBER_PATTERN.sub("00000000000000", EMAIL_PATTERN.sub("user@example.com", text or ""))
+
+
+def _labels(snapshot, html):
+    """
+    What each detector finds: the state from the snapshot, the state from the
+    HTML alone (which can't see CSS-hidden fields, so it may differ) and the code
+    """
+    extracted = extract_code_from_html(html)
+    return {
+        "state": classify(snapshot).value,
+        "html_state": classify(snapshot_from_html(snapshot.url, html)).value,
+        "code": extracted[0] if extracted else None,
+    }
+
+
+def _write(point, capture, logger):
+    run = metrics.current_run()
+    account = run.account if run else "default"
+    now = datetime.now()
+    directory = os.path.join(DOM_CORPUS_DIR, now.strftime('%Y-%m-%d'))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{now.strftime('%H%M%S%f')}_{account_slug(account)}_{point}.json")
+    with open(path, 'w') as f:
+        json.dump(dict(capture, version=CORPUS_VERSION, point=point,
+                       captured_at=now.isoformat(timespec='seconds')), f, indent=1)
+    if logger:
+        logger.info(f"Recorded page for DOM corpus: {point}")
+
+
+def record_page(driver, point, logger=None):
+    """Save the current browser page at a decision point (no-op unless RECORD_DOM_CORPUS)"""
+    if not RECORD_DOM_CORPUS:
+        return
+    try:
+        snapshot = take_snapshot(driver)
+        html = driver.execute_script(SANITIZED_DOM_SCRIPT) or ""
+        # Label what is stored, so replay compares like with like
+        stored = PageSnapshot(sanitize(snapshot.url), sanitize(snapshot.title), sanitize(snapshot.text),
+                              snapshot.has_email_field, snapshot.has_password_field)
+        stored_html = sanitize(html)
+        _write(point, {
+            "source": "browser",
+            "url": stored.url,
+            "title": stored.title,
+            "snapshot": {
+                "text": stored.text,
+                "has_email_field": stored.has_email_field,
+                "has_password_field": stored.has_password_field,
+            },
+            "html": stored_html,
+            "expected": _labels(stored, stored_html),
+            "live": _labels(snapshot, html),
+        }, logger)
+    except Exception as e:
+        if logger:
+            logger.warning(f"Could not record page for DOM corpus: {e}")
+
+
+def record_html(url, html, point, logger=None):
+    """Save a page fetched over HTTP at a decision point (no-op unless RECORD_DOM_CORPUS)"""
+    if not RECORD_DOM_CORPUS:
+        return
+    try:
+        stripped = re.sub(r'<(script|style|noscript)\b.*?</\1\s*>', '', html, flags=re.IGNORECASE | re.DOTALL)
+        stored_url, stored_html = sanitize(url), sanitize(stripped)
+        stored = snapshot_from_html(stored_url, stored_html)
+        _write(point, {
+            "source": "http",
+            "url": stored_url,
+            "title": stored.title,
+            "snapshot": None,
+            "html": stored_html,
+            "expected": _labels(stored, stored_html),
+            "live": _labels(snapshot_from_html(url, html), html),
+        }, logger)
+    except Exception as e:
+        if logger:
+            logger.warning(f"Could not record page for DOM corpus: {e}")
+
+
+def load_corpus(corpus_dir, point=None):
+    """Return [(path, capture)] for every capture this version understands"""
+    captures = []
+    for root, _, files in os.walk(corpus_dir):
+        for name in sorted(files):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'r') as f:
+                capture = json.load(f)
+            if capture.get("version", 0) > CORPUS_VERSION:
+                print(f"Skipping {path}: corpus version {capture['version']} is newer than {CORPUS_VERSION}")
+                continue
+            if point and capture.get("point") != point:
+                continue
+            captures.append((path, capture))
+    return sorted(captures)
+
+
+def replay(captures, repeat=1):
+    """Run the detectors over captures. Returns (mismatches, {detector: seconds per page})"""
+    detectors = {
+        "classify_snapshot": lambda capture: capture["snapshot"] and classify(PageSnapshot(
+            capture["url"], capture["title"], capture["snapshot"]["text"],
+            capture["snapshot"]["has_email_field"], capture["snapshot"]["has_password_field"])).value,
+        "classify_html": lambda capture: classify(snapshot_from_html(capture["url"], capture["html"])).value,
+        "extract_code": lambda capture: (extract_code_from_html(capture["html"]) or (None,))[0],
+    }
+    expected_key = {"classify_snapshot": "state", "classify_html": "html_state", "extract_code": "code"}
+    timings = {name: 0.0 for name in detectors}
+    mismatches = []
+
+    for path, capture in captures:
+        for name, detector in detectors.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                result = detector(capture)
+            timings[name] += time.perf_counter() - start
+            if name == "classify_snapshot" and not capture["snapshot"]:
+                continue
+            labels = capture.get("expected", {})
+            # Captures before version 3 have a single state label
+            expected = labels.get(expected_key[name], labels.get("state"))
+            if result != expected:
+                mismatches.append({"file": path, "point": capture.get("point"), "detector": name,
+                                   "expected": expected, "got": result})
+
+    pages = max(len(captures) * repeat, 1)
+    return mismatches, {name: seconds / pages for name, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the recorded DOM corpus through the page detectors")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = subcommands.add_parser("replay", help="check and time the detectors against the corpus")
+    replay_parser.add_argument("--corpus", default=DOM_CORPUS_DIR)
+    replay_parser.add_argument("--point", help="only captures from this decision point")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="run each detector this many times per page")
+    replay_parser.add_argument("--json", dest="json_output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    captures = load_corpus(args.corpus, args.point)
+    if not captures:
+        print(f"No captures found in {args.corpus} (record some with RECORD_DOM_CORPUS=true)")
+        return 1
+
+    start = time.perf_counter()
+    mismatches, per_page = replay(captures, args.repeat)
+    elapsed = time.perf_counter() - start
+
+    points = {}
+    for _, capture in captures:
+        points[capture.get("point")] = points.get(capture.get("point"), 0) + 1
+    print(f"Replayed {len(captures)} captures x{args.repeat} in {elapsed:.2f}s "
+          f"({', '.join(f'{point}: {count}' for point, count in sorted(points.items()))})")
+    for name, seconds in per_page.items():
+        print(f"  {name:<18} {seconds * 1e6:9.1f} us/page")
+    for mismatch in mismatches:
+        print(f"MISMATCH {mismatch['detector']} {mismatch['file']}: "
+              f"expected {mismatch['expected']!r}, got {mismatch['got']!r}")
+    print(f"{len(mismatches)} mismatches")
+
+    if args.json_output:
+        with open(args.json_output, 'w') as f:
+            json.dump({"captures": len(captures), "repeat": args.repeat, "us_per_page":
+                       {name: round(seconds * 1e6, 1) for name, seconds in per_page.items()},
+                       "mismatches": mismatches}, f, indent=2)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Offline chromedriver resolution cache.
+Remembers the chromedriver binary webdriver-manager resolved and the browser
+version it was resolved for, so later runs reuse it without touching the
+network until the installed browser's major version changes.
+"""
+
+import os
+import re
+import json
+import shutil
+import subprocess
+from lazy_import import LazyModule
+from config import DRIVER_CACHE_FILE
+
+webdriver_manager_chrome = LazyModule("webdriver_manager.chrome")
+
+BROWSER_BINARIES = [
+    "google-chrome",
+    "google-chrome-stable",
+    "chromium",
+    "chromium-browser",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+
+
+def _browser_paths():
+    for binary in BROWSER_BINARIES:
+        path = shutil.which(binary) or (binary if os.path.isfile(binary) else None)
+        if path:
+            yield path
+
+
+def find_browser_binary():
+    """Return the path of the installed Chrome/Chromium, or None"""
+    return next(_browser_paths(), None)
+
+
+def detect_browser_version():
+    """Return the installed Chrome/Chromium version string, or None"""
+    for path in _browser_paths():
+        try:
+            output = subprocess.run(
+                [path, "--version"], capture_output=True, text=True, timeout=10
+            ).stdout
+        except Exception:
+            continue
+        version_match = re.search(r'(\d+)\.\d+\.\d+(?:\.\d+)?', output)
+        if version_match:
+            return version_match.group()
+    return None
+
+
+def _major(version):
+    return version.split(".")[0] if version else None
+
+
+def _load_cache():
+    try:
+        with open(DRIVER_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_cache(entry):
+    os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+    tmp_file = f"{DRIVER_CACHE_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(entry, f)
+    os.replace(tmp_file, DRIVER_CACHE_FILE)
+
+
+def resolve_chromedriver_path():
+    """
+    Return (chromedriver path, source). source is "system" for a chromedriver
+    on PATH, "cache" for a cached download and "download" when
+    webdriver-manager had to resolve it.
+    """
+    # Docker images ship a matching chromedriver on PATH
+    system_chromedriver = shutil.which("chromedriver")
+    if system_chromedriver:
+        return system_chromedriver, "system"
+
+    browser_version = detect_browser_version()
+    cache = _load_cache()
+    cached_path = cache.get("chromedriver_path")
+    if (cached_path and os.path.isfile(cached_path) and os.access(cached_path, os.X_OK)
+            and browser_version and _major(cache.get("browser_version")) == _major(browser_version)):
+        return cached_path, "cache"
+
+    path = webdriver_manager_chrome.ChromeDriverManager().install()
+    try:
+        _save_cache({"chromedriver_path": path, "browser_version": browser_version})
+    except OSError:
+        pass
+    return path, "download"
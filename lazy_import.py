@@ -0,0 +1,35 @@
+"""
+Lazy module imports.
+Selenium's WebDriver stack and webdriver_manager take a noticeable share of
+startup on a small NAS, so they are imported on first use instead of at
+module import time, and the time each import took is recorded.
+"""
+
+import time
+import importlib
+import threading
+
+# Seconds spent importing each lazily loaded module
+import_times = {}
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        with _lock:
+            if self._module is None:
+                start = time.perf_counter()
+                self._module = importlib.import_module(self._name)
+                import_times[self._name] = round(time.perf_counter() - start, 3)
+        return self._module
+
+    def __getattr__(self, attr):
+        module = self._module if self._module is not None else self._load()
+        return getattr(module, attr)
@@ -0,0 +1,167 @@
+"""
+Browserless fast path for the library portal.
+Submits the IndyPL "Get Code" form over plain HTTP and reads the gift code
+off the redirect, so Chrome is only needed when the portal responds in a
+way we don't recognise.
+"""
+
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+import rate_limit
+from network_waterfall import timed_open
+from code_extraction import extract_code_from_html
+from config import (
+    LIBRARY_URL,
+    LIBRARY_CARD_BARCODE,
+    LIBRARY_HTTP_TIMEOUT,
+    USER_AGENT
+)
+
+class _LibraryFormParser(HTMLParser):
+    """Collect the form that contains the cNum barcode field"""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._current = {
+                "action": attrs.get("action") or "",
+                "method": (attrs.get("method") or "get").lower(),
+                "fields": [],
+                "has_barcode": False
+            }
+            self.forms.append(self._current)
+        elif tag == "input" and self._current is not None:
+            name = attrs.get("name")
+            input_type = (attrs.get("type") or "text").lower()
+            if name == "cNum":
+                self._current["has_barcode"] = True
+            elif name and input_type == "submit":
+                # Only send the submit value of the "Get Code" button
+                if attrs.get("value") == "Get Code":
+                    self._current["fields"].append((name, attrs.get("value")))
+            elif name and input_type not in ("button", "image", "reset"):
+                self._current["fields"].append((name, attrs.get("value") or ""))
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._current = None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Surface redirects as responses so the Location header can be inspected"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def parse_gift_code(url):
+    """Return the gift_code query parameter from a URL, or None"""
+    query_params = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+    if "gift_code" in query_params:
+        return query_params["gift_code"][0]
+    return None
+
+
+def _build_opener():
+    cookie_jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(cookie_jar),
+        _NoRedirect()
+    )
+    opener.addheaders = [("User-Agent", USER_AGENT)]
+    return opener
+
+
+def _open(opener, request, logger):
+    """Open a request through the host's rate limiter, returning redirect responses instead of raising"""
+    rate_limit.acquire(request.full_url, logger)
+    try:
+        response = timed_open(opener, request, LIBRARY_HTTP_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if 300 <= e.code < 400:
+            rate_limit.record_success(request.full_url)
+            return e
+        if e.code >= 500 or e.code in rate_limit.CHALLENGE_STATUSES:
+            rate_limit.record_failure(request.full_url, logger, f"HTTP {e.code}")
+        raise
+    except OSError as e:
+        rate_limit.record_failure(request.full_url, logger, f"{e.__class__.__name__}")
+        raise
+    rate_limit.record_success(request.full_url)
+    return response
+
+
+def fetch_library_code_http(logger, barcode=LIBRARY_CARD_BARCODE):
+    """
+    Get the gift code from the library portal without a browser.
+    Returns (gift_code, redirect_url), or None if the portal response
+    doesn't match what we expect and the Selenium path should be used.
+    """
+    try:
+        opener = _build_opener()
+
+        logger.info(f"Fetching library form over HTTP: {LIBRARY_URL}")
+        with _open(opener, urllib.request.Request(LIBRARY_URL), logger) as response:
+            form_html = response.read().decode("utf-8", errors="replace")
+
+        parser = _LibraryFormParser()
+        parser.feed(form_html)
+        form = next((f for f in parser.forms if f["has_barcode"]), None)
+        if form is None:
+            logger.info("Library form with barcode field not found - falling back to browser")
+            return None
+
+        fields = [("cNum", barcode)] + form["fields"]
+        action_url = urllib.parse.urljoin(LIBRARY_URL, form["action"])
+        body = urllib.parse.urlencode(fields)
+
+        logger.info("Submitting library form over HTTP...")
+        if form["method"] == "post":
+            request = urllib.request.Request(
+                action_url,
+                data=body.encode("utf-8"),
+                headers={"Content-Type": "application/x-www-form-urlencoded", "Referer": LIBRARY_URL}
+            )
+        else:
+            separator = "&" if urllib.parse.urlparse(action_url).query else "?"
+            request = urllib.request.Request(
+                f"{action_url}{separator}{body}",
+                headers={"Referer": LIBRARY_URL}
+            )
+
+        with _open(opener, request, logger) as response:
+            location = response.headers.get("Location")
+            if location:
+                redirect_url = urllib.parse.urljoin(action_url, location)
+                logger.info(f"Library portal redirected to: {redirect_url}")
+                gift_code = parse_gift_code(redirect_url)
+                if gift_code:
+                    logger.info(f"Found gift code in redirect: {gift_code}")
+                    return gift_code, redirect_url
+                logger.info("Redirect did not contain a gift code - falling back to browser")
+                return None
+
+            # Some portal versions render a meta refresh, link or the code itself instead of a 302
+            page = response.read().decode("utf-8", errors="replace")
+            extracted = extract_code_from_html(page)
+            if extracted:
+                gift_code, pattern_name = extracted
+                logger.info(f"Found gift code in response body: {gift_code} (matched {pattern_name})")
+                return gift_code, response.geturl()
+
+        logger.info("Library response did not contain a gift code - falling back to browser")
+        return None
+
+    except rate_limit.BackingOff:
+        raise
+    except Exception as e:
+        logger.warning(f"HTTP fast path for library code failed: {e}")
+        return None
@@ -0,0 +1,178 @@
+"""
+Adaptive locator cache.
+Each element the flow looks for is registered with its ranked alternative
+locators. The first time an element is found, through the full XPath
+union, the cache records which alternative matched for that page version.
+Later runs try that single cheap CSS/ID locator first and only fall back
+to the union (and relearn) when it stops matching.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from lazy_import import LazyModule
+from waits import wait_until
+from config import LOCATOR_CACHE_FILE
+
+EC = LazyModule("selenium.webdriver.support.expected_conditions")
+by = LazyModule("selenium.webdriver.common.by")
+
+# One way of finding an element: a CSS selector when one exists, and the XPath used in the union
+Locator = namedtuple("Locator", ["css", "xpath"])
+
+# Element kind -> (condition, ranked alternatives)
+TARGETS = {
+    "nyt_email": ("visible", [
+        Locator("input[type='email']", "//input[@type='email']"),
+        Locator("input[placeholder*='Email'], input[placeholder*='email']",
+                "//input[contains(@placeholder, 'Email') or contains(@placeholder, 'email')]"),
+        Locator("input[name='email'], input#email, input[name='username']",
+                "//input[@name='email' or @id='email' or @name='username']"),
+        Locator(None, "//label[contains(text(), 'Email')]/following-sibling::input"),
+        Locator(None, "//label[contains(text(), 'Email')]/../input"),
+    ]),
+    "nyt_email_continue": ("clickable", [
+        Locator(None, "//button[contains(text(), 'Continue') and not(@disabled)]"),
+        Locator("button[type='submit']:not([disabled])", "//button[@type='submit' and not(@disabled)]"),
+        Locator("input[type='submit'][value*='Continue']:not([disabled])",
+                "//input[@type='submit' and contains(@value, 'Continue') and not(@disabled)]"),
+    ]),
+    "nyt_password": ("visible", [
+        Locator("input[type='password']", "//input[@type='password']"),
+    ]),
+    "nyt_login_submit": ("clickable", [
+        Locator(None, "//button[contains(text(), 'Log in') or contains(text(), 'Sign in') or contains(text(), 'Login')]"),
+        Locator("button[type='submit']", "//button[@type='submit']"),
+        Locator("input[type='submit']", "//input[@type='submit']"),
+    ]),
+    "nyt_redeem": ("clickable", [
+        Locator(None, "//button[contains(text(), 'REDEEM') or contains(text(), 'Redeem')]"),
+        Locator("input[type='submit'][value*='REDEEM']", "//input[@type='submit' and contains(@value, 'REDEEM')]"),
+        Locator(None, "//button[@type='submit' and contains(., 'REDEEM')]"),
+    ]),
+    "nyt_activation_continue": ("clickable", [
+        Locator(None, "//button[contains(text(), 'Continue')]"),
+        Locator(None, "//button[@type='submit' and contains(text(), 'Continue')]"),
+        Locator(None, "//a[contains(text(), 'Continue')]"),
+    ]),
+}
+
+# How long the learned locator is tried alone before the union is also polled (seconds)
+LEARNED_GRACE = 1.0
+
+# Returns the index of the first XPath in arguments[1] that matches element arguments[0], or -1
+MATCHING_ALTERNATIVE_SCRIPT = """
+var el = arguments[0], xpaths = arguments[1];
+for (var i = 0; i < xpaths.length; i++) {
+    var result = document.evaluate(xpaths[i], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    for (var j = 0; j < result.snapshotLength; j++) {
+        if (result.snapshotItem(j) === el) { return i; }
+    }
+}
+return -1;
+"""
+
+_lock = threading.Lock()
+_learned = None
+
+
+def page_version(url):
+    """Key for a page layout: host and path, with numeric path segments collapsed"""
+    parsed = urlparse(url)
+    return f"{parsed.netloc}{re.sub(r'[0-9]+', '#', parsed.path) or '/'}"
+
+
+def _load():
+    global _learned
+    if _learned is None:
+        try:
+            with open(LOCATOR_CACHE_FILE, 'r') as f:
+                _learned = json.load(f)
+        except Exception:
+            _learned = {}
+    return _learned
+
+
+def _save():
+    os.makedirs(os.path.dirname(LOCATOR_CACHE_FILE), exist_ok=True)
+    tmp_file = f"{LOCATOR_CACHE_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(_learned, f, indent=2)
+    os.replace(tmp_file, LOCATOR_CACHE_FILE)
+
+
+def learned_locator(target, version):
+    """The alternative learned for a target on a page version, if it is still registered"""
+    with _lock:
+        entry = _load().get(target, {}).get(version)
+    if not entry:
+        return None
+    locator = Locator(entry.get("css"), entry.get("xpath"))
+    return locator if locator in TARGETS[target][1] else None
+
+
+def _learn(target, version, locator, logger):
+    with _lock:
+        entries = _load().setdefault(target, {})
+        if entries.get(version, {}).get("xpath") == locator.xpath:
+            return
+        entries[version] = {"css": locator.css, "xpath": locator.xpath, "learned_at": time.time()}
+        try:
+            _save()
+        except Exception as e:
+            logger.warning(f"Could not save learned locators: {e}")
+    logger.info(f"Learned locator for {target} on {version}: {locator.css or locator.xpath}")
+
+
+def _by(locator):
+    return (by.By.CSS_SELECTOR, locator.css) if locator.css else (by.By.XPATH, locator.xpath)
+
+
+def find(driver, target, timeout, logger):
+    """
+    Wait for a registered element and return it. Tries the locator learned
+    for this page version first, then the union of all alternatives.
+    Raises TimeoutException like WebDriverWait.
+    """
+    condition_name, alternatives = TARGETS[target]
+    condition = EC.visibility_of_element_located if condition_name == "visible" else EC.element_to_be_clickable
+    union = (by.By.XPATH, " | ".join(locator.xpath for locator in alternatives))
+    start = time.monotonic()
+    tried_learned = []
+
+    def _predicate(driver):
+        # The page may still be navigating, so the version is read on every poll
+        version = page_version(driver.current_url)
+        learned = learned_locator(target, version)
+        if learned:
+            tried_learned.append(learned)
+            # A learned locator that stopped matching raises; that must not
+            # abort the poll, or the union below is never reached
+            try:
+                element = condition(_by(learned))(driver)
+            except (NoSuchElementException, StaleElementReferenceException):
+                element = False
+            if element:
+                return element, version, learned
+            if time.monotonic() - start < LEARNED_GRACE:
+                return False
+        element = condition(union)(driver)
+        return (element, version, None) if element else False
+
+    element, version, matched = wait_until(driver, _predicate, target, timeout=timeout)
+    if matched is None:
+        if tried_learned:
+            logger.info(f"Learned locator for {target} did not match - relearning")
+        try:
+            index = driver.execute_script(MATCHING_ALTERNATIVE_SCRIPT, element,
+                                          [locator.xpath for locator in alternatives])
+            if index is not None and index >= 0:
+                _learn(target, version, alternatives[index], logger)
+        except Exception as e:
+            logger.warning(f"Could not record which locator matched {target}: {e}")
+    return element
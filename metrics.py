@@ -0,0 +1,210 @@
+"""
+Per-step timing spans and metrics export.
+Each run records a span around every stage (driver startup, library code,
+redemption, login sub-steps, activation). Finished runs are appended to a
+JSON lines file and folded into Prometheus histograms written as a
+textfile-collector .prom file, so latency can be tracked across runs.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from config import METRICS_DIR
+
+SPANS_FILE = os.path.join(METRICS_DIR, "spans.jsonl")
+HISTOGRAM_STATE_FILE = os.path.join(METRICS_DIR, "histograms.json")
+PROMETHEUS_FILE = os.path.join(METRICS_DIR, "nyt_automation.prom")
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300]
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+# Runs in progress on any thread, for the status server
+_active_runs = {}
+
+
+class RunMetrics:
+    """Spans recorded during one run of one account"""
+
+    def __init__(self, account):
+        self.account = account
+        self.started_at = datetime.now()
+        self.start = time.monotonic()
+        self.spans = []
+        self.active = []
+        self.resources = None
+        # Requests made with urllib, in the network capture's record format
+        self.http_requests = []
+
+    def durations(self):
+        """Return {span name: seconds}, summing spans that ran more than once"""
+        result = {}
+        for span_record in self.spans:
+            name = span_record["name"]
+            result[name] = round(result.get(name, 0) + span_record["duration"], 3)
+        return result
+
+    def current_stage(self):
+        """Name of the innermost span in progress, or None"""
+        return self.active[-1] if self.active else None
+
+
+def start_run(account):
+    """Start recording spans for a run on the current thread"""
+    run = RunMetrics(account)
+    _local.run = run
+    _active_runs[id(run)] = run
+    return run
+
+
+def current_run():
+    """The run being recorded on the current thread, or None"""
+    return getattr(_local, "run", None)
+
+
+def active_runs():
+    """Runs in progress on any thread"""
+    return list(_active_runs.values())
+
+
+@contextmanager
+def span(name):
+    """Record the duration of a stage in the current run (no-op outside a run)"""
+    run = current_run()
+    if run is None:
+        yield
+        return
+    start = time.monotonic()
+    status = "ok"
+    run.active.append(name)
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        run.active.pop()
+        run.spans.append({
+            "name": name,
+            "offset": round(start - run.start, 3),
+            "duration": round(time.monotonic() - start, 3),
+            "status": status
+        })
+
+
+def record_duration(name, seconds, started=None):
+    """
+    Add an already-measured duration as a span in the current run. started
+    is its monotonic start time (default: it ended just now), so work timed
+    on another thread keeps its real offset.
+    """
+    run = current_run()
+    if run is not None:
+        if started is None:
+            started = time.monotonic() - seconds
+        run.spans.append({
+            "name": name,
+            "offset": round(max(started - run.start, 0), 3),
+            "duration": round(seconds, 3),
+            "status": "ok"
+        })
+
+
+def _load_histograms():
+    try:
+        with open(HISTOGRAM_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {"stages": {}, "runs": {}, "last_run": {}}
+
+
+def _write_atomic(path, content):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_prometheus(state):
+    lines = [
+        "# HELP nyt_automation_stage_duration_seconds Duration of each automation stage",
+        "# TYPE nyt_automation_stage_duration_seconds histogram",
+    ]
+    for stage, histogram in sorted(state["stages"].items()):
+        for bound, count in zip(BUCKETS, histogram["buckets"]):
+            lines.append(f'nyt_automation_stage_duration_seconds_bucket{{stage="{_label(stage)}",le="{bound}"}} {count}')
+        lines.append(f'nyt_automation_stage_duration_seconds_bucket{{stage="{_label(stage)}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'nyt_automation_stage_duration_seconds_sum{{stage="{_label(stage)}"}} {histogram["sum"]:.3f}')
+        lines.append(f'nyt_automation_stage_duration_seconds_count{{stage="{_label(stage)}"}} {histogram["count"]}')
+
+    lines.append("# HELP nyt_automation_runs_total Finished runs by account and outcome")
+    lines.append("# TYPE nyt_automation_runs_total counter")
+    for key, count in sorted(state["runs"].items()):
+        account, outcome = key.split("\t")
+        lines.append(f'nyt_automation_runs_total{{account="{_label(account)}",outcome="{_label(outcome)}"}} {count}')
+
+    lines.append("# HELP nyt_automation_last_run_timestamp_seconds Unix time the account's last run finished")
+    lines.append("# TYPE nyt_automation_last_run_timestamp_seconds gauge")
+    for account, last in sorted(state["last_run"].items()):
+        lines.append(f'nyt_automation_last_run_timestamp_seconds{{account="{_label(account)}"}} {last["timestamp"]:.0f}')
+    lines.append("# HELP nyt_automation_last_run_success Whether the account's last run succeeded")
+    lines.append("# TYPE nyt_automation_last_run_success gauge")
+    for account, last in sorted(state["last_run"].items()):
+        lines.append(f'nyt_automation_last_run_success{{account="{_label(account)}"}} {1 if last["outcome"] == "success" else 0}')
+    lines.append("# HELP nyt_automation_last_run_browser_peak_rss_bytes Peak RSS of the browser process tree in the account's last run")
+    lines.append("# TYPE nyt_automation_last_run_browser_peak_rss_bytes gauge")
+    for account, peak in sorted(state.get("peak_rss", {}).items()):
+        lines.append(f'nyt_automation_last_run_browser_peak_rss_bytes{{account="{_label(account)}"}} {peak:.0f}')
+    return "\n".join(lines) + "\n"
+
+
+def finish_run(run, outcome, logger=None):
+    """Write the run's spans as JSON and fold them into the Prometheus histograms"""
+    if current_run() is run:
+        _local.run = None
+    _active_runs.pop(id(run), None)
+    total = round(time.monotonic() - run.start, 3)
+    record = {
+        "account": run.account,
+        "started_at": run.started_at.isoformat(timespec='seconds'),
+        "outcome": outcome,
+        "total": total,
+        "spans": run.spans
+    }
+    if run.resources:
+        record["resources"] = run.resources
+    try:
+        with _write_lock:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            with open(SPANS_FILE, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+
+            state = _load_histograms()
+            for stage, seconds in list(run.durations().items()) + [("total", total)]:
+                histogram = state["stages"].setdefault(stage, {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0})
+                for i, bound in enumerate(BUCKETS):
+                    if seconds <= bound:
+                        histogram["buckets"][i] += 1
+                histogram["sum"] += seconds
+                histogram["count"] += 1
+            run_key = f"{run.account}\t{outcome}"
+            state["runs"][run_key] = state["runs"].get(run_key, 0) + 1
+            state["last_run"][run.account] = {"timestamp": time.time(), "outcome": outcome}
+            if run.resources:
+                state.setdefault("peak_rss", {})[run.account] = run.resources["peak_rss_mb"] * 1048576
+
+            _write_atomic(HISTOGRAM_STATE_FILE, json.dumps(state))
+            _write_atomic(PROMETHEUS_FILE, _render_prometheus(state))
+    except Exception as e:
+        if logger:
+            logger.warning(f"Could not write run metrics: {e}")
+    return record
@@ -0,0 +1,37 @@
+"""
+Chrome performance-log access shared by the network features.
+Chrome hands out each performance-log entry only once, so every reader goes
+through drain_events, which keeps the drained DevTools Network events on the
+driver for the rest of the run.
+"""
+
+import json
+
+
+def enable_performance_logging(chrome_options):
+    """Ask chromedriver to record DevTools Network events in the performance log"""
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def drain_events(driver, stage=None):
+    """
+    Move new Network events from the performance log onto driver.network_events.
+    stage, if given, tags the newly drained events with the step they belong to.
+    """
+    events = getattr(driver, "network_events", None)
+    if events is None:
+        events = driver.network_events = []
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return events
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if message.get("method", "").startswith("Network."):
+            if stage:
+                message["stage"] = stage
+            events.append(message)
+    return events
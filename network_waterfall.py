@@ -0,0 +1,265 @@
+"""
+Per-run network waterfall.
+Turns the DevTools Network events from the performance log into per-request
+timings (DNS, connect, TLS, time to first byte, transfer), tagged with the
+stage that issued them, and writes a compact per-host summary for the run
+plus an optional HAR file. Requests made without the browser (the library
+and NY Times HTTP fast paths) are added from record_http_request, so a run
+that never starts Chrome still gets a capture. Request and response headers
+are left out of the HAR so session cookies never end up on disk.
+"""
+
+import os
+import json
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import metrics
+from network_log import drain_events
+from accounts import account_slug
+from config import NETWORK_DIR, NETWORK_HAR
+
+# Captures kept on disk (oldest are removed first)
+KEEP_RUNS = 60
+
+# Requests listed individually in the summary
+SLOWEST_REQUESTS = 10
+
+
+def _phase(timing, start_key, end_key):
+    """Duration in ms of a DevTools timing phase, or -1 if it did not happen"""
+    start, end = timing.get(start_key, -1), timing.get(end_key, -1)
+    return round(end - start, 1) if start >= 0 and end >= 0 else -1
+
+
+def build_requests(events):
+    """Return one record per request (redirect hops are separate records) in start order"""
+    requests = {}
+    order = []
+
+    def _start(params, stage):
+        request = params.get("request", {})
+        record = {
+            "url": request.get("url", ""),
+            "host": urlparse(request.get("url", "")).hostname or "",
+            "method": request.get("method", "GET"),
+            "type": params.get("type", "Other"),
+            "stage": stage or "other",
+            "started": params.get("wallTime"),
+            "start_ts": params.get("timestamp"),
+            "status": None,
+            "status_text": "",
+            "protocol": "",
+            "mime_type": "",
+            "bytes": 0,
+            "timing": None,
+            "end_ts": None,
+            "error": None,
+        }
+        requests[params["requestId"]] = record
+        order.append(record)
+
+    def _response(record, response, timestamp):
+        record["status"] = response.get("status")
+        record["status_text"] = response.get("statusText", "")
+        record["protocol"] = response.get("protocol", "")
+        record["mime_type"] = response.get("mimeType", "")
+        record["timing"] = response.get("timing")
+        record["headers_ts"] = timestamp
+
+    for event in events:
+        method = event.get("method")
+        params = event.get("params", {})
+        record = requests.get(params.get("requestId"))
+        if method == "Network.requestWillBeSent":
+            if record is not None and params.get("redirectResponse"):
+                _response(record, params["redirectResponse"], params.get("timestamp"))
+                record["end_ts"] = params.get("timestamp")
+            _start(params, event.get("stage"))
+        elif record is None:
+            continue
+        elif method == "Network.responseReceived":
+            _response(record, params.get("response", {}), params.get("timestamp"))
+        elif method == "Network.loadingFinished":
+            record["bytes"] = params.get("encodedDataLength", 0)
+            record["end_ts"] = params.get("timestamp")
+        elif method == "Network.loadingFailed":
+            record["error"] = params.get("blockedReason") or params.get("errorText") or "failed"
+            record["end_ts"] = params.get("timestamp")
+
+    for record in order:
+        timing = record.pop("timing") or {}
+        headers_ts = record.pop("headers_ts", None)
+        start_ts, end_ts = record.pop("start_ts"), record.pop("end_ts")
+        record["time_ms"] = round((end_ts - start_ts) * 1000, 1) if start_ts is not None and end_ts is not None else -1
+        record["dns_ms"] = _phase(timing, "dnsStart", "dnsEnd")
+        record["connect_ms"] = _phase(timing, "connectStart", "connectEnd")
+        record["ssl_ms"] = _phase(timing, "sslStart", "sslEnd")
+        record["send_ms"] = _phase(timing, "sendStart", "sendEnd")
+        record["ttfb_ms"] = _phase(timing, "sendEnd", "receiveHeadersEnd")
+        record["transfer_ms"] = (round((end_ts - headers_ts) * 1000, 1)
+                                 if headers_ts is not None and end_ts is not None else -1)
+    return order
+
+
+def record_http_request(method, url, started, headers_seconds, status=None, mime_type="", size=0,
+                        transfer_seconds=None, error=None):
+    """
+    Add a urllib request to the current run's capture (no-op outside a run).
+    started is its wall-clock start and headers_seconds the time until the
+    response headers arrived; urllib doesn't expose DNS, connect or TLS times.
+    """
+    run = metrics.current_run()
+    if run is None:
+        return
+    transfer_ms = round(transfer_seconds * 1000, 1) if transfer_seconds is not None else -1
+    run.http_requests.append({
+        "url": url,
+        "host": urlparse(url).hostname or "",
+        "method": method,
+        "type": "urllib",
+        "stage": run.current_stage() or "other",
+        "started": started,
+        "status": status,
+        "status_text": "",
+        "protocol": "",
+        "mime_type": mime_type or "",
+        "bytes": size,
+        "error": error,
+        "time_ms": round(headers_seconds * 1000 + max(transfer_ms, 0), 1),
+        "dns_ms": -1,
+        "connect_ms": -1,
+        "ssl_ms": -1,
+        "send_ms": -1,
+        "ttfb_ms": round(headers_seconds * 1000, 1),
+        "transfer_ms": transfer_ms,
+    })
+
+
+def timed_open(opener, request, timeout):
+    """opener.open(request) that also adds the request, or its failure, to the run's capture"""
+    started = time.time()
+    start = time.monotonic()
+    try:
+        response = opener.open(request, timeout=timeout)
+    except Exception as e:
+        status = getattr(e, "code", None)
+        if status is None:
+            record_http_request(request.get_method(), request.full_url, started, time.monotonic() - start,
+                                error=e.__class__.__name__)
+        else:
+            record_http_request(request.get_method(), request.full_url, started, time.monotonic() - start,
+                                status=status, mime_type=e.headers.get_content_type() if e.headers else "")
+        raise
+    record_http_request(request.get_method(), request.full_url, started, time.monotonic() - start,
+                        status=response.status, mime_type=response.headers.get_content_type(),
+                        size=int(response.headers.get("Content-Length") or 0))
+    return response
+
+
+def summarize(requests):
+    """Per-host and per-stage totals plus the slowest requests"""
+    hosts = {}
+    stages = {}
+    for record in requests:
+        host = hosts.setdefault(record["host"], {
+            "requests": 0, "failed": 0, "bytes": 0, "time_ms": 0.0, "max_ms": 0.0,
+            "dns_ms": 0.0, "connect_ms": 0.0, "ttfb_ms": 0.0, "transfer_ms": 0.0
+        })
+        host["requests"] += 1
+        host["failed"] += 1 if record["error"] else 0
+        host["bytes"] += record["bytes"]
+        for key in ("time_ms", "dns_ms", "connect_ms", "ttfb_ms", "transfer_ms"):
+            if record[key] > 0:
+                host[key] = round(host[key] + record[key], 1)
+        host["max_ms"] = max(host["max_ms"], record["time_ms"])
+
+        stage = stages.setdefault(record["stage"], {"requests": 0, "bytes": 0, "time_ms": 0.0})
+        stage["requests"] += 1
+        stage["bytes"] += record["bytes"]
+        stage["time_ms"] = round(stage["time_ms"] + max(record["time_ms"], 0), 1)
+
+    slowest = sorted(requests, key=lambda record: record["time_ms"], reverse=True)[:SLOWEST_REQUESTS]
+    return {
+        "requests": len(requests),
+        "bytes": sum(record["bytes"] for record in requests),
+        "hosts": dict(sorted(hosts.items(), key=lambda item: item[1]["time_ms"], reverse=True)),
+        "stages": stages,
+        "slowest": [
+            {key: record[key] for key in ("url", "stage", "status", "time_ms", "dns_ms", "connect_ms", "ttfb_ms",
+                                          "transfer_ms", "error")}
+            for record in slowest
+        ],
+    }
+
+
+def to_har(requests):
+    """HAR 1.2 log of the requests (no headers or cookies)"""
+    entries = []
+    for record in requests:
+        started = record["started"]
+        entries.append({
+            "startedDateTime": (datetime.fromtimestamp(started, timezone.utc).isoformat()
+                                if started else datetime.now(timezone.utc).isoformat()),
+            "time": max(record["time_ms"], 0),
+            "request": {
+                "method": record["method"], "url": record["url"], "httpVersion": record["protocol"],
+                "headers": [], "queryString": [], "cookies": [], "headersSize": -1, "bodySize": -1
+            },
+            "response": {
+                "status": record["status"] or 0, "statusText": record["status_text"],
+                "httpVersion": record["protocol"], "headers": [], "cookies": [],
+                "content": {"size": record["bytes"], "mimeType": record["mime_type"]},
+                "redirectURL": "", "headersSize": -1, "bodySize": record["bytes"]
+            },
+            "cache": {},
+            "timings": {
+                "blocked": -1, "dns": record["dns_ms"], "connect": record["connect_ms"], "ssl": record["ssl_ms"],
+                "send": max(record["send_ms"], 0), "wait": max(record["ttfb_ms"], 0),
+                "receive": max(record["transfer_ms"], 0)
+            },
+            "_stage": record["stage"],
+            "_error": record["error"],
+        })
+    return {"log": {"version": "1.2", "creator": {"name": "nyt-library-automation", "version": "1"},
+                    "pages": [], "entries": entries}}
+
+
+def _prune():
+    names = sorted(name for name in os.listdir(NETWORK_DIR) if name.endswith((".json", ".har")))
+    captures = sorted({name.rsplit(".", 1)[0] for name in names})
+    for stem in captures[:-KEEP_RUNS]:
+        for extension in (".json", ".har"):
+            path = os.path.join(NETWORK_DIR, stem + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_capture(driver, logger, account_name, started_at, http_requests=()):
+    """
+    Write this run's network summary (and HAR if enabled) from the browser's
+    events (driver may be None) and the run's urllib requests, and log the
+    slowest hosts
+    """
+    try:
+        requests = build_requests(drain_events(driver, "teardown")) if driver else []
+        requests = sorted(requests + list(http_requests), key=lambda record: record["started"] or 0)
+        summary = summarize(requests)
+        stem = f"{started_at.strftime('%Y%m%d-%H%M%S')}_{account_slug(account_name)}"
+        os.makedirs(NETWORK_DIR, exist_ok=True)
+        with open(os.path.join(NETWORK_DIR, f"{stem}.json"), 'w') as f:
+            json.dump(dict(summary, account=account_name, started_at=started_at.isoformat(timespec='seconds')),
+                      f, indent=2)
+        if NETWORK_HAR:
+            with open(os.path.join(NETWORK_DIR, f"{stem}.har"), 'w') as f:
+                json.dump(to_har(requests), f)
+        _prune()
+
+        top_hosts = ", ".join(f"{host or '?'} {stats['time_ms'] / 1000:.1f}s/{stats['requests']} req"
+                              for host, stats in list(summary["hosts"].items())[:3])
+        logger.info(f"Network capture: {summary['requests']} requests, {summary['bytes'] / 1024:.0f} KB; "
+                    f"slowest hosts: {top_hosts or 'none'}")
+        return summary
+    except Exception as e:
+        logger.warning(f"Could not write network capture: {e}")
+        return None
@@ -0,0 +1,198 @@
+"""
+Browserless NY Times redemption.
+Replays the redeem and activate-access form posts over plain HTTP with the
+saved session cookies and classifies each response with the same page-state
+classifier the browser uses. Any login page, challenge or page it doesn't
+recognise returns None so the caller falls back to Chrome. On success the
+session is saved again with the cookies the responses set.
+"""
+
+import urllib.error
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+import rate_limit
+from activation import ActivationState
+from dom_corpus import record_html
+from network_waterfall import timed_open
+from page_state import PageState, snapshot_from_html, classify
+from session_store import load_session, cookie_jar, save_session_from_jar
+from config import NYT_REDEEM_BASE_URL, LIBRARY_HTTP_TIMEOUT, USER_AGENT
+
+# Most form posts followed before giving up (redeem, then Continue on activate-access)
+MAX_FORM_STEPS = 3
+
+
+class _FormParser(HTMLParser):
+    """Collect forms with their fields and the text of their submit buttons"""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._current = None
+        self._button = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "form":
+            self._current = {
+                "action": attrs.get("action") or "",
+                "method": (attrs.get("method") or "get").lower(),
+                "fields": [],
+                "submit_text": []
+            }
+            self.forms.append(self._current)
+        elif self._current is None:
+            return
+        elif tag == "input":
+            input_type = (attrs.get("type") or "text").lower()
+            if input_type == "submit":
+                self._current["submit_text"].append(attrs.get("value") or "")
+            elif attrs.get("name") and input_type not in ("button", "image", "reset", "checkbox", "radio"):
+                self._current["fields"].append((attrs["name"], attrs.get("value") or ""))
+        elif tag == "button" and (attrs.get("type") or "submit").lower() == "submit":
+            self._button = []
+            if attrs.get("name"):
+                self._current["fields"].append((attrs["name"], attrs.get("value") or ""))
+
+    def handle_endtag(self, tag):
+        if tag == "button" and self._button is not None and self._current is not None:
+            self._current["submit_text"].append("".join(self._button).strip())
+            self._button = None
+        elif tag == "form":
+            self._current = None
+
+    def handle_data(self, data):
+        if self._button is not None:
+            self._button.append(data)
+
+
+def _find_form(html, *labels):
+    """Return the first form whose submit button text contains one of the labels"""
+    parser = _FormParser()
+    parser.feed(html)
+    for form in parser.forms:
+        text = " ".join(form["submit_text"]).lower()
+        if any(label in text for label in labels):
+            return form
+    return None
+
+
+class _Page:
+    """A fetched page: final URL, status, body and its page snapshot"""
+
+    def __init__(self, url, status, html):
+        self.url = url
+        self.status = status
+        self.html = html
+        self.snapshot = snapshot_from_html(url, html)
+
+    def is_challenge(self):
+        # Visible text only: ordinary pages load the DataDome and reCAPTCHA scripts too
+        return rate_limit.is_challenge(self.status, f"{self.snapshot.title} {self.snapshot.text}")
+
+
+def _fetch(opener, request, logger):
+    """
+    Open a request (following redirects) through the host's rate limiter and
+    return a _Page, including for HTTP errors
+    """
+    rate_limit.acquire(request.full_url, logger)
+    try:
+        with timed_open(opener, request, LIBRARY_HTTP_TIMEOUT) as response:
+            page = _Page(response.geturl(), response.status, response.read().decode("utf-8", errors="replace"))
+    except urllib.error.HTTPError as e:
+        page = _Page(e.geturl(), e.code, e.read().decode("utf-8", errors="replace"))
+    except OSError as e:
+        rate_limit.record_failure(request.full_url, logger, e.__class__.__name__)
+        raise
+    if page.is_challenge() or page.status >= 500:
+        rate_limit.record_failure(request.full_url, logger, f"HTTP {page.status}" + (
+            " challenge page" if page.is_challenge() else ""))
+    else:
+        rate_limit.record_success(request.full_url)
+    return page
+
+
+def _submit(opener, page, form, logger):
+    """Submit a parsed form from page"""
+    action_url = urllib.parse.urljoin(page.url, form["action"] or page.url)
+    body = urllib.parse.urlencode(form["fields"])
+    if form["method"] == "post":
+        request = urllib.request.Request(action_url, data=body.encode("utf-8"), headers={
+            "Content-Type": "application/x-www-form-urlencoded", "Referer": page.url})
+    else:
+        separator = "&" if urllib.parse.urlparse(action_url).query else "?"
+        request = urllib.request.Request(f"{action_url}{separator}{body}", headers={"Referer": page.url})
+    return _fetch(opener, request, logger)
+
+
+def redeem_nyt_code_http(logger, account, gift_code, redirect_url):
+    """
+    Redeem the code without a browser using the saved session.
+    Returns an ActivationState (CONFIRMED or ALREADY_REDEEMED), or None
+    when the browser is needed.
+    """
+    session = load_session(logger, account.name)
+    if session is None:
+        return None
+
+    try:
+        jar = cookie_jar(session)
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+        opener.addheaders = [("User-Agent", USER_AGENT)]
+
+        nyt_host = urllib.parse.urlparse(NYT_REDEEM_BASE_URL).hostname
+        if redirect_url and urllib.parse.urlparse(redirect_url).hostname == nyt_host:
+            redeem_url = redirect_url
+        else:
+            redeem_url = f"{NYT_REDEEM_BASE_URL}?gift_code={gift_code}"
+        logger.info(f"Redeeming over HTTP with the saved session: {redeem_url}")
+        page = _fetch(opener, urllib.request.Request(redeem_url), logger)
+        submitted = []
+
+        for _ in range(MAX_FORM_STEPS + 1):
+            if page.is_challenge():
+                logger.info(f"Bot challenge at {page.url} (HTTP {page.status}) - falling back to browser")
+                return None
+            if page.status >= 400:
+                logger.info(f"Unexpected HTTP {page.status} at {page.url} - falling back to browser")
+                return None
+            record_html(page.url, page.html, f"http_{submitted[-1] if submitted else 'redeem_page'}", logger)
+            state = classify(page.snapshot)
+            logger.info(f"HTTP page state: {state.name} (URL: {page.url}, HTTP {page.status})")
+
+            if state == PageState.REDEEMED:
+                logger.info("Code was already redeemed")
+                save_session_from_jar(jar, session, logger, account.name)
+                return ActivationState.ALREADY_REDEEMED
+            if state in (PageState.LOGIN_EMAIL, PageState.LOGIN_PASSWORD):
+                logger.info("Saved session was not accepted over HTTP - falling back to browser")
+                return None
+            # Only the response to the activate-access step proves the access was granted
+            if "activate" in submitted and (state == PageState.ACTIVATED or "activate" not in page.url.lower()):
+                logger.info(f"Activation confirmed over HTTP ({page.url})")
+                save_session_from_jar(jar, session, logger, account.name)
+                return ActivationState.CONFIRMED
+
+            if state == PageState.VALID_NEEDS_CONTINUE and "activate" not in submitted:
+                step, form = "activate", _find_form(page.html, "continue")
+            elif "redeem" not in submitted:
+                step, form = "redeem", _find_form(page.html, "redeem")
+            else:
+                form = None
+            if form is None:
+                logger.info(f"No recognised form on {page.url} ({state.name}) - falling back to browser")
+                return None
+
+            submitted.append(step)
+            page = _submit(opener, page, form, logger)
+
+        logger.info("Redemption did not finish within the expected steps - falling back to browser")
+        return None
+
+    except rate_limit.BackingOff:
+        raise
+    except Exception as e:
+        logger.warning(f"HTTP redemption failed: {e} - falling back to browser")
+        return None
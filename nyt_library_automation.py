@@ -9,30 +9,90 @@ import os
 import sys
 import time
 import logging
-import re
+import random
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.parse import urlparse, parse_qs
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
+from urllib.parse import urlparse
+from selenium.common.exceptions import TimeoutException
+from lazy_import import LazyModule, import_times
+from driver_cache import resolve_chromedriver_path
+from network_log import enable_performance_logging, drain_events
+from network_waterfall import write_capture
+from resource_blocking import apply_blocking, summarize_blocking
+from resource_watchdog import ResourceWatchdog, LOW_MEMORY_ARGUMENTS
+import metrics
+import locator_cache
+import rate_limit
+import run_ledger
+from library_http import fetch_library_code_http, parse_gift_code
+from code_extraction import extract_code
+from accounts import DEFAULT_ACCOUNT, AccountLogger, load_accounts
+from session_store import load_session, restore_session, save_session, clear_session
+from nyt_http import redeem_nyt_code_http
+from page_state import PageState, classify_page
+from dom_corpus import record_page
+from activation import ActivationState, wait_for_activation
+from checkpoints import (
+    resume_checkpoint,
+    STAGE_DRIVER_UP,
+    STAGE_CODE_OBTAINED,
+    STAGE_REDEEMED,
+    STAGE_ACTIVATED
+)
+from waits import (
+    wait_until,
+    any_of,
+    url_changed,
+    url_contains,
+    dom_settled,
+    element_enabled,
+    element_stale,
+    value_equals,
+    form_valid
+)
 from config import (
     LIBRARY_URL,
     LIBRARY_CARD_BARCODE,
     NYT_REDEEM_BASE_URL,
-    NYT_USERNAME,
-    NYT_PASSWORD,
     HEADLESS,
+    USER_AGENT,
+    DRIVER_BACKEND,
+    LIBRARY_HTTP_FAST_PATH,
+    NYT_HTTP_REDEEM,
+    BLOCK_RESOURCES,
+    NETWORK_CAPTURE,
+    LOW_MEMORY_MODE,
     FORCE_RUN,
+    SESSION_PERSISTENCE,
+    ACCOUNT_NAME,
+    WORKER_POOL_SIZE,
+    ACCOUNT_RETRIES,
+    RETRY_BACKOFF_SECONDS,
+    RETRY_BACKOFF_MAX_SECONDS,
     LOG_DIR,
     LOG_FILE
 )
 
 
+# Heavy Selenium modules are imported on first use to keep startup fast
+webdriver = LazyModule("selenium.webdriver")
+ui = LazyModule("selenium.webdriver.support.ui")
+EC = LazyModule("selenium.webdriver.support.expected_conditions")
+by = LazyModule("selenium.webdriver.common.by")
+chrome_service = LazyModule("selenium.webdriver.chrome.service")
+chrome_options_module = LazyModule("selenium.webdriver.chrome.options")
+cdp_driver = LazyModule("cdp_driver")
+
+# Page states that show the REDEEM click went through (an activate-access URL does too)
+POST_REDEEM_STATES = (
+    PageState.REDEEMED,
+    PageState.LOGIN_EMAIL,
+    PageState.LOGIN_PASSWORD,
+    PageState.VALID_NEEDS_CONTINUE,
+    PageState.ACTIVATED
+)
+
+
 def setup_logging():
     """Set up logging configuration"""
     os.makedirs(LOG_DIR, exist_ok=True)
@@ -47,80 +107,164 @@ def setup_logging():
     return logging.getLogger(__name__)
 
 
-def already_ran_today(logger):
+def already_ran_today(logger, account=ACCOUNT_NAME):
     """Check if the automation already ran successfully today"""
-    if not os.path.exists(LOG_FILE):
-        return False
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    
     try:
-        with open(LOG_FILE, 'r') as f:
-            # Read the last few lines of the log file
-            lines = f.readlines()
-            # Check the last 50 lines for a successful completion today
-            for line in reversed(lines[-50:]):
-                if today in line and "Automation completed successfully!" in line:
-                    logger.info(f"Automation already ran successfully today ({today}). Skipping.")
-                    return True
+        if run_ledger.succeeded_today(account):
+            today = datetime.now().strftime('%Y-%m-%d')
+            logger.info(f"Automation already ran successfully today ({today}) for {account}. Skipping.")
+            return True
     except Exception as e:
         logger.warning(f"Could not check if already ran today: {e}")
     
     return False
 
 
-def create_driver():
-    """Create and configure Chrome WebDriver"""
-    chrome_options = Options()
+_chromedriver_path = None
+
+
+def resolve_chromedriver():
+    """Return the chromedriver path, resolving it once per process"""
+    global _chromedriver_path
+    if _chromedriver_path is None:
+        # Try to use system ChromeDriver first (for Docker), then the on-disk cache,
+        # and only fall back to webdriver-manager when the browser version changed
+        _chromedriver_path, source = resolve_chromedriver_path()
+        logging.getLogger(__name__).info(f"Using chromedriver ({source}): {_chromedriver_path}")
+    return _chromedriver_path
+
+
+def preload_modules():
+    """Import the lazily loaded Selenium modules now (used by the daemon before a run)"""
+    for module in (webdriver, ui, EC, chrome_service, chrome_options_module):
+        module._load()
+    if DRIVER_BACKEND == "cdp":
+        cdp_driver.websocket._load()
+    # selenium.webdriver loads its browser classes on first access as well
+    getattr(webdriver, "Chrome")
+
+
+def chrome_arguments():
+    """Chrome command-line flags shared by both driver backends"""
+    arguments = [
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--disable-gpu",
+        "--disable-blink-features=AutomationControlled",
+        f"--user-agent={USER_AGENT}",
+    ]
     if HEADLESS:
-        chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+        arguments.insert(0, "--headless")
+    if LOW_MEMORY_MODE:
+        arguments.extend(LOW_MEMORY_ARGUMENTS)
+    return arguments
+
+
+def create_driver():
+    """Create and configure the Chrome driver for the configured DRIVER_BACKEND"""
+    if DRIVER_BACKEND == "cdp":
+        return create_cdp_driver()
+
+    step_start = time.perf_counter()
+    chrome_options = chrome_options_module.Options()
+    for argument in chrome_arguments():
+        chrome_options.add_argument(argument)
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
     chrome_options.add_experimental_option('useAutomationExtension', False)
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    # Try to use system ChromeDriver first (for Docker), fallback to webdriver-manager
-    import shutil
-    system_chromedriver = shutil.which("chromedriver")
-    if system_chromedriver:
-        service = Service(system_chromedriver)
-    else:
-        service = Service(ChromeDriverManager().install())
+    if BLOCK_RESOURCES or NETWORK_CAPTURE:
+        # Network capture and blocking statistics are read from the performance log
+        enable_performance_logging(chrome_options)
     
+    resolve_start = time.perf_counter()
+    service = chrome_service.Service(resolve_chromedriver())
+    launch_start = time.perf_counter()
     driver = webdriver.Chrome(service=service, options=chrome_options)
+    launch_end = time.perf_counter()
+    
+    if BLOCK_RESOURCES:
+        apply_blocking(driver, logging.getLogger(__name__))
+    
+    # Startup-time breakdown, reported by run_attempt
+    driver.startup_timings = {
+        "driver_options": round(resolve_start - step_start, 3),
+        "driver_resolve": round(launch_start - resolve_start, 3),
+        "browser_launch": round(launch_end - launch_start, 3),
+    }
+    return driver
+
+
+def create_cdp_driver():
+    """Launch Chrome and drive it directly over the DevTools protocol (no chromedriver)"""
+    step_start = time.perf_counter()
+    arguments = chrome_arguments()
+    launch_start = time.perf_counter()
+    driver = cdp_driver.CDPDriver.launch(arguments, capture_network=BLOCK_RESOURCES or NETWORK_CAPTURE)
+    launch_end = time.perf_counter()
+
+    if BLOCK_RESOURCES:
+        apply_blocking(driver, logging.getLogger(__name__))
+
+    driver.startup_timings = {
+        "driver_options": round(launch_start - step_start, 3),
+        "browser_launch": round(launch_end - launch_start, 3),
+    }
     return driver
 
 
-def get_library_code(driver, logger):
+def log_startup_breakdown(driver, logger):
+    """Record the import/resolve/launch breakdown of driver startup as spans and log it"""
+    startup = dict(getattr(driver, "startup_timings", {}))
+    startup["selenium_imports"] = round(sum(import_times.values()), 3)
+    for name, seconds in startup.items():
+        metrics.record_duration(f"create_driver.{name}", seconds)
+    logger.info("Startup breakdown: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in startup.items()))
+
+
+def tag_network_stage(driver, stage):
+    """With network capture on, attribute the requests made so far to a stage"""
+    if NETWORK_CAPTURE:
+        drain_events(driver, stage)
+
+
+def is_nyt_url(url):
+    """Return True if the URL is on the NY Times site (or the configured stand-in)"""
+    host = urlparse(url).hostname or ""
+    nyt_host = urlparse(NYT_REDEEM_BASE_URL).hostname
+    return host == nyt_host or host.endswith(".nytimes.com") or host == "nytimes.com"
+
+
+def get_library_code(driver, logger, barcode=LIBRARY_CARD_BARCODE):
     """Get the NY Times access code from the library website"""
     try:
         logger.info(f"Navigating to library URL: {LIBRARY_URL}")
-        driver.get(LIBRARY_URL)
+        rate_limit.navigate(driver, LIBRARY_URL, logger)
         
         # Wait for the barcode input field
         logger.info("Waiting for barcode input field...")
-        barcode_input = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.NAME, "cNum"))
+        barcode_input = ui.WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((by.By.NAME, "cNum"))
         )
         
         # Enter library card barcode
-        logger.info(f"Entering library card barcode: {LIBRARY_CARD_BARCODE}")
+        logger.info(f"Entering library card barcode: {barcode}")
         barcode_input.clear()
-        barcode_input.send_keys(LIBRARY_CARD_BARCODE)
+        barcode_input.send_keys(barcode)
         
         # Find and click the "Get Code" button
         logger.info("Looking for 'Get Code' button...")
-        get_code_button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and @value='Get Code']"))
+        get_code_button = ui.WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((by.By.XPATH, "//input[@type='submit' and @value='Get Code']"))
         )
+        url_before_submit = driver.current_url
         get_code_button.click()
         
         # Wait for redirect or code display
         logger.info("Waiting for redirect or code...")
-        time.sleep(3)  # Give time for redirect
+        wait_until(driver, any_of(url_changed(url_before_submit), element_stale(get_code_button)),
+                   "navigation", required=False)
+        wait_until(driver, dom_settled(), "page_settle", required=False)
+        
+        record_page(driver, "library_result", logger)
         
         # Check current URL for gift code
         current_url = driver.current_url
@@ -128,31 +272,23 @@ def get_library_code(driver, logger):
         
         # Extract gift code from URL if present
         if "gift_code" in current_url or "redeem" in current_url:
-            parsed_url = urlparse(current_url)
-            query_params = parse_qs(parsed_url.query)
-            
-            if "gift_code" in query_params:
-                gift_code = query_params["gift_code"][0]
+            gift_code = parse_gift_code(current_url)
+            if gift_code:
                 logger.info(f"Found gift code in URL: {gift_code}")
                 return gift_code, current_url
         
-        # If not in URL, try to find it on the page
+        # If not in URL, try to find it on the page (one script call for the whole page)
         try:
-            # Look for code in various possible locations
-            code_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'code') or contains(text(), 'Code')]")
-            for elem in code_elements:
-                text = elem.text
-                # Look for alphanumeric codes
-                code_match = re.search(r'[a-z0-9]{16,}', text, re.IGNORECASE)
-                if code_match:
-                    gift_code = code_match.group()
-                    logger.info(f"Found gift code on page: {gift_code}")
-                    return gift_code, current_url
+            extracted = extract_code(driver)
+            if extracted:
+                gift_code, pattern_name = extracted
+                logger.info(f"Found gift code on page: {gift_code} (matched {pattern_name})")
+                return gift_code, current_url
         except Exception as e:
             logger.warning(f"Could not extract code from page: {e}")
         
         # If we're redirected to NY Times, the URL should contain the code
-        if "nytimes.com" in current_url:
+        if is_nyt_url(current_url):
             logger.info("Redirected to NY Times - extracting code from URL")
             return None, current_url
         
@@ -160,339 +296,316 @@ def get_library_code(driver, logger):
         
     except TimeoutException as e:
         logger.error(f"Timeout waiting for page elements: {e}")
+        rate_limit.record_failure(LIBRARY_URL, logger, "timed out waiting for the form")
         raise
     except Exception as e:
         logger.error(f"Error getting library code: {e}")
         raise
 
 
-def login_nyt(driver, logger):
+def login_nyt(driver, logger, account=DEFAULT_ACCOUNT):
     """Log in to NY Times website (handles two-step login process)"""
-    if not NYT_USERNAME or not NYT_PASSWORD:
+    if not account.nyt_username or not account.nyt_password:
         logger.warning("NY Times credentials not provided - skipping login")
         return False
     
     try:
         logger.info("Looking for login form...")
         
-        # Wait a moment for page to fully load
-        time.sleep(2)
+        # Wait for the page to finish loading and stop changing
+        wait_until(driver, dom_settled(), "page_settle", required=False)
         
         # Check if code was already redeemed or if we're on a success page
-        page_source = driver.page_source.lower()
-        current_url = driver.current_url.lower()
-        page_title = driver.title.lower()
-        
-        logger.info(f"Checking page for 'already redeemed' status. URL: {current_url}, Title: {driver.title}")
+        logger.info("Checking page for 'already redeemed' status...")
+        record_page(driver, "login_start", logger)
+        state, snapshot = classify_page(driver, logger)
+        current_url = snapshot.url.lower()
         
-        # Check for "already redeemed" or "code already used" messages
-        redeemed_phrases = [
-            "code already redeemed", "already redeemed", "code has already been used",
-            "this code has already been redeemed", "this access code has already been used",
-            "code was already redeemed", "has already been redeemed"
-        ]
-        
-        if any(phrase in page_source for phrase in redeemed_phrases):
+        if state == PageState.REDEEMED:
             logger.info("Code appears to have been already redeemed - login not required")
             return True  # Return True since redemption succeeded (just already done)
         
-        if any(phrase in page_title for phrase in ["already redeemed", "code already"]):
-            logger.info("Page title indicates code was already redeemed - login not required")
-            return True
-        
         # Check if we're actually on an activation/success page (not a login page)
         if "activate" in current_url or "activate-access" in current_url:
             logger.info("Already on activation page - login may not be required")
             # Check if there's a "Continue" button or success message
-            if "your access code is valid" in page_source or "access code is valid" in page_source:
+            if state == PageState.VALID_NEEDS_CONTINUE:
                 logger.info("Access code is valid - attempting to click Continue if present")
                 try:
-                    continue_button = WebDriverWait(driver, 5).until(
-                        EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Continue')]"))
-                    )
+                    continue_button = locator_cache.find(driver, "nyt_activation_continue", 5, logger)
+                    url_before_click = driver.current_url
                     continue_button.click()
-                    time.sleep(3)
+                    wait_until(driver, any_of(url_changed(url_before_click), element_stale(continue_button)),
+                               "navigation", required=False)
                     logger.info("Clicked Continue button on activation page")
                 except:
                     logger.info("No Continue button found or already processed")
             return True
         
         # STEP 1: Enter email and click Continue
-        try:
-            # Look for email field (NY Times uses "Email address" label)
-            # Use a shorter timeout since we already checked for "already redeemed"
-            email_field = WebDriverWait(driver, 8).until(
-                EC.visibility_of_element_located((
-                    By.XPATH,
-                    "//input[@type='email'] | "
-                    "//input[contains(@placeholder, 'Email') or contains(@placeholder, 'email')] | "
-                    "//input[@name='email' or @id='email' or @name='username'] | "
-                    "//label[contains(text(), 'Email')]/following-sibling::input | "
-                    "//label[contains(text(), 'Email')]/../input"
-                ))
-            )
-            logger.info("Found email field - entering email address")
-            # Scroll into view
-            driver.execute_script("arguments[0].scrollIntoView(true);", email_field)
-            time.sleep(0.5)
-            # Click the field first to focus it
-            email_field.click()
-            time.sleep(0.3)
-            # Clear any existing value
-            email_field.clear()
-            time.sleep(0.2)
-            # Use send_keys to properly trigger form validation
-            email_field.send_keys(NYT_USERNAME)
-            time.sleep(1)
-            # Verify the email was entered
-            entered_value = email_field.get_attribute('value')
-            if entered_value != NYT_USERNAME:
-                logger.warning(f"Email value mismatch. Expected: {NYT_USERNAME}, Got: {entered_value}")
-                # Try setting it again
+        with metrics.span("login_nyt.email"):
+            try:
+                # Look for email field (NY Times uses "Email address" label)
+                # Use a shorter timeout since we already checked for "already redeemed"
+                email_field = locator_cache.find(driver, "nyt_email", 8, logger)
+                logger.info("Found email field - entering email address")
+                # Scroll into view
+                driver.execute_script("arguments[0].scrollIntoView(true);", email_field)
+                # Click the field first to focus it
+                email_field.click()
+                # Clear any existing value
                 email_field.clear()
-                time.sleep(0.3)
-                email_field.send_keys(NYT_USERNAME)
-                time.sleep(0.5)
-            else:
-                logger.info(f"Email entered successfully: {entered_value}")
-            # Also trigger input event to ensure validation
-            driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", email_field)
-            driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", email_field)
-            # Click outside to trigger blur validation
-            driver.execute_script("arguments[0].blur();", email_field)
-            time.sleep(1.5)  # Wait for form validation to complete
-        except (TimeoutException, Exception) as e:
-            # Check again if code was already redeemed (page might have loaded differently)
-            page_source_check = driver.page_source.lower()
-            if any(phrase in page_source_check for phrase in [
-                "code already redeemed", "already redeemed", "code has already been used",
-                "this code has already been redeemed", "your access code is valid",
-                "access code is valid", "this access code has already been used"
-            ]):
-                logger.info("Code was already redeemed - login not required")
-                return True
-            logger.warning(f"Email field not found: {e}")
-            logger.warning("This may indicate the code was already redeemed or the page structure changed")
-            return False
+                # Use send_keys to properly trigger form validation
+                email_field.send_keys(account.nyt_username)
+                # Verify the email was entered
+                if not wait_until(driver, value_equals(email_field, account.nyt_username), "field_value", required=False):
+                    entered_value = email_field.get_attribute('value')
+                    logger.warning(f"Email value mismatch. Expected: {account.nyt_username}, Got: {entered_value}")
+                    # Try setting it again
+                    email_field.clear()
+                    email_field.send_keys(account.nyt_username)
+                    wait_until(driver, value_equals(email_field, account.nyt_username), "field_value", required=False)
+                else:
+                    logger.info(f"Email entered successfully: {account.nyt_username}")
+                # Also trigger input event to ensure validation
+                driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", email_field)
+                driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", email_field)
+                # Click outside to trigger blur validation
+                driver.execute_script("arguments[0].blur();", email_field)
+                # Wait for form validation to complete
+                wait_until(driver, form_valid(email_field), "form_validation", required=False)
+            except (TimeoutException, Exception) as e:
+                # Check again if code was already redeemed (page might have loaded differently)
+                record_page(driver, "email_field_missing", logger)
+                state, _ = classify_page(driver, logger)
+                if state in (PageState.REDEEMED, PageState.VALID_NEEDS_CONTINUE):
+                    logger.info("Code was already redeemed - login not required")
+                    return True
+                logger.warning(f"Email field not found: {e}")
+                logger.warning("This may indicate the code was already redeemed or the page structure changed")
+                return False
         
         # Click Continue button - wait for it to be enabled
-        try:
-            # Wait for Continue button to be clickable and enabled
-            continue_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((
-                    By.XPATH,
-                    "//button[contains(text(), 'Continue') and not(@disabled)] | "
-                    "//button[@type='submit' and not(@disabled)] | "
-                    "//input[@type='submit' and contains(@value, 'Continue') and not(@disabled)]"
-                ))
-            )
-            logger.info("Continue button is enabled - clicking...")
-            # Double-check the button is not disabled
-            if continue_button.get_attribute("disabled") is None:
-                continue_button.click()
-                time.sleep(3)  # Wait for password page to load
-            else:
-                logger.warning("Continue button is disabled - waiting a bit more...")
-                time.sleep(2)
+        with metrics.span("login_nyt.continue"):
+            try:
+                # Wait for Continue button to be clickable and enabled
+                continue_button = locator_cache.find(driver, "nyt_email_continue", 10, logger)
+                rate_limit.acquire(driver.current_url, logger)
+                logger.info("Continue button is enabled - clicking...")
+                # Double-check the button is not disabled
+                if not element_enabled(continue_button)(driver):
+                    logger.warning("Continue button is disabled - waiting for it to be enabled...")
+                    wait_until(driver, element_enabled(continue_button), "button_enabled", required=False)
                 continue_button.click()
-                time.sleep(3)
-        except TimeoutException:
-            logger.error("Continue button not found")
-            return False
+                # The password step below waits for its field to become visible
+            except TimeoutException:
+                logger.error("Continue button not found")
+                return False
         
         # STEP 2: Enter password and submit
-        try:
-            password_field = WebDriverWait(driver, 10).until(
-                EC.visibility_of_element_located((
-                    By.XPATH,
-                    "//input[@type='password']"
-                ))
-            )
-            logger.info("Found password field - entering password")
-            # Scroll into view
-            driver.execute_script("arguments[0].scrollIntoView(true);", password_field)
-            time.sleep(0.5)
-            # Click the field first to focus it
-            password_field.click()
-            time.sleep(0.3)
-            # Clear any existing value
-            password_field.clear()
-            time.sleep(0.2)
-            # Use send_keys to properly enter password
-            password_field.send_keys(NYT_PASSWORD)
-            time.sleep(0.5)
-            # Trigger input event to ensure validation
-            driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", password_field)
-            driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", password_field)
-            time.sleep(0.5)
-        except (TimeoutException, Exception) as e:
-            logger.error(f"Password field not found: {e}")
-            return False
+        with metrics.span("login_nyt.password"):
+            try:
+                password_field = locator_cache.find(driver, "nyt_password", 10, logger)
+                logger.info("Found password field - entering password")
+                # Scroll into view
+                driver.execute_script("arguments[0].scrollIntoView(true);", password_field)
+                # Click the field first to focus it
+                password_field.click()
+                # Clear any existing value
+                password_field.clear()
+                # Use send_keys to properly enter password
+                password_field.send_keys(account.nyt_password)
+                wait_until(driver, value_equals(password_field, account.nyt_password), "field_value", required=False)
+                # Trigger input event to ensure validation
+                driver.execute_script("arguments[0].dispatchEvent(new Event('input', { bubbles: true }));", password_field)
+                driver.execute_script("arguments[0].dispatchEvent(new Event('change', { bubbles: true }));", password_field)
+                wait_until(driver, form_valid(password_field), "form_validation", required=False)
+            except (TimeoutException, Exception) as e:
+                logger.error(f"Password field not found: {e}")
+                return False
         
         # Click final login/submit button
-        try:
-            login_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((
-                    By.XPATH,
-                    "//button[contains(text(), 'Log in') or contains(text(), 'Sign in') or contains(text(), 'Login')] | "
-                    "//button[@type='submit'] | "
-                    "//input[@type='submit']"
-                ))
-            )
-            logger.info("Clicking login/submit button...")
-            login_button.click()
+        with metrics.span("login_nyt.submit"):
+            try:
+                login_button = locator_cache.find(driver, "nyt_login_submit", 10, logger)
+                url_before_login = driver.current_url
+                rate_limit.acquire(url_before_login, logger)
+                logger.info("Clicking login/submit button...")
+                login_button.click()
             
-            # Wait for login to complete and redirect
-            time.sleep(5)
+                # Wait for login to complete and redirect to activation/confirmation page
+                try:
+                    wait_until(
+                        driver,
+                        lambda d: d.current_url != url_before_login and (
+                            "activate" in d.current_url.lower() or 
+                            "account" in d.current_url.lower() or 
+                            "welcome" in d.current_url.lower() or
+                            "login" not in d.current_url.lower()
+                        ),
+                        "post_login_redirect"
+                    )
+                    rate_limit.record_success(url_before_login)
+                    logger.info("Redirected after login - waiting for activation to complete...")
+                    # Give the landing page time to process, but only until it settles
+                    wait_until(driver, dom_settled(), "page_settle", required=False)
+                except TimeoutException:
+                    logger.warning("No redirect detected after login")
+                    rate_limit.record_failure(url_before_login, logger, "no redirect after login")
             
-            # Wait for redirect to activation/confirmation page
-            try:
-                WebDriverWait(driver, 15).until(
-                    lambda d: "activate" in d.current_url.lower() or 
-                             "account" in d.current_url.lower() or 
-                             "welcome" in d.current_url.lower() or
-                             "login" not in d.current_url.lower()
-                )
-                logger.info("Redirected after login - waiting for activation to complete...")
-                time.sleep(5)  # Give time for activation to process
+                # Check if login was successful
+                record_page(driver, "after_login", logger)
+                current_url = driver.current_url
+                logger.info(f"Final URL after login: {current_url}")
+                if "account" in current_url or "welcome" in current_url or "login" not in current_url.lower() or "activate" in current_url:
+                    logger.info("Login appears successful")
+                    return True
+                else:
+                    logger.warning("Login may have failed - still on login page")
+                    return False
+                
             except TimeoutException:
-                logger.warning("No redirect detected after login")
-            
-            # Check if login was successful
-            current_url = driver.current_url
-            logger.info(f"Final URL after login: {current_url}")
-            if "account" in current_url or "welcome" in current_url or "login" not in current_url.lower() or "activate" in current_url:
-                logger.info("Login appears successful")
-                return True
-            else:
-                logger.warning("Login may have failed - still on login page")
+                logger.error("Login button not found")
                 return False
-                
-        except TimeoutException:
-            logger.error("Login button not found")
-            return False
             
+    except rate_limit.BackingOff:
+        raise
     except Exception as e:
         logger.error(f"Error during login: {e}")
         return False
 
 
-def redeem_nyt_code(driver, gift_code, redirect_url, logger):
-    """Redeem the code on NY Times website"""
+def complete_activation(driver, logger):
+    """Wait for the activation page after login and confirm the access code. Returns True if the page was reached"""
+    # After successful login, wait for redirect to activation page
+    logger.info("Waiting for redirect to activation page after login...")
+    try:
+        # Wait for redirect to activation page (the redirect_uri from login contains access_code)
+        wait_until(driver, url_contains("activate", "activate-access"), "activation_redirect")
+        logger.info("Reached activation page - waiting for activation to process...")
+        wait_until(driver, dom_settled(), "activation_settle", required=False)
+        
+        # Check for success indicators
+        record_page(driver, "activation_page", logger)
+        state, snapshot = classify_page(driver, logger)
+        current_url = snapshot.url
+        
+        # Look for success messages or check if we're redirected to account/home
+        if state == PageState.REDEEMED:
+            logger.warning("Code was already redeemed")
+        elif state == PageState.VALID_NEEDS_CONTINUE:
+            logger.info("Access code validated - looking for Continue button to complete setup...")
+            try:
+                # Look for Continue button on the activation confirmation page
+                continue_button = locator_cache.find(driver, "nyt_activation_continue", 10, logger)
+                logger.info("Found Continue button - clicking to complete activation...")
+                url_before_click = driver.current_url
+                continue_button.click()
+                # Wait for redirect after clicking Continue
+                wait_until(driver, any_of(url_changed(url_before_click), element_stale(continue_button)),
+                           "navigation", required=False)
+                logger.info("Continue button clicked - activation should be complete")
+            except TimeoutException:
+                logger.warning("Continue button not found - activation may already be complete")
+        elif state == PageState.ACTIVATED:
+            logger.info("Activation appears successful based on page content")
+        elif "account" in current_url or "home" in current_url:
+            logger.info("Redirected to account/home page - activation likely successful")
+        return True
+            
+    except TimeoutException:
+        logger.warning("Timeout waiting for activation page - checking current state...")
+        logger.info(f"Final URL: {driver.current_url}")
+        return False
+
+
+def redeem_nyt_code(driver, gift_code, redirect_url, logger, account=DEFAULT_ACCOUNT, session_restored=False,
+                    checkpoint=None):
+    """
+    Redeem the code on NY Times website. Returns (success, whether the
+    activate-access page was reached on the way)
+    """
+    activation_page_seen = False
     try:
         # If we have a redirect URL, use it; otherwise construct the URL
-        if redirect_url and "nytimes.com" in redirect_url:
+        if redirect_url and is_nyt_url(redirect_url):
             nyt_url = redirect_url
         elif gift_code:
             nyt_url = f"{NYT_REDEEM_BASE_URL}?gift_code={gift_code}"
         else:
             raise Exception("No gift code or redirect URL available")
         
-        logger.info(f"Navigating to NY Times redemption page: {nyt_url}")
-        driver.get(nyt_url)
+        # An earlier attempt already clicked REDEEM - go back to where that led
+        # rather than spending the code a second time
+        resume_url = checkpoint.get(STAGE_REDEEMED, "url") if checkpoint else None
+        if resume_url:
+            logger.info("Code was redeemed by an earlier attempt - resuming at the page it led to")
+            rate_limit.navigate(driver, resume_url, logger)
+        else:
+            logger.info(f"Navigating to NY Times redemption page: {nyt_url}")
+            rate_limit.navigate(driver, nyt_url, logger)
         
-        # Wait for the redeem button
-        logger.info("Waiting for REDEEM button...")
         try:
-            # Try multiple possible selectors for the redeem button
-            redeem_button = WebDriverWait(driver, 15).until(
-                EC.element_to_be_clickable((
-                    By.XPATH, 
-                    "//button[contains(text(), 'REDEEM') or contains(text(), 'Redeem')] | "
-                    "//input[@type='submit' and contains(@value, 'REDEEM')] | "
-                    "//button[@type='submit' and contains(., 'REDEEM')]"
-                ))
-            )
-            
-            logger.info("Clicking REDEEM button...")
-            redeem_button.click()
-            
-            # Wait a moment for the page to process
-            time.sleep(3)
-            
-            # Check if login is required
-            current_url = driver.current_url
-            logger.info(f"Current URL after redemption: {current_url}")
+            if resume_url:
+                wait_until(driver, dom_settled(), "page_settle", required=False)
+            else:
+                # Try the locator that matched last time first, then every known alternative
+                logger.info("Waiting for REDEEM button...")
+                redeem_button = locator_cache.find(driver, "nyt_redeem", 15, logger)
+                
+                logger.info("Clicking REDEEM button...")
+                url_before_redeem = driver.current_url
+                redeem_button.click()
+                
+                # Wait for the page to react to the click, then settle
+                wait_until(driver, any_of(url_changed(url_before_redeem), element_stale(redeem_button)),
+                           "navigation", required=False)
+                wait_until(driver, dom_settled(), "page_settle", required=False)
             
             # Check for "already redeemed" message BEFORE attempting login
-            page_source_check = driver.page_source.lower()
-            page_title = driver.title.lower()
-            
-            # Log page title for debugging
-            logger.info(f"Page title after redemption: {driver.title}")
+            logger.info("Checking page state after redemption...")
+            record_page(driver, "after_redeem", logger)
+            state, snapshot = classify_page(driver, logger)
+            current_url = snapshot.url
+            # Only a page the click demonstrably led to is worth resuming at; an
+            # unrecognised page may mean the click did nothing, so a retry clicks again
+            if checkpoint and not resume_url and (state in POST_REDEEM_STATES or "activate" in current_url.lower()):
+                checkpoint.mark(STAGE_REDEEMED, logger, state=state.value, url=current_url)
             
-            # Check multiple indicators of "already redeemed"
-            if any(phrase in page_source_check for phrase in [
-                "code already redeemed", "already redeemed", "code has already been used",
-                "this code has already been redeemed", "this access code has already been used",
-                "code was already redeemed"
-            ]) or any(phrase in page_title for phrase in [
-                "already redeemed", "code already"
-            ]):
+            if state == PageState.REDEEMED:
                 logger.info("Code was already redeemed - no login required")
-                return True
+                if session_restored:
+                    save_session(driver, logger, account.name, after_login=False)
+                return True, activation_page_seen
             
             # If we're redirected to a login page, handle login
-            if "login" in current_url.lower() or "signin" in current_url.lower() or NYT_USERNAME:
+            on_login_page = (
+                state in (PageState.LOGIN_EMAIL, PageState.LOGIN_PASSWORD)
+                or "login" in current_url.lower() or "signin" in current_url.lower()
+            )
+            if session_restored and not on_login_page:
+                logger.info("Restored session is still signed in - skipping login")
+                with metrics.span("complete_activation"):
+                    activation_page_seen = complete_activation(driver, logger)
+                # Write back cookies the site rotated (the login time is kept)
+                save_session(driver, logger, account.name, after_login=False)
+            elif on_login_page or account.nyt_username:
+                if session_restored:
+                    logger.info("Restored session was not accepted - falling back to full login")
+                    clear_session(logger, account.name)
                 logger.info("Login page detected or credentials provided - attempting to log in...")
-                login_success = login_nyt(driver, logger)
+                with metrics.span("login_nyt"):
+                    login_success = login_nyt(driver, logger, account)
                 if not login_success:
                     logger.warning("Login failed or not required - redemption may have succeeded without login")
                 else:
-                    # After successful login, wait for redirect to activation page
-                    logger.info("Waiting for redirect to activation page after login...")
-                    try:
-                        # Wait for redirect to activation page (the redirect_uri from login contains access_code)
-                        WebDriverWait(driver, 30).until(
-                            lambda d: "activate" in d.current_url.lower() or 
-                                     "activate-access" in d.current_url.lower()
-                        )
-                        logger.info("Reached activation page - waiting for activation to process...")
-                        time.sleep(5)  # Give time for activation to process
-                        
-                        # Check for success indicators
-                        page_source = driver.page_source.lower()
-                        current_url = driver.current_url
-                        logger.info(f"Activation page URL: {current_url}")
-                        
-                        # Look for success messages or check if we're redirected to account/home
-                        if "code already redeemed" in page_source:
-                            logger.warning("Code was already redeemed")
-                        elif "your access code is valid" in page_source or "access code is valid" in page_source:
-                            logger.info("Access code validated - looking for Continue button to complete setup...")
-                            try:
-                                # Look for Continue button on the activation confirmation page
-                                continue_button = WebDriverWait(driver, 10).until(
-                                    EC.element_to_be_clickable((
-                                        By.XPATH,
-                                        "//button[contains(text(), 'Continue')] | "
-                                        "//button[@type='submit' and contains(text(), 'Continue')] | "
-                                        "//a[contains(text(), 'Continue')]"
-                                    ))
-                                )
-                                logger.info("Found Continue button - clicking to complete activation...")
-                                continue_button.click()
-                                time.sleep(3)  # Wait for redirect after clicking Continue
-                                logger.info("Continue button clicked - activation should be complete")
-                            except TimeoutException:
-                                logger.warning("Continue button not found - activation may already be complete")
-                        elif "success" in page_source or "activated" in page_source or "welcome" in page_source:
-                            logger.info("Activation appears successful based on page content")
-                        elif "account" in current_url or "home" in current_url:
-                            logger.info("Redirected to account/home page - activation likely successful")
-                        else:
-                            logger.info("Waiting additional time for activation to complete...")
-                            time.sleep(5)  # Extra wait for activation
-                            
-                    except TimeoutException:
-                        logger.warning("Timeout waiting for activation page - checking current state...")
-                        final_url = driver.current_url
-                        logger.info(f"Final URL: {final_url}")
-                        # Even if timeout, wait a bit more in case activation is still processing
-                        time.sleep(5)
+                    with metrics.span("complete_activation"):
+                        activation_page_seen = complete_activation(driver, logger)
+                    if SESSION_PERSISTENCE:
+                        save_session(driver, logger, account.name)
             
             logger.info("Code redemption initiated successfully")
-            return True
+            return True, activation_page_seen
             
         except TimeoutException:
             logger.warning("REDEEM button not found - code may already be redeemed or page structure changed")
@@ -501,71 +614,263 @@ def redeem_nyt_code(driver, gift_code, redirect_url, logger):
             logger.info(f"Current URL: {current_url}")
             if "account" in current_url or "welcome" in current_url:
                 logger.info("Appears to be redirected to account page - redemption may have succeeded")
-                return True
-            return False
+                return True, activation_page_seen
+            return False, activation_page_seen
             
     except Exception as e:
         logger.error(f"Error redeeming NY Times code: {e}")
         raise
 
 
-def main():
-    """Main automation function"""
-    logger = setup_logging()
-    
-    # Check if already ran today (unless FORCE_RUN is set)
-    if not FORCE_RUN and already_ran_today(logger):
-        logger.info("Exiting - automation already completed today.")
-        logger.info("To force a re-run, set FORCE_RUN=true environment variable.")
-        return
-    elif FORCE_RUN:
-        logger.info("FORCE_RUN enabled - bypassing duplicate run check.")
-    
+def record_code(gift_code, redirect_url, checkpoint, logger):
+    """Log the code (or redirect) obtained from the library and checkpoint it"""
+    if gift_code:
+        logger.info(f"Successfully obtained gift code: {gift_code}")
+    else:
+        logger.info("Using redirect URL for redemption")
+    if (gift_code or redirect_url) and not checkpoint.reached(STAGE_CODE_OBTAINED):
+        checkpoint.mark(STAGE_CODE_OBTAINED, logger, gift_code=gift_code, redirect_url=redirect_url)
+        # Every fetched code feeds the rollover scheduler's estimate of when new codes appear
+        try:
+            run_ledger.record_code_probe(checkpoint.account_name, gift_code or redirect_url, "run")
+        except Exception as e:
+            logger.warning(f"Could not record code probe: {e}")
+
+
+def start_driver(driver_factory):
+    """Create the driver on a background thread. The future yields (driver, monotonic start, seconds)"""
+    def _create():
+        started = time.monotonic()
+        driver = driver_factory()
+        return driver, started, time.monotonic() - started
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="driver-startup")
+    future = executor.submit(_create)
+    executor.shutdown(wait=False)
+    return future
+
+
+def run_attempt(account, logger, driver_factory=create_driver, checkpoint=None):
+    """
+    Run the library and NY Times steps once for an account, resuming from
+    the checkpoint's last good stage. Returns (outcome, gift_code, timings)
+    """
     driver = None
+    watchdog = None
+    run = metrics.start_run(account.name)
+    checkpoint = checkpoint or resume_checkpoint(logger, account.name, FORCE_RUN)
+    gift_code = None
+    outcome = run_ledger.OUTCOME_FAILED
+    
+    driver_future = None
     
     try:
-        logger.info("=" * 50)
-        logger.info("Starting NY Times Library Automation")
-        logger.info("=" * 50)
+        if checkpoint.last_stage():
+            logger.info(f"Resuming from checkpoint (last completed stage: {checkpoint.last_stage()})")
         
-        # Create browser driver
-        logger.info("Initializing browser...")
-        driver = create_driver()
+        # With a saved session the code can usually be redeemed over plain HTTP,
+        # so the browser is only started once it turns out to be needed
+        http_redeem = NYT_HTTP_REDEEM and SESSION_PERSISTENCE and load_session(logger, account.name) is not None
+        if not http_redeem:
+            # Start the browser in the background; it doesn't depend on the library code
+            logger.info("Initializing browser...")
+            driver_future = start_driver(driver_factory)
         
-        # Get code from library
-        gift_code, redirect_url = get_library_code(driver, logger)
+        # Reuse today's gift code if an earlier attempt already got one,
+        # otherwise try to get it from the library without a browser first
+        library_result = None
+        library_seconds = 0
+        if checkpoint.reached(STAGE_CODE_OBTAINED):
+            library_result = (checkpoint.get(STAGE_CODE_OBTAINED, "gift_code"),
+                              checkpoint.get(STAGE_CODE_OBTAINED, "redirect_url"))
+            logger.info("Reusing today's gift code from checkpoint - skipping the library portal")
+        elif LIBRARY_HTTP_FAST_PATH:
+            library_start = time.monotonic()
+            with metrics.span("library_http"):
+                library_result = fetch_library_code_http(logger, account.barcode)
+            library_seconds = time.monotonic() - library_start
+        if library_result:
+            gift_code, redirect_url = library_result
+            record_code(gift_code, redirect_url, checkpoint, logger)
         
-        if gift_code:
-            logger.info(f"Successfully obtained gift code: {gift_code}")
-        else:
-            logger.info("Using redirect URL for redemption")
+        activation_state = None
+        if http_redeem and library_result:
+            with metrics.span("redeem_http"):
+                activation_state = redeem_nyt_code_http(logger, account, gift_code, redirect_url)
+            if activation_state is None:
+                logger.info("Initializing browser...")
+                driver_future = start_driver(driver_factory)
+        elif driver_future is None:
+            logger.info("Initializing browser...")
+            driver_future = start_driver(driver_factory)
         
-        # Redeem code on NY Times
-        success = redeem_nyt_code(driver, gift_code, redirect_url, logger)
+        if activation_state is None:
+            # Wait for the browser, recording its startup as a span that ran alongside the fetch
+            driver, driver_started, driver_seconds = driver_future.result()
+            driver_future = None
+            metrics.record_duration("create_driver", driver_seconds, started=driver_started)
+            if library_seconds and driver_started < library_start + library_seconds:
+                # Time saved compared with running the two one after the other
+                elapsed = time.monotonic() - min(driver_started, library_start)
+                overlap = max(0.0, library_seconds + driver_seconds - elapsed)
+                metrics.record_duration("startup_overlap", overlap)
+                logger.info(f"Browser startup ({driver_seconds:.2f}s) overlapped the library fetch "
+                            f"({library_seconds:.2f}s), saving {overlap:.2f}s")
+            watchdog = ResourceWatchdog(driver, logger).start()
+            log_startup_breakdown(driver, logger)
+            checkpoint.mark(STAGE_DRIVER_UP, logger)
+            
+            # Fall back to getting the code from the library in the browser
+            if not library_result:
+                with metrics.span("get_library_code"):
+                    gift_code, redirect_url = get_library_code(driver, logger, account.barcode)
+                tag_network_stage(driver, "get_library_code")
+                record_code(gift_code, redirect_url, checkpoint, logger)
+            
+            # Restore yesterday's signed-in session so login can be skipped
+            with metrics.span("restore_session"):
+                session_restored = SESSION_PERSISTENCE and restore_session(driver, logger, account.name)
+            tag_network_stage(driver, "restore_session")
+            
+            # Redeem code on NY Times
+            with metrics.span("redeem_nyt_code"):
+                success, activation_page_seen = redeem_nyt_code(driver, gift_code, redirect_url, logger, account, session_restored, checkpoint)
+            tag_network_stage(driver, "redeem_nyt_code")
+            
+            # Wait for activation to be confirmed rather than sleeping a fixed time
+            if success:
+                with metrics.span("activation_wait"):
+                    activation_state, _ = wait_for_activation(driver, logger, activation_page_seen)
+                tag_network_stage(driver, "activation_wait")
         
+        success = activation_state not in (None, ActivationState.TIMED_OUT)
         if success:
+            checkpoint.mark(STAGE_ACTIVATED, logger, state=activation_state.value)
+            outcome = run_ledger.OUTCOME_SUCCESS
             logger.info("=" * 50)
-            logger.info("Automation completed successfully!")
+            logger.info("Automation completed successfully!" + ("" if driver else " (no browser needed)"))
             logger.info("=" * 50)
         else:
+            outcome = run_ledger.OUTCOME_WARNING
             logger.warning("Automation completed with warnings - please check manually")
         
-        # Keep browser open longer to ensure activation completes (if not headless)
-        if not HEADLESS:
-            logger.info("Keeping browser open for 30 seconds to ensure activation completes...")
-            time.sleep(30)
-        else:
-            # Even in headless mode, wait a bit to ensure activation completes
-            logger.info("Waiting additional 10 seconds to ensure activation completes...")
-            time.sleep(10)
-        
+    except rate_limit.BackingOff as e:
+        logger.error(f"Automation failed fast: {e}")
     except Exception as e:
-        logger.error(f"Automation failed: {e}", exc_info=True)
-        sys.exit(1)
+        if not (watchdog and watchdog.exceeded):
+            logger.error(f"Automation failed: {e}", exc_info=True)
     finally:
-        if driver:
+        if driver_future is not None:
+            # Failed before the background browser was collected - close it once it is up
+            try:
+                driver = driver_future.result()[0]
+            except Exception:
+                pass
+        if watchdog:
+            run.resources = watchdog.stop()
+            if watchdog.samples:
+                logger.info(f"Browser peak memory {run.resources['peak_rss_mb']:.0f} MB, "
+                            f"peak CPU {run.resources['peak_cpu_percent']:.0f}%")
+            if watchdog.exceeded:
+                outcome = run_ledger.OUTCOME_FAILED
+                logger.error("Automation aborted: browser memory budget exceeded (see MEMORY_BUDGET_MB / LOW_MEMORY_MODE)")
+        browser_usable = driver is not None and not (watchdog and watchdog.exceeded)
+        if NETWORK_CAPTURE and (browser_usable or run.http_requests):
+            write_capture(driver if browser_usable else None, logger, account.name, run.started_at, run.http_requests)
+        if browser_usable:
+            if BLOCK_RESOURCES:
+                try:
+                    summarize_blocking(driver, logger)
+                except Exception as e:
+                    logger.warning(f"Could not summarize resource blocking: {e}")
             driver.quit()
             logger.info("Browser closed")
+        record = metrics.finish_run(run, outcome, logger)
+    
+    timings = run.durations()
+    timings["total"] = record["total"]
+    return outcome, gift_code, timings
+
+
+def retry_delay(attempt):
+    """Exponential backoff with jitter before the given attempt (2 = first retry)"""
+    delay = min(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 2), RETRY_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.75, 1.0)
+
+
+def run_account(account, logger, driver_factory=create_driver):
+    """Run one account with retries, recording each attempt in the run ledger. Returns the final outcome"""
+    logger = AccountLogger(logger, {"account": account.name})
+    
+    # Check if already ran today (unless FORCE_RUN is set)
+    if not FORCE_RUN and already_ran_today(logger, account.name):
+        logger.info("Exiting - automation already completed today.")
+        logger.info("To force a re-run, set FORCE_RUN=true environment variable.")
+        return run_ledger.OUTCOME_SUCCESS
+    
+    outcome = run_ledger.OUTCOME_FAILED
+    checkpoint = resume_checkpoint(logger, account.name, FORCE_RUN)
+    for attempt in range(1, ACCOUNT_RETRIES + 2):
+        if attempt > 1:
+            circuits = rate_limit.open_circuits()
+            if circuits:
+                host, until = max(circuits.items(), key=lambda item: item[1])
+                logger.error(f"Not retrying: backing off {host} until "
+                             f"{datetime.fromtimestamp(until).strftime('%H:%M:%S')}")
+                break
+            delay = retry_delay(attempt)
+            logger.info(f"Retrying in {delay:.0f}s (attempt {attempt} of {ACCOUNT_RETRIES + 1})...")
+            time.sleep(delay)
+        started_at = datetime.now()
+        outcome, gift_code, timings = run_attempt(account, logger, driver_factory, checkpoint)
+        try:
+            run_ledger.record_run(account.name, outcome, started_at, gift_code, timings)
+        except Exception as e:
+            logger.warning(f"Could not record run in ledger: {e}")
+        if outcome != run_ledger.OUTCOME_FAILED:
+            break
+    
+    return outcome
+
+
+def run_all(logger, driver_factory=create_driver):
+    """Run every account in the roster. Returns {account name: outcome}"""
+    if FORCE_RUN:
+        logger.info("FORCE_RUN enabled - bypassing duplicate run check.")
+    
+    logger.info("=" * 50)
+    logger.info("Starting NY Times Library Automation")
+    logger.info("=" * 50)
+    
+    accounts = load_accounts()
+    pool_size = max(1, min(WORKER_POOL_SIZE, len(accounts)))
+    if len(accounts) > 1:
+        logger.info(f"Processing {len(accounts)} accounts with {pool_size} browser worker(s)")
+    
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        outcomes = dict(zip(
+            [account.name for account in accounts],
+            pool.map(lambda account: run_account(account, logger, driver_factory), accounts)
+        ))
+    
+    if len(accounts) > 1:
+        for name, outcome in outcomes.items():
+            logger.info(f"{name}: {outcome}")
+    
+    return outcomes
+
+
+def main():
+    """Main automation function"""
+    logger = setup_logging()
+    
+    try:
+        outcomes = run_all(logger)
+    except Exception as e:
+        logger.error(f"Automation failed: {e}", exc_info=True)
+        sys.exit(1)
+    
+    if run_ledger.OUTCOME_FAILED in outcomes.values():
+        sys.exit(1)
 
 
 if __name__ == "__main__":
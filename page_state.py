@@ -0,0 +1,199 @@
+"""
+Page-state classifier for the NY Times redeem/login/activate pages.
+Takes one compact snapshot of the page (URL, title, visible text and which
+login fields are showing) in a single script call and matches every known
+phrase in one pass, so all call sites agree on what page we're on.
+"""
+
+import re
+from collections import namedtuple
+from enum import Enum
+from html.parser import HTMLParser
+
+
+class PageState(Enum):
+    REDEEMED = "redeemed"
+    VALID_NEEDS_CONTINUE = "valid_needs_continue"
+    LOGIN_EMAIL = "login_email"
+    LOGIN_PASSWORD = "login_password"
+    ACTIVATED = "activated"
+    UNKNOWN = "unknown"
+
+
+PageSnapshot = namedtuple(
+    "PageSnapshot",
+    ["url", "title", "text", "has_email_field", "has_password_field"]
+)
+
+# Phrases found in the visible page text, by the state they indicate
+TEXT_PHRASES = {
+    PageState.REDEEMED: [
+        "code already redeemed", "already redeemed", "code has already been used",
+        "this code has already been redeemed", "this access code has already been used",
+        "code was already redeemed", "has already been redeemed"
+    ],
+    PageState.VALID_NEEDS_CONTINUE: [
+        "your access code is valid", "access code is valid"
+    ],
+    PageState.ACTIVATED: [
+        "has been activated", "successfully activated", "activated successfully",
+        "activation successful", "activation complete", "access is now active",
+        "you now have access"
+    ],
+}
+
+# Phrases that turn an ACTIVATED match into a failure ("has not been activated")
+ACTIVATION_NEGATIONS = [
+    "not been activated", "not activated", "not be activated", "couldn't be activated",
+    "unable to activate", "failed to activate", "activation failed", "activation unsuccessful",
+    "unsuccessful", "was not successful"
+]
+
+# Phrases found in the page title, by the state they indicate
+TITLE_PHRASES = {
+    PageState.REDEEMED: ["already redeemed", "code already"],
+}
+
+# When several states match, the first one in this list wins
+STATE_PRIORITY = [
+    PageState.REDEEMED,
+    PageState.VALID_NEEDS_CONTINUE,
+    PageState.LOGIN_PASSWORD,
+    PageState.LOGIN_EMAIL,
+    PageState.ACTIVATED,
+]
+
+# Visible text beyond this many characters is not needed for classification
+MAX_TEXT_LENGTH = 20000
+
+SNAPSHOT_SCRIPT = """
+function visible(selector) {
+    var nodes = document.querySelectorAll(selector);
+    for (var i = 0; i < nodes.length; i++) {
+        if (nodes[i].offsetParent !== null) { return true; }
+    }
+    return false;
+}
+var body = document.body;
+return {
+    url: location.href,
+    title: document.title,
+    text: body ? body.innerText.slice(0, arguments[0]) : '',
+    hasEmailField: visible("input[type='email'], input[name='email'], input[id='email'], input[name='username']"),
+    hasPasswordField: visible("input[type='password']")
+};
+"""
+
+
+def _build_matcher(phrase_map):
+    """Compile all phrases into one alternation, longest first"""
+    phrase_states = {}
+    for state, phrases in phrase_map.items():
+        for phrase in phrases:
+            phrase_states[phrase] = state
+    # Whole words only, so "activated" doesn't match inside "deactivated"
+    pattern = "|".join(re.escape(p) for p in sorted(phrase_states, key=len, reverse=True))
+    return re.compile(rf"\b(?:{pattern})\b"), phrase_states
+
+
+_TEXT_MATCHER, _TEXT_PHRASE_STATES = _build_matcher(TEXT_PHRASES)
+_TITLE_MATCHER, _TITLE_PHRASE_STATES = _build_matcher(TITLE_PHRASES)
+_NEGATION_MATCHER, _ = _build_matcher({PageState.ACTIVATED: ACTIVATION_NEGATIONS})
+
+
+def take_snapshot(driver):
+    """Grab URL, title, visible text and login field visibility in one script call"""
+    data = driver.execute_script(SNAPSHOT_SCRIPT, MAX_TEXT_LENGTH) or {}
+    return PageSnapshot(
+        url=data.get("url") or "",
+        title=data.get("title") or "",
+        text=data.get("text") or "",
+        has_email_field=bool(data.get("hasEmailField")),
+        has_password_field=bool(data.get("hasPasswordField"))
+    )
+
+
+class _SnapshotParser(HTMLParser):
+    """Approximate the SNAPSHOT_SCRIPT fields from raw HTML"""
+
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+    HIDDEN_TAGS = {"script", "style", "noscript", "template", "head"}
+
+    def __init__(self):
+        super().__init__()
+        self.title = []
+        self.text = []
+        self.has_email_field = False
+        self.has_password_field = False
+        self._stack = []
+
+    def _hidden(self):
+        return any(hidden for _, hidden in self._stack)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        style = (attrs.get("style") or "").replace(" ", "").lower()
+        hidden = tag in self.HIDDEN_TAGS or "hidden" in attrs or "display:none" in style
+        if tag == "input" and not hidden and not self._hidden():
+            input_type = (attrs.get("type") or "text").lower()
+            if input_type == "password":
+                self.has_password_field = True
+            elif input_type == "email" or attrs.get("name") in ("email", "username") or attrs.get("id") == "email":
+                self.has_email_field = True
+        if tag not in self.VOID_TAGS:
+            self._stack.append((tag, hidden))
+
+    def handle_endtag(self, tag):
+        if any(open_tag == tag for open_tag, _ in self._stack):
+            while self._stack and self._stack.pop()[0] != tag:
+                pass
+
+    def handle_data(self, data):
+        if self._stack and self._stack[-1][0] == "title":
+            self.title.append(data)
+        elif not self._hidden():
+            self.text.append(data)
+
+
+def snapshot_from_html(url, html):
+    """Build a PageSnapshot from a fetched page, for classifying responses without a browser"""
+    parser = _SnapshotParser()
+    parser.feed(html)
+    parser.close()
+    return PageSnapshot(
+        url=url,
+        title=" ".join("".join(parser.title).split()),
+        text=" ".join(" ".join(parser.text).split())[:MAX_TEXT_LENGTH],
+        has_email_field=parser.has_email_field,
+        has_password_field=parser.has_password_field
+    )
+
+
+def classify(snapshot):
+    """Return the PageState for a snapshot"""
+    matched = set()
+    text = snapshot.text.lower()
+    for match in _TEXT_MATCHER.finditer(text):
+        matched.add(_TEXT_PHRASE_STATES[match.group()])
+    if PageState.ACTIVATED in matched and _NEGATION_MATCHER.search(text):
+        matched.discard(PageState.ACTIVATED)
+    for match in _TITLE_MATCHER.finditer(snapshot.title.lower()):
+        matched.add(_TITLE_PHRASE_STATES[match.group()])
+    if snapshot.has_password_field:
+        matched.add(PageState.LOGIN_PASSWORD)
+    if snapshot.has_email_field:
+        matched.add(PageState.LOGIN_EMAIL)
+
+    for state in STATE_PRIORITY:
+        if state in matched:
+            return state
+    return PageState.UNKNOWN
+
+
+def classify_page(driver, logger=None):
+    """Snapshot and classify the current page. Returns (state, snapshot)"""
+    snapshot = take_snapshot(driver)
+    state = classify(snapshot)
+    if logger:
+        logger.info(f"Page state: {state.name} (URL: {snapshot.url}, Title: {snapshot.title})")
+    return state, snapshot
@@ -0,0 +1,192 @@
+"""
+Per-host rate limiter and circuit breaker for the library portal and NY Times.
+Every top-level navigation and HTTP call takes a token from its host's bucket
+(waiting for one if the bucket is empty), and timeouts, slow responses,
+challenge pages and 403/429/5xx answers count against the host. After
+CIRCUIT_FAILURE_THRESHOLD failures in a row the host is tripped: calls fail
+at once with BackingOff until the cooldown ends, and the cooldown doubles
+each time the first call after it fails again. State is kept in
+RATE_LIMIT_FILE so it carries over to the next run; the daemon and a manual
+run share it, so every update holds an exclusive lock on RATE_LIMIT_FILE.lock
+and replaces the file atomically.
+"""
+
+import os
+import json
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlparse
+from config import (
+    RATE_LIMIT_FILE,
+    RATE_LIMIT_PER_MINUTE,
+    RATE_LIMIT_BURST,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_OPEN_MAX_SECONDS,
+    SLOW_RESPONSE_SECONDS
+)
+
+# Bot-protection pages that mean the host is pushing back
+CHALLENGE_MARKERS = ["captcha", "datadome", "are you a robot", "verify you are human", "access denied"]
+CHALLENGE_STATUSES = (403, 429)
+
+# Title and the start of the visible text, enough to spot a challenge page
+CHALLENGE_TEXT_SCRIPT = """
+return (document.title + ' ' + (document.body ? document.body.innerText.slice(0, 2000) : '')).toLowerCase();
+"""
+
+_lock = threading.Lock()
+
+
+class BackingOff(Exception):
+    """Raised instead of calling a host whose circuit is open"""
+
+    def __init__(self, host, until):
+        self.host = host
+        self.until = until
+        super().__init__(f"backing off {host} until {datetime.fromtimestamp(until).strftime('%H:%M:%S')} "
+                         f"after repeated failures")
+
+
+def is_challenge(status, text):
+    """
+    Return True for a response that is a bot challenge or a refusal. text is
+    the page's visible text (title and body), not its HTML: ordinary pages
+    load the challenge vendors' scripts too.
+    """
+    lowered = (text or "").lower()
+    return status in CHALLENGE_STATUSES or any(marker in lowered for marker in CHALLENGE_MARKERS)
+
+
+def _load():
+    try:
+        with open(RATE_LIMIT_FILE, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save(state):
+    tmp_file = f"{RATE_LIMIT_FILE}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, RATE_LIMIT_FILE)
+
+
+@contextmanager
+def _locked():
+    """Hold the limiter state exclusively, against other threads and other processes"""
+    with _lock:
+        os.makedirs(os.path.dirname(RATE_LIMIT_FILE), exist_ok=True)
+        with open(f"{RATE_LIMIT_FILE}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _host_state(state, host, now):
+    return state.setdefault(host, {"tokens": float(RATE_LIMIT_BURST), "updated": now,
+                                   "failures": 0, "trips": 0, "open_until": 0})
+
+
+def host_of(url):
+    return urlparse(url).hostname or ""
+
+
+def acquire(url, logger):
+    """
+    Take a token for url's host, sleeping until one is available. Raises
+    BackingOff while the host's circuit is open.
+    """
+    host = host_of(url)
+    with _locked():
+        state = _load()
+        now = time.time()
+        entry = _host_state(state, host, now)
+        if entry["open_until"] > now:
+            raise BackingOff(host, entry["open_until"])
+        wait = 0
+        rate = RATE_LIMIT_PER_MINUTE / 60
+        if rate > 0:
+            entry["tokens"] = min(float(RATE_LIMIT_BURST), entry["tokens"] + (now - entry["updated"]) * rate)
+            entry["updated"] = now
+            # Reserve the token now; a negative balance is the wait until it exists
+            entry["tokens"] -= 1
+            wait = -entry["tokens"] / rate if entry["tokens"] < 0 else 0
+            _save(state)
+    if wait > 0:
+        logger.info(f"Rate limiting {host}: waiting {wait:.1f}s")
+        time.sleep(wait)
+
+
+def record_success(url):
+    """Close url's host circuit after a good response"""
+    host = host_of(url)
+    with _locked():
+        state = _load()
+        entry = _host_state(state, host, time.time())
+        if entry["failures"] or entry["trips"]:
+            entry.update(failures=0, trips=0, open_until=0)
+            _save(state)
+
+
+def record_failure(url, logger, reason):
+    """Count a failure against url's host, tripping its circuit at the threshold"""
+    host = host_of(url)
+    with _locked():
+        state = _load()
+        now = time.time()
+        entry = _host_state(state, host, now)
+        if entry["open_until"] > now:
+            return
+        entry["failures"] += 1
+        # After a cooldown the first call is a trial: one more failure trips it again
+        if entry["failures"] >= CIRCUIT_FAILURE_THRESHOLD or entry["trips"]:
+            entry["trips"] += 1
+            entry["failures"] = 0
+            cooldown = min(CIRCUIT_OPEN_SECONDS * 2 ** (entry["trips"] - 1), CIRCUIT_OPEN_MAX_SECONDS)
+            entry["open_until"] = now + cooldown
+            logger.warning(f"{host} failed ({reason}) - backing off until "
+                           f"{datetime.fromtimestamp(entry['open_until']).strftime('%H:%M:%S')}")
+        else:
+            logger.warning(f"{host} failed ({reason}) - {entry['failures']} of {CIRCUIT_FAILURE_THRESHOLD} "
+                           f"before backing off")
+        _save(state)
+
+
+def open_circuits():
+    """Return {host: open-until timestamp} for hosts that are backing off now"""
+    now = time.time()
+    return {host: entry["open_until"] for host, entry in _load().items() if entry.get("open_until", 0) > now}
+
+
+def navigate(driver, url, logger):
+    """
+    driver.get through the limiter. A failed or slow load, or a challenge
+    page, counts against the host; a challenge also fails the step at once
+    rather than leaving the caller to time out waiting for its elements.
+    """
+    acquire(url, logger)
+    start = time.monotonic()
+    try:
+        driver.get(url)
+    except Exception as e:
+        record_failure(url, logger, f"navigation error: {e.__class__.__name__}")
+        raise
+    elapsed = time.monotonic() - start
+    try:
+        challenged = is_challenge(None, driver.execute_script(CHALLENGE_TEXT_SCRIPT))
+    except Exception:
+        challenged = False
+    if challenged:
+        record_failure(url, logger, "challenge page")
+        raise Exception(f"Bot challenge page at {host_of(driver.current_url) or host_of(url)}")
+    if elapsed > SLOW_RESPONSE_SECONDS:
+        record_failure(url, logger, f"slow response {elapsed:.1f}s")
+    else:
+        record_success(url)
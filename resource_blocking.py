@@ -0,0 +1,170 @@
+"""
+Resource blocking for page loads.
+Blocks ad/analytics hosts, and images, fonts and media from hosts outside
+the allowlist, through DevTools (Network.setBlockedURLs), since none of them
+matter for getting and redeeming the code. DevTools patterns can't express
+"every host except these", so type blocking is learned: a host is added once
+it has served one of those types unblocked, and the sizes seen then are the
+baseline for the bytes each later blocked request saved.
+"""
+
+import os
+import json
+from urllib.parse import urlparse
+from network_log import drain_events
+from config import (
+    BLOCKED_RESOURCE_TYPES,
+    BLOCKED_HOSTS,
+    ALLOWED_HOSTS,
+    RESOURCE_SIZES_FILE
+)
+
+# File extensions for each blockable resource type
+RESOURCE_TYPE_EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "m3u8", "mp3"],
+}
+
+# DevTools resource type -> blockable resource type
+DEVTOOLS_TYPES = {"Image": "image", "Font": "font", "Media": "media"}
+
+# Most hosts remembered for type blocking
+MAX_LEARNED_HOSTS = 200
+
+# Ad, analytics and tracking hosts that the redemption flow never needs
+DEFAULT_BLOCKED_HOSTS = [
+    "doubleclick.net", "googlesyndication.com", "googletagmanager.com",
+    "google-analytics.com", "googletagservices.com", "amazon-adsystem.com",
+    "adnxs.com", "criteo.com", "criteo.net", "facebook.net", "facebook.com",
+    "chartbeat.com", "chartbeat.net", "scorecardresearch.com", "nr-data.net",
+    "hotjar.com", "taboola.com", "outbrain.com", "quantserve.com",
+    "moatads.com", "rubiconproject.com", "pubmatic.com", "bing.com",
+]
+
+# Hosts the flow does need; nothing from these is ever blocked
+DEFAULT_ALLOWED_HOSTS = [
+    "nytimes.com", "nyt.com", "indypl.org",
+    "recaptcha.net", "gstatic.com", "captcha-delivery.com", "datadome.co",
+]
+
+
+def _host_matches(host, domain):
+    return host == domain or host.endswith(f".{domain}")
+
+
+def _allowed(host):
+    return any(_host_matches(host, allowed) for allowed in DEFAULT_ALLOWED_HOSTS + ALLOWED_HOSTS)
+
+
+def _extension_patterns(host, extension):
+    # Anchor the extension at the end of the path (with or without a query
+    # string), so a page whose path or query merely contains ".gif" loads
+    return [f"*://{host}/*.{extension}", f"*://{host}/*.{extension}?*"]
+
+
+def blocked_url_patterns(hosts=None):
+    """
+    Build the DevTools URL patterns: the configured types on learned hosts
+    outside the allowlist (hosts: as from _load_hosts), and the ad/analytics hosts
+    """
+    hosts = _load_hosts() if hosts is None else hosts
+    patterns = []
+    for host, types in sorted(hosts.items()):
+        if _allowed(host):
+            continue
+        for resource_type in BLOCKED_RESOURCE_TYPES:
+            if resource_type in types:
+                for extension in RESOURCE_TYPE_EXTENSIONS.get(resource_type, []):
+                    patterns.extend(_extension_patterns(host, extension))
+    for host in DEFAULT_BLOCKED_HOSTS + BLOCKED_HOSTS:
+        if not _allowed(host):
+            patterns.extend([f"*://{host}/*", f"*://*.{host}/*"])
+    return patterns
+
+
+def apply_blocking(driver, logger):
+    """Install the blocklist on a freshly created driver"""
+    try:
+        patterns = blocked_url_patterns()
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.info(f"Resource blocking enabled ({len(patterns)} URL patterns)")
+    except Exception as e:
+        logger.warning(f"Could not enable resource blocking: {e}")
+
+
+def _load_hosts():
+    """Return {host: {resource type: [requests, bytes]}} seen loading unblocked"""
+    try:
+        with open(RESOURCE_SIZES_FILE, 'r') as f:
+            hosts = json.load(f)
+    except Exception:
+        return {}
+    # Files from before type blocking was learned per host hold per-type totals only
+    return {host: types for host, types in hosts.items() if isinstance(types, dict)}
+
+
+def _save_hosts(hosts):
+    os.makedirs(os.path.dirname(RESOURCE_SIZES_FILE), exist_ok=True)
+    tmp_file = f"{RESOURCE_SIZES_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(hosts, f)
+    os.replace(tmp_file, RESOURCE_SIZES_FILE)
+
+
+def summarize_blocking(driver, logger):
+    """
+    Log how many requests were blocked and transferred this run, and learn
+    the hosts outside the allowlist that served blockable types. Blocked
+    requests never report a size, so bytes saved are estimated from what the
+    same host served for the same type before it was blocked.
+    """
+    requests = {}
+    blocked = {}
+    transferred_bytes = 0
+    transferred_requests = 0
+    estimated_saved = 0
+    estimated_requests = 0
+    hosts = _load_hosts()
+    for event in drain_events(driver):
+        params = event.get("params", {})
+        method = event.get("method")
+        if method == "Network.requestWillBeSent":
+            url = params.get("request", {}).get("url", "")
+            requests[params.get("requestId")] = (params.get("type", "Other"), urlparse(url).hostname or "")
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            resource_type, host = requests.get(params.get("requestId"), (params.get("type") or "Other", ""))
+            blocked[resource_type] = blocked.get(resource_type, 0) + 1
+            count, total = hosts.get(host, {}).get(DEVTOOLS_TYPES.get(resource_type), (0, 0))
+            if count:
+                estimated_saved += total / count
+                estimated_requests += 1
+        elif method == "Network.loadingFinished":
+            size = params.get("encodedDataLength", 0)
+            transferred_bytes += size
+            transferred_requests += 1
+            resource_type, host = requests.get(params.get("requestId"), ("Other", ""))
+            kind = DEVTOOLS_TYPES.get(resource_type)
+            if kind and host and not _allowed(host) and (host in hosts or len(hosts) < MAX_LEARNED_HOSTS):
+                count, total = hosts.setdefault(host, {}).get(kind, (0, 0))
+                hosts[host][kind] = (count + 1, total + size)
+
+    try:
+        _save_hosts(hosts)
+    except OSError:
+        pass
+
+    blocked_total = sum(blocked.values())
+    by_type = ", ".join(f"{t}: {n}" for t, n in sorted(blocked.items())) or "none"
+    message = (f"Resource blocking: {blocked_total} requests blocked ({by_type}); "
+               f"{transferred_requests} requests / {transferred_bytes / 1024:.0f} KB transferred")
+    if estimated_requests:
+        message += (f"; ~{estimated_saved / 1024:.0f} KB saved by the {estimated_requests} blocked requests "
+                    f"whose host was measured unblocked before")
+    logger.info(message)
+    return {
+        "blocked_requests": blocked_total,
+        "transferred_bytes": transferred_bytes,
+        "estimated_bytes_saved": int(estimated_saved),
+    }
@@ -0,0 +1,149 @@
+"""
+Browser memory and CPU watchdog.
+Samples the RSS and CPU of the chromedriver/Chrome process tree while a run
+is in progress, keeps the peak for the run's metrics, and quits the browser
+before the tree grows past MEMORY_BUDGET_MB so the run fails cleanly instead
+of the container being OOM-killed mid-redemption.
+"""
+
+import os
+import time
+import threading
+import subprocess
+from config import MEMORY_BUDGET_MB
+
+# Seconds between samples
+SAMPLE_INTERVAL = 0.5
+
+# The browser is quit once RSS reaches this fraction of the budget
+ABORT_FRACTION = 0.9
+
+# Chrome flags for small hosts: one renderer, no disk cache, extensions or background traffic
+LOW_MEMORY_ARGUMENTS = [
+    "--renderer-process-limit=1",
+    "--disable-features=site-per-process,IsolateOrigins,Translate,OptimizationHints,MediaRouter,BackForwardCache",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--metrics-recording-only",
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--aggressive-cache-discard",
+    "--window-size=800,600",
+    "--js-flags=--max-old-space-size=256",
+]
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _proc_table():
+    """Return {pid: (ppid, rss bytes, cpu seconds)} from /proc"""
+    table = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", 'r') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                fields = f.read().rsplit(")", 1)[1].split()
+            ppid, utime, stime, rss_pages = int(fields[1]), int(fields[11]), int(fields[12]), int(fields[21])
+        except (OSError, IndexError, ValueError):
+            continue
+        table[int(name)] = (ppid, rss_pages * _PAGE_SIZE, (utime + stime) / _CLOCK_TICKS)
+    return table
+
+
+def _ps_table():
+    """Return {pid: (ppid, rss bytes, None)} from ps, where /proc is unavailable (macOS)"""
+    output = subprocess.run(["ps", "-ax", "-o", "pid=,ppid=,rss="], capture_output=True, text=True, timeout=5).stdout
+    table = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and all(part.isdigit() for part in parts):
+            table[int(parts[0])] = (int(parts[1]), int(parts[2]) * 1024, None)
+    return table
+
+
+def process_tree_usage(root_pid):
+    """Return (rss bytes, cpu seconds or None) summed over root_pid and its descendants"""
+    table = _proc_table() if os.path.isdir("/proc") else _ps_table()
+    children = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    rss, cpu, pending = 0, 0.0, [root_pid]
+    while pending:
+        pid = pending.pop()
+        if pid not in table:
+            continue
+        _, pid_rss, pid_cpu = table[pid]
+        rss += pid_rss
+        cpu = None if cpu is None or pid_cpu is None else cpu + pid_cpu
+        pending.extend(children.get(pid, []))
+    return rss, cpu
+
+
+class ResourceWatchdog:
+    """Background sampler of a driver's process tree, with an optional memory budget"""
+
+    def __init__(self, driver, logger, budget_mb=MEMORY_BUDGET_MB):
+        self.driver = driver
+        self.logger = logger
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.peak_rss = 0
+        self.peak_cpu_percent = 0.0
+        self.samples = 0
+        self.exceeded = False
+        self._stop = threading.Event()
+        self._thread = None
+        process = getattr(getattr(driver, "service", None), "process", None)
+        self.root_pid = getattr(process, "pid", None)
+
+    def start(self):
+        if self.root_pid is None:
+            self.logger.info("Resource watchdog unavailable - driver process not known")
+            return self
+        self._thread = threading.Thread(target=self._run, name="resource-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        last_cpu, last_time = None, None
+        while not self._stop.is_set():
+            try:
+                rss, cpu = process_tree_usage(self.root_pid)
+            except Exception as e:
+                self.logger.warning(f"Resource watchdog stopped: {e}")
+                return
+            now = time.monotonic()
+            self.samples += 1
+            self.peak_rss = max(self.peak_rss, rss)
+            if cpu is not None and last_cpu is not None and now > last_time:
+                self.peak_cpu_percent = max(self.peak_cpu_percent, 100 * (cpu - last_cpu) / (now - last_time))
+            last_cpu, last_time = cpu, now
+
+            if self.budget_bytes and rss >= self.budget_bytes * ABORT_FRACTION:
+                self.exceeded = True
+                self.logger.error(f"Browser is using {rss / 1048576:.0f} MB, close to the "
+                                  f"{self.budget_bytes / 1048576:.0f} MB budget - closing it to abort the run")
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                return
+            self._stop.wait(SAMPLE_INTERVAL)
+
+    def stop(self):
+        """Stop sampling and return the peaks recorded for the run"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return {
+            "peak_rss_mb": round(self.peak_rss / 1048576, 1),
+            "peak_cpu_percent": round(self.peak_cpu_percent, 1),
+            "samples": self.samples,
+            "budget_exceeded": self.exceeded,
+        }
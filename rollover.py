@@ -0,0 +1,127 @@
+"""
+Rollover-aware scheduling for the daemon (SCHEDULE_MODE=rollover).
+Learns from the code_probes ledger when the library portal starts issuing
+the next day's code, wakes ROLLOVER_LEAD_MINUTES before that, then probes
+the portal over HTTP with backed-off retries until a code that differs from
+the previous day's appears. Every account is consulted: the wake time is the
+earliest any account's history suggests, and each probe round asks the
+accounts in turn until one gets a code, so one account whose library card
+fails doesn't hold up the rest. The fresh code is checkpointed so the run
+that follows redeems it straight away.
+"""
+
+import statistics
+from datetime import datetime, timedelta
+import run_ledger
+import rate_limit
+from library_http import fetch_library_code_http
+from checkpoints import load_checkpoint, STAGE_CODE_OBTAINED
+from config import (
+    ROLLOVER_LEAD_MINUTES,
+    ROLLOVER_HISTORY_DAYS,
+    ROLLOVER_PROBE_SECONDS,
+    ROLLOVER_PROBE_MAX_SECONDS,
+    ROLLOVER_MAX_PROBES
+)
+
+
+def _seconds_after_midnight(moment):
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def estimate_rollover(observations):
+    """
+    Return (earliest, latest) seconds after midnight between which the new
+    code is issued, from rollover_observations: the median last probe that
+    still saw the old code (None if no probe has) and the earliest probe
+    that saw the new one. Returns None without history.
+    """
+    if not observations:
+        return None
+    stale = [_seconds_after_midnight(stale) for _, stale, _ in observations if stale is not None]
+    latest = min(_seconds_after_midnight(fresh) for _, _, fresh in observations)
+    return (statistics.median(stale) if stale else None), latest
+
+
+def rollover_wake_time(day, account_name, logger):
+    """When to start probing on day, or None if there is no rollover history yet"""
+    try:
+        estimate = estimate_rollover(run_ledger.rollover_observations(account_name, ROLLOVER_HISTORY_DAYS))
+    except Exception as e:
+        logger.warning(f"Could not read rollover history: {e}")
+        return None
+    if estimate is None:
+        return None
+    earliest, latest = estimate
+    if earliest is None:
+        # Every probe so far already saw the new code, so halve the distance
+        # to midnight each day until a probe catches the old one
+        start = latest / 2
+    else:
+        start = min(earliest, latest)
+    midnight = datetime.combine(day, datetime.min.time())
+    return max(midnight, midnight + timedelta(seconds=start - ROLLOVER_LEAD_MINUTES * 60))
+
+
+def earliest_wake_time(day, accounts, logger):
+    """The earliest rollover_wake_time over the accounts, or None if none has history"""
+    wakes = [wake for wake in (rollover_wake_time(day, account.name, logger) for account in accounts) if wake]
+    return min(wakes) if wakes else None
+
+
+def probe_delay(probe):
+    """Seconds to wait after the given (0-based) probe"""
+    return min(ROLLOVER_PROBE_SECONDS * (2 ** probe), ROLLOVER_PROBE_MAX_SECONDS)
+
+
+def _probe(account, logger):
+    """Fetch the account's code once. Returns (result, code, fresh); code is None if the fetch failed"""
+    result = fetch_library_code_http(logger, account.barcode)
+    code = (result[0] or result[1]) if result else None
+    try:
+        fresh = run_ledger.record_code_probe(account.name, code, "probe")
+    except Exception as e:
+        logger.warning(f"Could not record code probe: {e}")
+        fresh = code is not None
+    return result, code, fresh
+
+
+def wait_for_fresh_code(accounts, logger, stop_event, deadline):
+    """
+    Probe the library portal until it issues a code that differs from the
+    previous day's, at most ROLLOVER_MAX_PROBES rounds and not past deadline.
+    Each round tries the accounts in order until one gets a code at all.
+    Returns True once a fresh code was found and checkpointed.
+    """
+    for probe in range(ROLLOVER_MAX_PROBES):
+        if stop_event.is_set():
+            return False
+        code = None
+        try:
+            for account in accounts:
+                result, code, fresh = _probe(account, logger)
+                if code is not None:
+                    break
+                logger.info(f"Rollover probe got no code for {account.name} - trying the next account")
+        except rate_limit.BackingOff as e:
+            logger.info(f"Not probing: {e}")
+            if datetime.fromtimestamp(e.until) >= deadline:
+                break
+            stop_event.wait(e.until - datetime.now().timestamp())
+            continue
+        if code is not None and fresh:
+            logger.info(f"Library portal is issuing today's code (probe {probe + 1}, {account.name})")
+            checkpoint = load_checkpoint(logger, account.name)
+            if not checkpoint.reached(STAGE_CODE_OBTAINED):
+                checkpoint.mark(STAGE_CODE_OBTAINED, logger, gift_code=result[0], redirect_url=result[1])
+            return True
+
+        delay = probe_delay(probe)
+        if datetime.now() + timedelta(seconds=delay) >= deadline:
+            break
+        reason = "still has yesterday's code" if code else "did not return a code"
+        logger.info(f"Library portal {reason} - probing again in {delay:.0f}s")
+        stop_event.wait(delay)
+
+    logger.info("No fresh code from the library portal - falling back to the fixed run time")
+    return False
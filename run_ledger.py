@@ -0,0 +1,185 @@
+"""
+Run ledger for NY Times Library Automation.
+Records each run's date, account, outcome, gift code and step timings in a
+small SQLite database, so "already done today?" is a single indexed lookup
+and the history is available for reporting. The code_probes table records
+every code fetched from the library portal, and whether it was new, so the
+rollover scheduler can learn when the next day's code is first issued.
+"""
+
+import os
+import json
+import sqlite3
+import statistics
+from contextlib import closing
+from datetime import datetime
+from config import LEDGER_FILE
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_WARNING = "warning"
+OUTCOME_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_date TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT NOT NULL,
+    account TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    gift_code TEXT,
+    timings TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS runs_by_date ON runs (run_date, account, outcome);
+CREATE TABLE IF NOT EXISTS code_probes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    probe_date TEXT NOT NULL,
+    probed_at TEXT NOT NULL,
+    account TEXT NOT NULL,
+    source TEXT NOT NULL,
+    code TEXT,
+    fresh INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS code_probes_by_date ON code_probes (account, probe_date);
+"""
+
+
+def _connect():
+    os.makedirs(os.path.dirname(LEDGER_FILE), exist_ok=True)
+    conn = sqlite3.connect(LEDGER_FILE, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _row_to_dict(row):
+    run = dict(row)
+    run["timings"] = json.loads(run["timings"] or "{}")
+    return run
+
+
+def record_run(account, outcome, started_at, gift_code=None, timings=None):
+    """Append a finished run to the ledger"""
+    finished_at = datetime.now()
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO runs (run_date, started_at, finished_at, account, outcome, gift_code, timings)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                started_at.strftime('%Y-%m-%d'),
+                started_at.isoformat(timespec='seconds'),
+                finished_at.isoformat(timespec='seconds'),
+                account,
+                outcome,
+                gift_code,
+                json.dumps(timings or {})
+            )
+        )
+
+
+def succeeded_today(account):
+    """Return True if the account has a successful run recorded for today"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM runs WHERE run_date = ? AND account = ? AND outcome = ? LIMIT 1",
+            (today, account, OUTCOME_SUCCESS)
+        ).fetchone()
+    return row is not None
+
+
+def account_names():
+    """Every account with a run in the ledger"""
+    with closing(_connect()) as conn:
+        rows = conn.execute("SELECT DISTINCT account FROM runs ORDER BY account").fetchall()
+    return [row["account"] for row in rows]
+
+
+def recent_runs(limit=30, account=None):
+    """Return the most recent runs, newest first"""
+    with closing(_connect()) as conn:
+        if account is None:
+            rows = conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT * FROM runs WHERE account = ? ORDER BY id DESC LIMIT ?", (account, limit)
+            ).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def stage_percentiles(limit=30, account=None):
+    """Return {stage: {"p50", "p95", "count"}} in seconds over the most recent runs"""
+    samples = {}
+    for run in recent_runs(limit, account):
+        for stage, seconds in run["timings"].items():
+            samples.setdefault(stage, []).append(seconds)
+    result = {}
+    for stage, values in sorted(samples.items()):
+        if len(values) == 1:
+            p50 = p95 = values[0]
+        else:
+            cuts = statistics.quantiles(values, n=20, method="inclusive")
+            p50, p95 = cuts[9], cuts[18]
+        result[stage] = {"p50": round(p50, 3), "p95": round(p95, 3), "count": len(values)}
+    return result
+
+
+def previous_code(account, day=None):
+    """The last code seen for the account before day (default today), or None"""
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            "SELECT code FROM code_probes WHERE account = ? AND probe_date < ? AND code IS NOT NULL"
+            " ORDER BY id DESC LIMIT 1",
+            (account, day)
+        ).fetchone() or conn.execute(
+            "SELECT gift_code AS code FROM runs WHERE account = ? AND run_date < ? AND gift_code IS NOT NULL"
+            " ORDER BY id DESC LIMIT 1",
+            (account, day)
+        ).fetchone()
+    return row["code"] if row else None
+
+
+def record_code_probe(account, code, source, probed_at=None):
+    """
+    Record a code fetched from the library portal (code None if the fetch
+    failed). Returns True if it differs from the previous day's code, or
+    if there is no earlier code to compare with.
+    """
+    probed_at = probed_at or datetime.now()
+    day = probed_at.strftime('%Y-%m-%d')
+    previous = previous_code(account, day)
+    fresh = code is not None and code != previous
+    with closing(_connect()) as conn, conn:
+        conn.execute(
+            "INSERT INTO code_probes (probe_date, probed_at, account, source, code, fresh)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (day, probed_at.isoformat(timespec='seconds'), account, source, code, int(fresh))
+        )
+    return fresh
+
+
+def rollover_observations(account, days):
+    """
+    Return [(date, last stale probe, first fresh probe)] for the account's
+    last days that saw a fresh code. The new code was issued between the
+    two; last stale probe is None when the first probe of the day was fresh.
+    """
+    with closing(_connect()) as conn:
+        rows = conn.execute(
+            "SELECT probe_date, probed_at, fresh FROM code_probes"
+            " WHERE account = ? AND code IS NOT NULL AND probe_date >= date('now', 'localtime', ?)"
+            " ORDER BY probe_date, probed_at",
+            (account, f"-{days} days")
+        ).fetchall()
+    observations = {}
+    for row in rows:
+        day = observations.setdefault(row["probe_date"], [None, None])
+        probed_at = datetime.fromisoformat(row["probed_at"])
+        if day[1] is not None:
+            continue
+        if row["fresh"]:
+            day[1] = probed_at
+        else:
+            day[0] = probed_at
+    return [(day, stale, fresh) for day, (stale, fresh) in sorted(observations.items()) if fresh is not None]
@@ -0,0 +1,252 @@
+"""
+Persistent NY Times session store.
+Saves the signed-in cookies and localStorage after every successful run -
+a full login, a restored browser session or a browserless redemption - and
+restores them into the next browser, so the email/password login only runs
+when the saved session has expired. Re-saves keep the time of the original
+login, so SESSION_MAX_AGE_DAYS still forces a fresh login periodically.
+"""
+
+import os
+import json
+import time
+import ipaddress
+import http.cookiejar
+from urllib.parse import urlparse
+from config import NYT_REDEEM_BASE_URL, SESSION_DIR, SESSION_MAX_AGE_DAYS
+from accounts import account_slug
+import rate_limit
+
+# Cookie that carries the signed-in NY Times session
+AUTH_COOKIE_NAME = "NYT-S"
+
+
+def _cookie_domain(hostname):
+    """Domain whose cookies belong to the session: the parent of www.nytimes.com, the host itself for IPs and localhost"""
+    try:
+        ipaddress.ip_address(hostname)
+        return hostname
+    except ValueError:
+        pass
+    labels = hostname.split(".")
+    return ".".join(labels[1:]) if len(labels) > 2 else hostname
+
+
+# Cookies are only kept for hosts under this domain
+NYT_DOMAIN = _cookie_domain(urlparse(NYT_REDEEM_BASE_URL).hostname or "")
+NYT_ORIGIN = f"{urlparse(NYT_REDEEM_BASE_URL).scheme}://{urlparse(NYT_REDEEM_BASE_URL).netloc}"
+
+# Re-populates localStorage on the NYT origin before any page script runs
+RESTORE_LOCAL_STORAGE_SCRIPT = """
+(function(items, origin) {
+    if (location.origin !== origin) { return; }
+    try {
+        Object.keys(items).forEach(function(key) {
+            if (localStorage.getItem(key) === null) { localStorage.setItem(key, items[key]); }
+        });
+    } catch (e) {}
+})(%s, %s);
+"""
+
+
+def _is_nyt_cookie(cookie):
+    domain = cookie.get("domain", "").lstrip(".")
+    return domain == NYT_DOMAIN or domain.endswith(f".{NYT_DOMAIN}")
+
+
+def _get_all_cookies(driver):
+    """Return cookies for every domain via DevTools, or the current page's cookies"""
+    try:
+        return driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+    except Exception:
+        return driver.get_cookies()
+
+
+def _cookie_expiry(cookie):
+    # DevTools reports "expires", WebDriver reports "expiry"; session cookies have neither
+    expires = cookie.get("expires", cookie.get("expiry"))
+    if expires is None or expires < 0:
+        return None
+    return expires
+
+
+def cookie_jar(session):
+    """http.cookiejar.CookieJar holding a saved session's cookies, for plain HTTP requests"""
+    jar = http.cookiejar.CookieJar()
+    for cookie in session.get("cookies", []):
+        domain = cookie.get("domain", "")
+        expires = _cookie_expiry(cookie)
+        jar.set_cookie(http.cookiejar.Cookie(
+            0, cookie["name"], cookie["value"], None, False,
+            domain, domain.startswith("."), domain.startswith("."),
+            cookie.get("path", "/"), True, bool(cookie.get("secure")),
+            int(expires) if expires is not None else None, expires is None,
+            None, None, {"HttpOnly": None} if cookie.get("httpOnly") else {}
+        ))
+    return jar
+
+
+def session_file(account_name):
+    """Path of the saved session for an account"""
+    return os.path.join(SESSION_DIR, f"nyt_session_{account_slug(account_name)}.json")
+
+
+def load_session(logger, account_name):
+    """Load the saved session if it is present and not expired, otherwise None"""
+    path = session_file(account_name)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'r') as f:
+            session = json.load(f)
+    except Exception as e:
+        logger.warning(f"Could not read saved session: {e}")
+        return None
+
+    now = time.time()
+    if now - _logged_in_at(session) > SESSION_MAX_AGE_DAYS * 86400:
+        logger.info("Saved NY Times session is too old - full login required")
+        return None
+
+    auth_cookie = next((c for c in session.get("cookies", []) if c.get("name") == AUTH_COOKIE_NAME), None)
+    if auth_cookie is None:
+        logger.info("Saved NY Times session has no auth cookie - full login required")
+        return None
+    expiry = _cookie_expiry(auth_cookie)
+    if expiry is not None and expiry <= now:
+        logger.info("Saved NY Times session has expired - full login required")
+        return None
+
+    return session
+
+
+def _logged_in_at(session):
+    # Sessions saved before logged_in_at was recorded only have saved_at
+    return session.get("logged_in_at", session.get("saved_at", 0))
+
+
+def _saved_login_time(account_name):
+    """When the saved session's login happened, or None without a readable saved session"""
+    try:
+        with open(session_file(account_name), 'r') as f:
+            return _logged_in_at(json.load(f)) or None
+    except Exception:
+        return None
+
+
+def _write_session(cookies, local_storage, logger, account_name, logged_in_at):
+    """Write the session file, unless the cookies lack the auth cookie. Returns True if saved"""
+    if not any(c.get("name") == AUTH_COOKIE_NAME for c in cookies):
+        logger.info("No NY Times auth cookie present - not saving session")
+        return False
+
+    session = {
+        "saved_at": time.time(),
+        "logged_in_at": logged_in_at,
+        "cookies": cookies,
+        "local_storage": local_storage
+    }
+    path = session_file(account_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(session, f)
+    os.chmod(tmp_file, 0o600)
+    os.replace(tmp_file, path)
+    logger.info(f"Saved NY Times session ({len(cookies)} cookies, {len(local_storage)} localStorage items)")
+    return True
+
+
+def save_session(driver, logger, account_name, after_login=True):
+    """
+    Save NY Times cookies and localStorage after a successful run. after_login
+    is False when the run used a restored session, whose login time is kept
+    """
+    try:
+        logged_in_at = None if after_login else _saved_login_time(account_name)
+        cookies = [c for c in _get_all_cookies(driver) if _is_nyt_cookie(c)]
+        local_storage = {}
+        if urlparse(driver.current_url).netloc == urlparse(NYT_ORIGIN).netloc:
+            local_storage = driver.execute_script(
+                "var items = {}; for (var i = 0; i < localStorage.length; i++) {"
+                " var key = localStorage.key(i); items[key] = localStorage.getItem(key); }"
+                " return items;"
+            ) or {}
+        return _write_session(cookies, local_storage, logger, account_name, logged_in_at or time.time())
+    except Exception as e:
+        logger.warning(f"Could not save NY Times session: {e}")
+        return False
+
+
+def save_session_from_jar(jar, session, logger, account_name):
+    """
+    Save the cookies of a plain HTTP redemption (cookie_jar of session, as
+    updated by the responses), keeping the session's saved localStorage
+    """
+    try:
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "secure": cookie.secure,
+                "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+                "expires": cookie.expires if cookie.expires is not None else -1
+            }
+            for cookie in jar
+        ]
+        cookies = [c for c in cookies if _is_nyt_cookie(c)]
+        return _write_session(cookies, session.get("local_storage", {}), logger, account_name,
+                              _logged_in_at(session) or time.time())
+    except Exception as e:
+        logger.warning(f"Could not save NY Times session: {e}")
+        return False
+
+
+def restore_session(driver, logger, account_name):
+    """Restore a saved NY Times session into the driver. Returns True if restored"""
+    session = load_session(logger, account_name)
+    if session is None:
+        return False
+
+    try:
+        cookies = session.get("cookies", [])
+        try:
+            for cookie in cookies:
+                params = {k: cookie[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite")
+                          if k in cookie}
+                expiry = _cookie_expiry(cookie)
+                if expiry is not None:
+                    params["expires"] = expiry
+                driver.execute_cdp_cmd("Network.setCookie", params)
+            if session.get("local_storage"):
+                driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+                    "source": RESTORE_LOCAL_STORAGE_SCRIPT % (
+                        json.dumps(session["local_storage"]), json.dumps(NYT_ORIGIN))
+                })
+        except Exception:
+            # No DevTools access - cookies can only be added for the current origin
+            rate_limit.navigate(driver, f"{NYT_ORIGIN}/robots.txt", logger)
+            for cookie in cookies:
+                params = {k: cookie[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly")
+                          if k in cookie}
+                expiry = _cookie_expiry(cookie)
+                if expiry is not None:
+                    params["expiry"] = int(expiry)
+                driver.add_cookie(params)
+
+        logger.info(f"Restored saved NY Times session ({len(cookies)} cookies)")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not restore NY Times session: {e}")
+        return False
+
+
+def clear_session(logger, account_name):
+    """Remove the saved session so the next run does a full login"""
+    path = session_file(account_name)
+    if os.path.exists(path):
+        os.remove(path)
+        logger.info("Cleared saved NY Times session")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Live status and health endpoint (STATUS_SERVER=true in daemon mode).
+A small stdlib HTTP server on 127.0.0.1 that answers from the run ledger,
+the in-memory metrics of runs in progress and the daemon's schedule, so
+polling it never touches the log file:
+
+    GET /status  last run per account with its stage durations, p50/p95 per
+                 stage over each account's recent runs, the stage of any run
+                 in progress, hosts being backed off and the next scheduled run
+    GET /health  200 if no account's last run failed, 503 otherwise
+
+Run it on its own (python3 status_server.py) to serve the history without
+the daemon; the live fields are then empty.
+"""
+
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import metrics
+import rate_limit
+import run_ledger
+from config import STATUS_HOST, STATUS_PORT, STATUS_HISTORY_RUNS
+
+_next_run = None
+
+
+def set_next_run(when):
+    """Record the daemon's next scheduled run time"""
+    global _next_run
+    _next_run = when
+
+
+def _last_runs():
+    """Most recent ledger entry per account"""
+    last = {}
+    for account in run_ledger.account_names():
+        for run in run_ledger.recent_runs(1, account):
+            last[account] = {
+                "started_at": run["started_at"],
+                "finished_at": run["finished_at"],
+                "outcome": run["outcome"],
+                "durations": run["timings"],
+            }
+    return last
+
+
+def _stage_percentiles():
+    """p50/p95 per stage over each account's last STATUS_HISTORY_RUNS runs"""
+    return {account: run_ledger.stage_percentiles(STATUS_HISTORY_RUNS, account)
+            for account in run_ledger.account_names()}
+
+
+def status():
+    """The /status document"""
+    now = time.monotonic()
+    return {
+        "time": datetime.now().isoformat(timespec='seconds'),
+        "next_run": _next_run.isoformat(timespec='seconds') if _next_run else None,
+        "running": [
+            {
+                "account": run.account,
+                "started_at": run.started_at.isoformat(timespec='seconds'),
+                "elapsed": round(now - run.start, 1),
+                "stage": run.current_stage(),
+            }
+            for run in metrics.active_runs()
+        ],
+        "last_runs": _last_runs(),
+        "stages": _stage_percentiles(),
+        "backing_off": {
+            host: datetime.fromtimestamp(until).isoformat(timespec='seconds')
+            for host, until in rate_limit.open_circuits().items()
+        },
+    }
+
+
+def health():
+    """Return (healthy, the /health document)"""
+    outcomes = {account: run["outcome"] for account, run in _last_runs().items()}
+    healthy = run_ledger.OUTCOME_FAILED not in outcomes.values()
+    return healthy, {"status": "ok" if healthy else "failing", "last_outcomes": outcomes}
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Serves /status and /health as JSON"""
+
+    def do_GET(self):
+        try:
+            if self.path == "/status":
+                code, body = 200, status()
+            elif self.path == "/health":
+                healthy, body = health()
+                code = 200 if healthy else 503
+            else:
+                code, body = 404, {"error": "not found", "endpoints": ["/status", "/health"]}
+        except Exception as e:
+            code, body = 500, {"error": str(e)}
+        payload = json.dumps(body, indent=2).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Monitoring polls would otherwise flood stderr
+        pass
+
+
+def start_status_server(logger, host=STATUS_HOST, port=STATUS_PORT):
+    """Serve status on a background thread. Returns the server (call shutdown() to stop), or None"""
+    try:
+        server = ThreadingHTTPServer((host, port), StatusHandler)
+    except OSError as e:
+        logger.warning(f"Could not start status server on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="status-server", daemon=True).start()
+    logger.info(f"Status server listening on http://{host}:{server.server_address[1]}/status")
+    return server
+
+
+def main():
+    server = ThreadingHTTPServer((STATUS_HOST, STATUS_PORT), StatusHandler)
+    print(f"Serving run status on http://{STATUS_HOST}:{server.server_address[1]}/status")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
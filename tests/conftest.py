@@ -0,0 +1,39 @@
+"""
+Shared test setup.
+config reads the environment once at import, so the data directories and
+the portal URLs are pointed at a temporary directory and a local fixture
+server here, before any test imports a module.
+"""
+
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+from fixture_server import FixtureServer
+
+SERVER = FixtureServer().start()
+
+DATA_DIR = tempfile.mkdtemp(prefix="nyt-tests-")
+os.environ.update({
+    "LIBRARY_URL": SERVER.library_url,
+    "NYT_REDEEM_BASE_URL": SERVER.redeem_url,
+    "LOG_DIR": DATA_DIR,
+    "DATA_DIR": DATA_DIR,
+    "ACCOUNTS_FILE": "",
+    "RATE_LIMIT_PER_MINUTE": "0",
+})
+
+
+@pytest.fixture
+def server():
+    """The fixture server, reset to the normal variant after each test"""
+    yield SERVER
+    SERVER.variant = "normal"
+
+
+def pytest_unconfigure(config):
+    SERVER.stop()
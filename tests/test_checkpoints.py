@@ -0,0 +1,52 @@
+import os
+import json
+import logging
+import pytest
+import checkpoints
+
+logger = logging.getLogger("tests")
+
+ACCOUNT = "Reader One"
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(checkpoints, "CHECKPOINT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_resumes_from_the_last_completed_stage():
+    checkpoint = checkpoints.resume_checkpoint(logger, ACCOUNT)
+    checkpoint.mark(checkpoints.STAGE_DRIVER_UP, logger)
+    checkpoint.mark(checkpoints.STAGE_CODE_OBTAINED, logger, gift_code="abc123", redirect_url="https://example.com/r")
+
+    # A later process reads the same checkpoint back
+    resumed = checkpoints.resume_checkpoint(logger, ACCOUNT)
+    assert resumed.last_stage() == checkpoints.STAGE_CODE_OBTAINED
+    assert resumed.get(checkpoints.STAGE_CODE_OBTAINED, "gift_code") == "abc123"
+    assert not resumed.reached(checkpoints.STAGE_REDEEMED)
+
+
+def test_forced_and_finished_runs_start_over():
+    checkpoint = checkpoints.resume_checkpoint(logger, ACCOUNT)
+    checkpoint.mark(checkpoints.STAGE_CODE_OBTAINED, logger, gift_code="abc123")
+    assert checkpoints.resume_checkpoint(logger, ACCOUNT, force=True).stages == {}
+
+    checkpoint.mark(checkpoints.STAGE_ACTIVATED, logger)
+    assert checkpoints.resume_checkpoint(logger, ACCOUNT).stages == {}
+
+
+def test_checkpoints_are_per_account():
+    checkpoints.resume_checkpoint(logger, ACCOUNT).mark(checkpoints.STAGE_REDEEMED, logger, url="https://example.com")
+    assert checkpoints.resume_checkpoint(logger, "Reader Two").stages == {}
+
+
+def test_unreadable_and_old_checkpoints_are_dropped(checkpoint_dir):
+    with open(checkpoints.checkpoint_file(ACCOUNT), 'w') as f:
+        f.write("{not json")
+    old = checkpoints.checkpoint_file(ACCOUNT, day="2000-01-01")
+    with open(old, 'w') as f:
+        json.dump({"account": ACCOUNT, "stages": {checkpoints.STAGE_DRIVER_UP: {}}}, f)
+
+    assert checkpoints.resume_checkpoint(logger, ACCOUNT).stages == {}
+    assert not os.path.exists(old)
@@ -0,0 +1,65 @@
+import time
+import logging
+import pytest
+import session_store
+from accounts import Account
+from activation import ActivationState
+from library_http import fetch_library_code_http
+from nyt_http import redeem_nyt_code_http
+
+logger = logging.getLogger("tests")
+
+BARCODE = "21000000000000"
+ACCOUNT = Account(name="tester", barcode=BARCODE, nyt_username="tester@example.com", nyt_password="secret")
+
+
+@pytest.fixture(autouse=True)
+def session_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(session_store, "SESSION_DIR", str(tmp_path))
+
+
+def signed_in(server):
+    """Save a session whose auth cookie the fixture server accepts"""
+    token = f"session-test-{time.monotonic_ns()}"
+    server.sessions.add(token)
+    host = server.redeem_url.split("//")[1].split(":")[0]
+    cookie = {"name": session_store.AUTH_COOKIE_NAME, "value": token, "domain": host, "path": "/"}
+    assert session_store._write_session([cookie], {}, logger, ACCOUNT.name, time.time())
+
+
+def test_library_code_over_http(server):
+    gift_code, redirect_url = fetch_library_code_http(logger, BARCODE)
+    assert gift_code.startswith("fixture")
+    assert redirect_url.startswith(server.redeem_url)
+    assert f"gift_code={gift_code}" in redirect_url
+
+
+def test_library_without_a_code_falls_back_to_browser(server):
+    server.variant = "no-library-code"
+    assert fetch_library_code_http(logger, BARCODE) is None
+
+
+def test_redeem_without_a_session_falls_back_to_browser(server):
+    assert redeem_nyt_code_http(logger, ACCOUNT, "fixture-nosession", None) is None
+
+
+def test_redeem_and_activate_over_http(server):
+    signed_in(server)
+    gift_code, redirect_url = fetch_library_code_http(logger, BARCODE)
+
+    assert redeem_nyt_code_http(logger, ACCOUNT, gift_code, redirect_url) == ActivationState.CONFIRMED
+    assert gift_code in server.redeemed_codes
+    # Redeeming the same code again is recognised as already done
+    assert redeem_nyt_code_http(logger, ACCOUNT, gift_code, redirect_url) == ActivationState.ALREADY_REDEEMED
+
+
+def test_already_redeemed_code(server):
+    signed_in(server)
+    server.variant = "already-redeemed"
+    assert redeem_nyt_code_http(logger, ACCOUNT, "fixture-used", None) == ActivationState.ALREADY_REDEEMED
+
+
+def test_rejected_session_falls_back_to_browser(server):
+    signed_in(server)
+    server.variant = "login-required"
+    assert redeem_nyt_code_http(logger, ACCOUNT, "fixture-login", None) is None
@@ -0,0 +1,65 @@
+import logging
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+import locator_cache
+
+logger = logging.getLogger("tests")
+
+PAGE_URL = "https://www.nytimes.com/subscription/redeem"
+
+
+class StubElement:
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+
+class StubDriver:
+    """Finds elements only through the given XPath; every other lookup raises like WebDriver"""
+
+    def __init__(self, matching_xpath, matching_index):
+        self.current_url = PAGE_URL
+        self.element = StubElement()
+        self.matching_xpath = matching_xpath
+        self.matching_index = matching_index
+        self.lookups = []
+
+    def find_element(self, by, value):
+        self.lookups.append((by, value))
+        if by == By.XPATH and self.matching_xpath in value:
+            return self.element
+        raise NoSuchElementException(f"no element for {value}")
+
+    def execute_script(self, script, *args):
+        return self.matching_index
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(locator_cache, "LOCATOR_CACHE_FILE", str(tmp_path / "locators.json"))
+    monkeypatch.setattr(locator_cache, "_learned", None)
+    monkeypatch.setattr(locator_cache, "LEARNED_GRACE", 0.05)
+
+
+def test_learns_the_alternative_that_matched():
+    alternatives = locator_cache.TARGETS["nyt_redeem"][1]
+    driver = StubDriver(alternatives[1].xpath, 1)
+
+    assert locator_cache.find(driver, "nyt_redeem", 1, logger) is driver.element
+    assert locator_cache.learned_locator("nyt_redeem", locator_cache.page_version(PAGE_URL)) == alternatives[1]
+
+
+def test_stale_learned_locator_falls_back_to_union_and_relearns():
+    alternatives = locator_cache.TARGETS["nyt_redeem"][1]
+    version = locator_cache.page_version(PAGE_URL)
+    locator_cache._learn("nyt_redeem", version, alternatives[1], logger)
+    # The page changed: only the first alternative matches now
+    driver = StubDriver(alternatives[0].xpath, 0)
+
+    assert locator_cache.find(driver, "nyt_redeem", 2, logger) is driver.element
+    assert (By.CSS_SELECTOR, alternatives[1].css) in driver.lookups
+    assert any(by == By.XPATH and " | " in value for by, value in driver.lookups)
+    assert locator_cache.learned_locator("nyt_redeem", version) == alternatives[0]
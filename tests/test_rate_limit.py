@@ -0,0 +1,101 @@
+import logging
+import types
+import time
+import pytest
+import rate_limit
+from nyt_http import _Page
+
+logger = logging.getLogger("tests")
+
+URL = "https://www.nytimes.com/subscription/redeem"
+
+
+class Clock:
+    """Stands in for time.time, moved forward by the test"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch, tmp_path):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_FILE", str(tmp_path / "rate_limit.json"))
+    monkeypatch.setattr(rate_limit, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(rate_limit, "CIRCUIT_OPEN_SECONDS", 300)
+    monkeypatch.setattr(rate_limit, "CIRCUIT_OPEN_MAX_SECONDS", 900)
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(
+        time=clock.time, sleep=lambda seconds: None, monotonic=time.monotonic))
+    return clock
+
+
+def test_is_challenge_uses_status_and_visible_text():
+    assert rate_limit.is_challenge(429, "")
+    assert rate_limit.is_challenge(403, "Forbidden")
+    assert rate_limit.is_challenge(200, "Please verify you are human")
+    assert not rate_limit.is_challenge(200, "Redeem your access code")
+    assert not rate_limit.is_challenge(None, None)
+
+
+def test_page_challenge_ignores_vendor_scripts_in_html():
+    html = ("<html><head><title>Redeem</title><script src='https://js.datadome.co/tags.js'></script>"
+            "<script src='https://www.google.com/recaptcha/api.js'></script></head>"
+            "<body><h1>Redeem your access code</h1></body></html>")
+    assert not _Page(URL, 200, html).is_challenge()
+
+    challenge = "<html><head><title>nytimes.com</title></head><body><p>Please verify you are human</p></body></html>"
+    assert _Page(URL, 200, challenge).is_challenge()
+    assert _Page(URL, 429, html).is_challenge()
+
+
+def test_circuit_trips_at_threshold_and_backs_off(clock):
+    for _ in range(2):
+        rate_limit.record_failure(URL, logger, "HTTP 503")
+    rate_limit.acquire(URL, logger)
+
+    rate_limit.record_failure(URL, logger, "HTTP 503")
+    with pytest.raises(rate_limit.BackingOff) as raised:
+        rate_limit.acquire(URL, logger)
+    assert raised.value.host == "www.nytimes.com"
+    assert raised.value.until == clock.now + 300
+    assert rate_limit.open_circuits() == {"www.nytimes.com": clock.now + 300}
+
+
+def test_failed_trial_after_cooldown_doubles_it(clock):
+    for _ in range(3):
+        rate_limit.record_failure(URL, logger, "timeout")
+    clock.now += 301
+    rate_limit.acquire(URL, logger)
+
+    # One failure is enough to trip a circuit that has tripped before
+    rate_limit.record_failure(URL, logger, "timeout")
+    with pytest.raises(rate_limit.BackingOff) as raised:
+        rate_limit.acquire(URL, logger)
+    assert raised.value.until == clock.now + 600
+
+    # The cooldown is capped
+    clock.now += 601
+    rate_limit.record_failure(URL, logger, "timeout")
+    assert rate_limit.open_circuits()["www.nytimes.com"] == clock.now + 900
+
+
+def test_success_closes_the_circuit(clock):
+    for _ in range(3):
+        rate_limit.record_failure(URL, logger, "timeout")
+    clock.now += 301
+    rate_limit.record_success(URL)
+
+    rate_limit.record_failure(URL, logger, "timeout")
+    rate_limit.acquire(URL, logger)
+    assert rate_limit.open_circuits() == {}
+
+
+def test_failures_while_open_are_not_counted(clock):
+    for _ in range(3):
+        rate_limit.record_failure(URL, logger, "timeout")
+    until = rate_limit.open_circuits()["www.nytimes.com"]
+    rate_limit.record_failure(URL, logger, "timeout")
+    assert rate_limit.open_circuits()["www.nytimes.com"] == until
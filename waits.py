@@ -0,0 +1,158 @@
+"""
+Condition-based waits for the NY Times flow.
+Each step waits on a predicate (URL change, DOM quiet, element enabled,
+form validity) with its own time budget, so the flow moves on as soon as
+the page is ready instead of sleeping a fixed amount.
+"""
+
+import time
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from lazy_import import LazyModule
+
+ui = LazyModule("selenium.webdriver.support.ui")
+
+# Maximum time (seconds) each step is allowed to wait for its condition
+STEP_BUDGETS = {
+    "page_settle": 5,
+    "field_value": 2,
+    "form_validation": 3,
+    "button_enabled": 10,
+    "navigation": 15,
+    "post_login_redirect": 15,
+    "activation_redirect": 30,
+    "activation_settle": 10,
+    "activation_confirm": 30,
+}
+
+POLL_INTERVAL = 0.1
+
+# Installs a MutationObserver once per document and reports whether the DOM
+# has been quiet for at least arguments[0] milliseconds
+DOM_QUIET_SCRIPT = """
+if (!window.__nytMutationObserver) {
+    window.__nytLastMutation = performance.now();
+    window.__nytMutationObserver = new MutationObserver(function() {
+        window.__nytLastMutation = performance.now();
+    });
+    window.__nytMutationObserver.observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+}
+return document.readyState === 'complete' &&
+    performance.now() - window.__nytLastMutation >= arguments[0];
+"""
+
+FORM_VALID_SCRIPT = """
+var el = arguments[0];
+if (el.getAttribute('aria-invalid') === 'true') { return false; }
+var target = el.form || el;
+return typeof target.checkValidity === 'function' ? target.checkValidity() : true;
+"""
+
+
+def wait_until(driver, condition, step, required=True, timeout=None):
+    """
+    Wait until condition(driver) is truthy, within the budget for step.
+    Returns the condition's value. If required is False, a timeout returns
+    False instead of raising TimeoutException.
+    """
+    budget = timeout if timeout is not None else STEP_BUDGETS[step]
+    if hasattr(driver, "wait_for_activity"):
+        return _wait_for_events(driver, condition, step, budget, required)
+    try:
+        return ui.WebDriverWait(
+            driver, budget, poll_frequency=POLL_INTERVAL,
+            ignored_exceptions=(StaleElementReferenceException,)
+        ).until(condition, message=f"Condition for step '{step}' not met within {budget}s")
+    except TimeoutException:
+        if required:
+            raise
+        return False
+
+
+def _wait_for_events(driver, condition, step, budget, required):
+    """
+    wait_until for drivers that report page activity (the DevTools backend):
+    re-check the condition as soon as a navigation, DOM or network event
+    arrives, and at least every POLL_INTERVAL for changes that raise none
+    """
+    deadline = time.monotonic() + budget
+    while True:
+        seen = driver.activity_count
+        try:
+            result = condition(driver)
+            if result:
+                return result
+        except (NoSuchElementException, StaleElementReferenceException):
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            if required:
+                raise TimeoutException(f"Condition for step '{step}' not met within {budget}s")
+            return False
+        driver.wait_for_activity(seen, min(remaining, POLL_INTERVAL))
+
+
+def any_of(*conditions):
+    """Condition that holds when any of the given conditions holds"""
+    def _predicate(driver):
+        for condition in conditions:
+            try:
+                result = condition(driver)
+            except StaleElementReferenceException:
+                continue
+            if result:
+                return result
+        return False
+    return _predicate
+
+
+def url_changed(from_url):
+    """Condition that holds once the URL differs from from_url"""
+    return lambda driver: driver.current_url != from_url
+
+
+def url_contains(*fragments):
+    """Condition that holds once the URL contains any of the fragments"""
+    def _predicate(driver):
+        current_url = driver.current_url.lower()
+        return any(fragment in current_url for fragment in fragments)
+    return _predicate
+
+
+def dom_settled(quiet_ms=300):
+    """Condition that holds once the document is loaded and the DOM stops mutating"""
+    return lambda driver: driver.execute_script(DOM_QUIET_SCRIPT, quiet_ms)
+
+
+def element_enabled(element):
+    """Condition that holds once the element is displayed and not disabled"""
+    def _predicate(driver):
+        return (
+            element.is_displayed()
+            and element.is_enabled()
+            and element.get_attribute("disabled") is None
+            and element.get_attribute("aria-disabled") != "true"
+        )
+    return _predicate
+
+
+def element_stale(element):
+    """Condition that holds once the element has been detached from the page"""
+    def _predicate(driver):
+        try:
+            element.is_enabled()
+            return False
+        except StaleElementReferenceException:
+            return True
+    return _predicate
+
+
+def value_equals(element, value):
+    """Condition that holds once an input's value matches value"""
+    return lambda driver: element.get_attribute("value") == value
+
+
+def form_valid(element):
+    """Condition that holds once the field (and its form) pass client-side validation"""
+    return lambda driver: driver.execute_script(FORM_VALID_SCRIPT, element)